@@ -0,0 +1,129 @@
+"""
+Admission control for expensive request classes
+
+Each endpoint class (transcript extraction, LLM analysis, prompt storage) has
+a gate with a fixed number of concurrent requests and a bounded FIFO queue.
+A request is rejected at once when the queue is full or when the expected
+wait, estimated from recent service times, is longer than the queue
+deadline; otherwise it waits at most that deadline. Rejections carry a
+Retry-After estimate, so overload turns into fast 503s instead of every
+request slowing down together.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class AdmissionError(Exception):
+    """Raised when a request is shed instead of queued"""
+
+    def __init__(self, name, reason, retry_after):
+        super().__init__(f"Too many {name} requests in progress ({reason}); retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AdmissionGate:
+    """Concurrency limit with a bounded, deadline-limited FIFO queue"""
+
+    def __init__(self, name, concurrency=4, max_queue=8, queue_timeout=20.0):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_concurrency = concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._active = 0
+        self._service_time = None
+        self._waits = deque(maxlen=200)
+        self._stats = {'admitted': 0, 'rejected_full': 0, 'rejected_slow': 0, 'timed_out': 0}
+
+    def _expected_wait(self, position):
+        """Seconds until the request at a queue position is likely to be admitted"""
+        if self._service_time is None:
+            return 0.0
+        return self._service_time * (position + 1) / self.concurrency
+
+    def _retry_after(self):
+        return max(1, math.ceil(self._expected_wait(len(self._queue))))
+
+    def acquire(self):
+        """Wait for a slot; returns the seconds spent queued or raises AdmissionError"""
+        started = time.monotonic()
+        with self._cond:
+            if not self._queue and self._active < self.concurrency:
+                self._active += 1
+                self._stats['admitted'] += 1
+                self._waits.append(0.0)
+                return 0.0
+            if len(self._queue) >= self.max_queue:
+                self._stats['rejected_full'] += 1
+                raise AdmissionError(self.name, 'queue full', self._retry_after())
+            if self._expected_wait(len(self._queue)) > self.queue_timeout:
+                self._stats['rejected_slow'] += 1
+                raise AdmissionError(self.name, 'queue too slow', self._retry_after())
+
+            ticket = object()
+            self._queue.append(ticket)
+            deadline = started + self.queue_timeout
+            try:
+                while self._queue[0] is not ticket or self._active >= self.concurrency:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timed_out'] += 1
+                        raise AdmissionError(self.name, 'queue deadline passed', self._retry_after())
+                    self._cond.wait(remaining)
+            finally:
+                self._queue.remove(ticket)
+                self._cond.notify_all()
+
+            self._active += 1
+            self._stats['admitted'] += 1
+            waited = time.monotonic() - started
+            self._waits.append(waited)
+            return waited
+
+    def release(self, service_time):
+        """Free a slot and fold the request's service time into the estimate"""
+        with self._cond:
+            self._active -= 1
+            if self._service_time is None:
+                self._service_time = service_time
+            else:
+                self._service_time = 0.8 * self._service_time + 0.2 * service_time
+            self._cond.notify_all()
+
+    @contextmanager
+    def admit(self):
+        """Hold a slot for the duration of a with block"""
+        self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    def set_concurrency(self, concurrency):
+        """Change the number of concurrent requests; running ones are not interrupted"""
+        with self._cond:
+            self.concurrency = concurrency
+            self._cond.notify_all()
+
+    def stats(self):
+        """Current load, limits, queue waits and shedding counts"""
+        with self._cond:
+            waits = sorted(self._waits)
+            return {
+                'active': self._active,
+                'queued': len(self._queue),
+                'concurrency': self.concurrency,
+                'max_queue': self.max_queue,
+                'queue_timeout': self.queue_timeout,
+                'service_time_ms': round(self._service_time * 1000) if self._service_time is not None else None,
+                'wait_p95_ms': round(waits[int(0.95 * (len(waits) - 1))] * 1000, 1) if waits else 0.0,
+                'wait_max_ms': round(waits[-1] * 1000, 1) if waits else 0.0,
+                **self._stats
+            }
@@ -0,0 +1,179 @@
+"""
+Bulk analysis through the OpenAI Batch API
+
+Requests are written as Batch API JSONL (one chat completion per line, keyed
+by custom_id), uploaded, and processed by the provider within its completion
+window at batch pricing. The runner polls until the batch finishes and yields
+the output lines, so throughput is set by the provider rather than by a
+request loop here.
+
+LocalBatchRunner has the same interface but runs each line through a backend
+directly and writes output in the Batch API format. It stands in for the
+Batch API in tests and for local OpenAI-compatible servers that lack one.
+"""
+
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+BATCH_ENDPOINT = '/v1/chat/completions'
+FINISHED_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+
+
+def batch_line(custom_id, model, messages, max_tokens, temperature=0.7):
+    """One Batch API input line"""
+    return json.dumps({
+        'custom_id': custom_id,
+        'method': 'POST',
+        'url': BATCH_ENDPOINT,
+        'body': {
+            'model': model,
+            'messages': messages,
+            'max_tokens': max_tokens,
+            'temperature': temperature
+        }
+    }) + '\n'
+
+
+def parse_output_line(line):
+    """Turn a Batch API output line into (custom_id, result dict)
+
+    The result holds either text, model and token usage or an error message.
+    """
+    item = json.loads(line)
+    response = item.get('response') or {}
+    body = response.get('body') or {}
+
+    if item.get('error') or response.get('status_code') != 200:
+        error = item.get('error') or body.get('error') or {}
+        return item['custom_id'], {'error': error.get('message') or f"HTTP {response.get('status_code')}"}
+
+    usage = body.get('usage') or {}
+    return item['custom_id'], {
+        'text': body['choices'][0]['message']['content'],
+        'model': body.get('model'),
+        'prompt_tokens': usage.get('prompt_tokens'),
+        'completion_tokens': usage.get('completion_tokens')
+    }
+
+
+class OpenAIBatchRunner:
+    """Submits and collects batches through the OpenAI Files and Batches APIs"""
+
+    name = 'openai'
+
+    def __init__(self, client):
+        self.client = client
+
+    def submit(self, input_path, metadata=None):
+        """Upload an input file and create a batch; returns the batch ID"""
+        with open(input_path, 'rb') as f:
+            uploaded = self.client.files.create(file=f, purpose='batch')
+        batch = self.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window='24h',
+            metadata=metadata or {}
+        )
+        return batch.id
+
+    def status(self, batch_id):
+        """Current status and request counts of a batch"""
+        batch = self.client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        return {
+            'status': batch.status,
+            'total': counts.total if counts else None,
+            'completed': counts.completed if counts else None,
+            'failed': counts.failed if counts else None
+        }
+
+    def results(self, batch_id):
+        """Yield output lines (successes, then errors) of a finished batch"""
+        batch = self.client.batches.retrieve(batch_id)
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                for line in self.client.files.content(file_id).text.splitlines():
+                    if line.strip():
+                        yield line
+
+
+class LocalBatchRunner:
+    """Runs batch input files against a backend and stores Batch API style output"""
+
+    name = 'local'
+
+    def __init__(self, backend, directory, workers=4):
+        self.backend = backend
+        self.directory = Path(directory)
+        self.workers = workers
+
+    def _output_path(self, batch_id):
+        return self.directory / f"{batch_id}.output.jsonl"
+
+    def _run_line(self, line):
+        request = json.loads(line)
+        body = request['body']
+        try:
+            completion = self.backend.complete(body['model'], body['messages'], body['max_tokens'],
+                                               body.get('temperature', 0.7))
+        except Exception as e:
+            return json.dumps({'custom_id': request['custom_id'], 'response': None,
+                               'error': {'message': str(e)}}) + '\n'
+
+        return json.dumps({
+            'id': f"batch_req_{uuid.uuid4().hex}",
+            'custom_id': request['custom_id'],
+            'response': {
+                'status_code': 200,
+                'body': {
+                    'model': completion.model,
+                    'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': completion.text}}],
+                    'usage': {
+                        'prompt_tokens': completion.prompt_tokens,
+                        'completion_tokens': completion.completion_tokens
+                    }
+                }
+            },
+            'error': None
+        }) + '\n'
+
+    def submit(self, input_path, metadata=None):
+        """Run every line of the input file now; returns the batch ID"""
+        batch_id = f"local_batch_{uuid.uuid4().hex[:16]}"
+        with open(input_path, 'r') as f:
+            lines = [line for line in f if line.strip()]
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor, \
+                open(self._output_path(batch_id), 'w') as out:
+            for output in executor.map(self._run_line, lines):
+                out.write(output)
+        return batch_id
+
+    def status(self, batch_id):
+        """Local batches finish during submit"""
+        with open(self._output_path(batch_id), 'r') as f:
+            outputs = [json.loads(line) for line in f if line.strip()]
+        failed = sum(1 for output in outputs if output.get('error'))
+        return {'status': 'completed', 'total': len(outputs),
+                'completed': len(outputs) - failed, 'failed': failed}
+
+    def results(self, batch_id):
+        """Yield the stored output lines"""
+        with open(self._output_path(batch_id), 'r') as f:
+            for line in f:
+                if line.strip():
+                    yield line
+
+
+def wait_for_batch(runner, batch_id, poll_interval=60, report=print):
+    """Poll a batch until it finishes; returns its final status"""
+    while True:
+        status = runner.status(batch_id)
+        report(f"{batch_id}: {status['status']} ({status['completed'] or 0}/{status['total'] or '?'} done, "
+               f"{status['failed'] or 0} failed)")
+        if status['status'] in FINISHED_STATUSES:
+            return status
+        time.sleep(poll_interval)
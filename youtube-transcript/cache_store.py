@@ -0,0 +1,131 @@
+"""
+Disk-backed JSON cache with a small in-memory LRU layer
+
+Each entry is stored as one JSON file named after its key, written atomically
+so a crash or concurrent reader never sees a half-written entry. Recently used
+entries are kept in memory to avoid re-reading and re-parsing hot files.
+"""
+
+import bisect
+import json
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+# Keys become file names, so restrict them to a safe character set
+SAFE_KEY_RE = re.compile(r'^[0-9A-Za-z_.-]+$')
+
+
+class JsonStore:
+    """Key/value store of JSON documents in a directory"""
+
+    def __init__(self, directory, memory_items=64):
+        self.directory = Path(directory)
+        self.memory_items = memory_items
+        self.max_memory_items = memory_items
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        """File path for a key"""
+        if not SAFE_KEY_RE.match(key):
+            raise ValueError(f"Invalid cache key: {key!r}")
+        return self.directory / f"{key}.json"
+
+    def _remember(self, key, value):
+        """Insert into the in-memory LRU, evicting the oldest entries"""
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def resize(self, fraction):
+        """Keep at most fraction of the configured number of entries in memory"""
+        with self._lock:
+            self.memory_items = int(self.max_memory_items * fraction)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def memory_entries(self):
+        """Snapshot of the documents currently held in memory"""
+        with self._lock:
+            return list(self._memory.values())
+
+    def get(self, key, remember=True):
+        """Return the stored document for key, or None
+
+        Bulk readers pass remember=False so a scan does not flush the LRU.
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        path = self._path(key)
+        try:
+            with open(path, 'r') as f:
+                value = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Error reading cache entry {path}: {e}")
+            return None
+
+        if remember:
+            self._remember(key, value)
+        return value
+
+    def put(self, key, value, persist=True):
+        """Store a document under key
+
+        With persist=False only the in-memory copy is updated; callers that
+        update a document often use this to write it to disk less often.
+        """
+        path = self._path(key)
+        if not persist:
+            self._remember(key, value)
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(value, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        self._remember(key, value)
+
+    def contains(self, key):
+        """Check whether key is stored, without loading it"""
+        with self._lock:
+            if key in self._memory:
+                return True
+        return self._path(key).exists()
+
+    def delete(self, key):
+        """Remove key from the store"""
+        with self._lock:
+            self._memory.pop(key, None)
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def keys(self, after=None):
+        """Return stored keys in sorted order, optionally only those after a cursor"""
+        try:
+            names = [entry.name[:-5] for entry in os.scandir(self.directory)
+                     if entry.name.endswith('.json')]
+        except FileNotFoundError:
+            return []
+        names.sort()
+        if after is not None:
+            names = names[bisect.bisect_right(names, after):]
+        return names
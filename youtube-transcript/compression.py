@@ -0,0 +1,147 @@
+"""
+Local extractive compression of transcripts before LLM calls
+
+Sentences are scored by the cosine similarity of their TF-IDF vector to the
+transcript's centroid, filler words and caption annotations are removed,
+near-duplicate sentences (common in rolling auto-captions) are dropped, and
+the best sentences are kept in their original order until the token budget
+is reached. Everything is vectorized with NumPy on hashed feature vectors, so
+memory stays bounded even for multi-hour transcripts.
+"""
+
+import re
+import zlib
+
+import numpy as np
+
+from llm_backend import estimate_tokens
+
+# Hashed feature space for TF-IDF vectors
+FEATURE_DIMENSIONS = 1024
+
+# Sentences without punctuation (typical of auto-captions) are cut into windows
+MAX_SENTENCE_WORDS = 40
+
+# Neighbouring sentences checked for near-duplicates, and the similarity cut-off
+DUPLICATE_WINDOW = 12
+DUPLICATE_THRESHOLD = 0.9
+
+SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+WORD_RE = re.compile(r"[a-z0-9']+")
+FILLER_RE = re.compile(
+    r"\[(?:music|applause|laughter|inaudible)\]"
+    r"|\b(?:um+|uh+|uhm|erm|hmm+|mm+)\b[,.]?"
+    r"|\b(?:you know|i mean)\b,?",
+    re.I
+)
+SPACES_RE = re.compile(r'\s{2,}')
+
+STOP_WORDS = frozenset(
+    "a an and are as at be but by for from has have he her his i if in is it its "
+    "just me my not of on or our so that the their them then there they this to "
+    "was we were what when which who will with you your".split()
+)
+
+
+def remove_fillers(text):
+    """Strip filler words and caption annotations"""
+    return SPACES_RE.sub(' ', FILLER_RE.sub('', text)).strip()
+
+
+def split_sentences(text):
+    """Split text into sentences, windowing unpunctuated runs"""
+    sentences = []
+    for sentence in SENTENCE_SPLIT_RE.split(text):
+        words = sentence.split()
+        for start in range(0, len(words), MAX_SENTENCE_WORDS):
+            chunk = ' '.join(words[start:start + MAX_SENTENCE_WORDS])
+            if chunk:
+                sentences.append(chunk)
+    return sentences
+
+
+def tfidf_matrix(sentences):
+    """Build L2-normalized hashed TF-IDF vectors, one row per sentence"""
+    rows = []
+    cols = []
+    for row, sentence in enumerate(sentences):
+        for word in WORD_RE.findall(sentence.lower()):
+            if word not in STOP_WORDS:
+                rows.append(row)
+                cols.append(zlib.crc32(word.encode('utf-8')) % FEATURE_DIMENSIONS)
+
+    counts = np.zeros((len(sentences), FEATURE_DIMENSIONS), dtype=np.float32)
+    np.add.at(counts, (np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)), 1.0)
+
+    document_frequency = np.count_nonzero(counts, axis=0)
+    idf = np.log((1 + len(sentences)) / (1 + document_frequency)).astype(np.float32) + 1
+    matrix = np.log1p(counts) * idf
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def near_duplicates(matrix):
+    """Flag sentences nearly identical to one of the preceding DUPLICATE_WINDOW sentences"""
+    count = matrix.shape[0]
+    duplicate = np.zeros(count, dtype=bool)
+    for offset in range(1, min(DUPLICATE_WINDOW, count - 1) + 1):
+        similarity = np.einsum('ij,ij->i', matrix[offset:], matrix[:-offset])
+        duplicate[offset:] |= similarity >= DUPLICATE_THRESHOLD
+    return duplicate
+
+
+def compress_text(text, token_budget):
+    """Compress text to roughly token_budget tokens
+
+    Returns (compressed text, stats dict).
+    """
+    tokens_before = estimate_tokens(text)
+    stats = {
+        'method': 'tfidf',
+        'tokens_before': tokens_before,
+        'tokens_after': tokens_before,
+        'tokens_saved': 0,
+        'ratio': 1.0
+    }
+
+    cleaned = remove_fillers(text)
+    sentences = split_sentences(cleaned)
+    if not sentences:
+        return text, stats
+
+    matrix = tfidf_matrix(sentences)
+    keep = ~near_duplicates(matrix)
+
+    # Exact repeats anywhere in the transcript are dropped as well
+    seen = set()
+    for index, sentence in enumerate(sentences):
+        normalized = sentence.lower()
+        if normalized in seen:
+            keep[index] = False
+        seen.add(normalized)
+
+    centroid = matrix[keep].mean(axis=0)
+    scores = matrix @ centroid
+    scores[~keep] = -np.inf
+
+    lengths = np.array([estimate_tokens(s) for s in sentences])
+    selected = np.zeros(len(sentences), dtype=bool)
+    used = 0
+    for index in np.argsort(-scores, kind='stable'):
+        if not keep[index]:
+            break
+        if used + lengths[index] > token_budget:
+            continue
+        selected[index] = True
+        used += lengths[index]
+
+    compressed = ' '.join(s for s, chosen in zip(sentences, selected) if chosen)
+    tokens_after = estimate_tokens(compressed)
+    stats.update({
+        'tokens_after': tokens_after,
+        'tokens_saved': tokens_before - tokens_after,
+        'ratio': round(tokens_after / tokens_before, 3)
+    })
+    return compressed, stats
@@ -0,0 +1,152 @@
+"""
+Background job manager for long-running requests
+
+Jobs run on a bounded thread pool and record a sequence of progress events
+(stage names such as extracting, downloading, parsing, analyzing). Clients
+either poll a job or stream its events; waiters are woken through a
+condition variable rather than by sleeping. Finished jobs are kept for a TTL
+so results can still be collected after a reconnect.
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFullError(Exception):
+    """Raised when too many jobs are waiting to run"""
+
+
+class Job:
+    """A submitted unit of work and its progress"""
+
+    def __init__(self, kind, priority='interactive'):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.priority = priority
+        self.status = 'queued'
+        self.stage = 'queued'
+        self.events = [{'seq': 0, 'stage': 'queued', 'time': time.time()}]
+        self.result = None
+        self.status_code = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+    def to_dict(self):
+        """Public view of the job"""
+        return {
+            'job_id': self.id,
+            'type': self.kind,
+            'priority': self.priority,
+            'status': self.status,
+            'stage': self.stage,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+            'result': self.result
+        }
+
+
+class JobManager:
+    """Runs jobs on a bounded worker pool and tracks their progress"""
+
+    def __init__(self, max_workers=2, max_queued=50, ttl=3600):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = {}
+        self._cond = threading.Condition()
+
+    def _purge(self, now):
+        """Forget finished jobs older than the TTL"""
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and now - job.finished_at > self.ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def queued_count(self):
+        """Number of jobs waiting for a worker"""
+        with self._cond:
+            return sum(1 for job in self._jobs.values() if job.status == 'queued')
+
+    def submit(self, kind, fn, *args, priority='interactive'):
+        """Queue fn(*args, progress=callback) and return its Job
+
+        fn returns a (result, status_code) tuple; a status code below 400
+        marks the job done, anything else failed.
+        """
+        with self._cond:
+            self._purge(time.time())
+            queued = sum(1 for job in self._jobs.values() if job.status == 'queued')
+            if queued >= self.max_queued:
+                raise QueueFullError(f"{queued} jobs already queued")
+            job = Job(kind, priority)
+            self._jobs[job.id] = job
+
+        self._executor.submit(self._run, job, fn, args)
+        return job
+
+    def add_finished(self, kind, result, status_code, priority='interactive'):
+        """Record a job answered without a worker, e.g. from a cache, and return it"""
+        job = Job(kind, priority)
+        with self._cond:
+            self._purge(time.time())
+            self._jobs[job.id] = job
+            job.result = result
+            job.status_code = status_code
+            job.finished_at = time.time()
+        self._record(job, 'done' if status_code < 400 else 'failed',
+                     status='done' if status_code < 400 else 'failed')
+        return job
+
+    def _run(self, job, fn, args):
+        """Worker body: run the job and record its outcome"""
+        self._record(job, 'started', status='running')
+        try:
+            result, status_code = fn(*args, progress=lambda stage: self._record(job, stage))
+        except Exception as e:
+            result, status_code = {'success': False, 'error': f'Error: {str(e)}'}, 500
+
+        with self._cond:
+            job.result = result
+            job.status_code = status_code
+            job.finished_at = time.time()
+        self._record(job, 'done' if status_code < 400 else 'failed',
+                     status='done' if status_code < 400 else 'failed')
+
+    def _record(self, job, stage, status=None):
+        """Append a progress event and wake waiters"""
+        with self._cond:
+            if status:
+                job.status = status
+            job.stage = stage
+            job.events.append({'seq': len(job.events), 'stage': stage, 'time': time.time()})
+            self._cond.notify_all()
+
+    def get(self, job_id):
+        """Look up a job by ID"""
+        with self._cond:
+            self._purge(time.time())
+            return self._jobs.get(job_id)
+
+    def wait_for_events(self, job, after_seq, timeout):
+        """Return events newer than after_seq, waiting up to timeout for one
+
+        Returns immediately, possibly with no events, once the job has finished.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: len(job.events) > after_seq + 1 or job.finished, timeout)
+            return job.events[after_seq + 1:]
+
+    def stats(self):
+        """Counts of jobs by status"""
+        with self._cond:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {'workers': self.max_workers, 'jobs': counts}
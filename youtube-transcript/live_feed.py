@@ -0,0 +1,53 @@
+"""
+Following transcripts that grow while a video is live
+
+Many clients may follow the same stream. The feed makes sure at most one
+refresh per transcript runs at a time and that refreshes are at least
+interval seconds apart, however many clients are waiting; every other
+client just waits to be woken when the refresh lands.
+"""
+
+import threading
+import time
+
+
+class LiveFeed:
+    """Coalesces refreshes of growing transcripts and wakes waiting readers"""
+
+    def __init__(self, refresh, interval=15):
+        self.refresh = refresh
+        self.interval = interval
+        self._cond = threading.Condition()
+        self._refreshing = set()
+        self._refreshed_at = {}
+        self._versions = {}
+
+    def refresh_if_due(self, key, *args):
+        """Run refresh(*args) unless key was refreshed recently or is being refreshed
+
+        Returns True if this call ran the refresh.
+        """
+        with self._cond:
+            due = time.monotonic() - self._refreshed_at.get(key, float('-inf')) >= self.interval
+            if key in self._refreshing or not due:
+                return False
+            self._refreshing.add(key)
+
+        try:
+            self.refresh(*args)
+        finally:
+            with self._cond:
+                self._refreshing.discard(key)
+                self._refreshed_at[key] = time.monotonic()
+                self._versions[key] = self._versions.get(key, 0) + 1
+                self._cond.notify_all()
+        return True
+
+    def wait(self, key, timeout):
+        """Wait until key is next refreshed or is due for a refresh, at most timeout seconds"""
+        with self._cond:
+            version = self._versions.get(key, 0)
+            if key not in self._refreshing:
+                due_in = self._refreshed_at.get(key, float('-inf')) + self.interval - time.monotonic()
+                timeout = max(0.0, min(timeout, due_in))
+            self._cond.wait_for(lambda: self._versions.get(key, 0) != version, timeout)
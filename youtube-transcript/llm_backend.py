@@ -0,0 +1,417 @@
+"""
+Pluggable LLM backends and model routing
+
+A backend is anything that can run a chat completion: the OpenAI API, any
+OpenAI-compatible server (llama.cpp, Ollama, vLLM, ...) reached through a
+base URL, or the offline stub used for testing. The router picks a model for
+each request from an ordered list of routes, fastest first: the first route
+whose input limit fits the estimated prompt size and which accepts the
+prompt's type wins, so short transcripts go to small fast models and only
+huge ones reach long-context models. max_tokens is sized from the prompt type
+and the input length.
+
+All calls pass through a shared governor that caps concurrent requests and
+spends a token-per-minute budget. Waiting calls are admitted strictly by
+priority class, then arrival order, so a backlog of background work (jobs,
+watchlist prefetches, batches) never delays an interactive request by more
+than the calls already in flight.
+
+Routing configuration (JSON, all keys optional):
+    {
+      "backends": {
+        "openai": {"type": "openai"},
+        "local": {"type": "openai", "base_url": "http://127.0.0.1:8080/v1", "api_key": "none"}
+      },
+      "routes": [
+        {"backend": "openai", "model": "gpt-4.1-nano", "max_input_tokens": 16000,
+         "prompt_types": ["summary", "social", "extraction"]},
+        {"backend": "openai", "model": "gpt-4o-mini", "max_input_tokens": 110000},
+        {"backend": "openai", "model": "gpt-4.1-mini", "max_input_tokens": 1000000}
+      ],
+      "governor": {"max_concurrency": 4, "tokens_per_minute": 200000, "queue_timeout": 120}
+    }
+
+OpenAI-type backends also accept "timeout", "connect_timeout", "max_retries"
+and "max_connections" (defaults to the governor's max_concurrency).
+"""
+
+import heapq
+import itertools
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import deque
+
+# Rough characters-per-token ratio for English text
+CHARS_PER_TOKEN = 4
+
+# Output budgets per prompt type: (minimum, maximum, tokens per input token)
+OUTPUT_BUDGETS = {
+    'summary': (400, 1000, 0.01),
+    'social': (300, 700, 0.0),
+    'extraction': (600, 3000, 0.05),
+    'notes': (1200, 6000, 0.15),
+    'general': (800, 2000, 0.03)
+}
+
+PROMPT_TYPE_PATTERNS = [
+    ('notes', re.compile(r'study notes|comprehensive|detailed notes|outline|chapter', re.I)),
+    ('summary', re.compile(r'summar|key points|takeaway|tl;?dr|main topics', re.I)),
+    ('extraction', re.compile(r'extract|statistic|data points|list all|quotes', re.I)),
+    ('social', re.compile(r'linkedin|tweet|twitter|post about|social media', re.I))
+]
+
+# Priority classes for queued LLM calls; lower values are admitted first
+PRIORITIES = {'interactive': 0, 'background': 1}
+
+DEFAULT_ROUTES = [
+    {'backend': 'openai', 'model': 'gpt-4.1-nano', 'max_input_tokens': 16000,
+     'prompt_types': ['summary', 'social', 'extraction']},
+    {'backend': 'openai', 'model': 'gpt-4o-mini', 'max_input_tokens': 110000},
+    {'backend': 'openai', 'model': 'gpt-4.1-mini', 'max_input_tokens': 1000000}
+]
+
+
+def estimate_tokens(text):
+    """Estimate the token count of text without a tokenizer"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def classify_prompt(prompt):
+    """Classify a prompt into one of the OUTPUT_BUDGETS types"""
+    for prompt_type, pattern in PROMPT_TYPE_PATTERNS:
+        if pattern.search(prompt):
+            return prompt_type
+    return 'general'
+
+
+def output_budget(prompt_type, input_tokens):
+    """Choose max_tokens for a prompt type and input size"""
+    minimum, maximum, ratio = OUTPUT_BUDGETS.get(prompt_type, OUTPUT_BUDGETS['general'])
+    return int(min(maximum, max(minimum, input_tokens * ratio)))
+
+
+class LLMBusyError(Exception):
+    """Raised when a call waited longer than the queue timeout for the governor"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"LLM queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Completion:
+    """Result of a chat completion"""
+
+    def __init__(self, text, model, prompt_tokens=None, completion_tokens=None, latency=None):
+        self.text = text
+        self.model = model
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.latency = latency
+        self.queue_wait = None
+
+    @property
+    def total_tokens(self):
+        if self.prompt_tokens is None or self.completion_tokens is None:
+            return None
+        return self.prompt_tokens + self.completion_tokens
+
+
+class LLMGovernor:
+    """Shared concurrency limit, token budget and priority queue for LLM calls
+
+    A call reserves its estimated tokens (input plus max_tokens) when admitted
+    and settles the difference with the actual usage when it finishes. A
+    tokens_per_minute of 0 disables the budget.
+    """
+
+    def __init__(self, max_concurrency=4, tokens_per_minute=0, queue_timeout=120):
+        self.max_concurrency = max_concurrency
+        self.tokens_per_minute = tokens_per_minute
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._order = itertools.count()
+        self._active = 0
+        self._tokens = float(tokens_per_minute)
+        self._refilled_at = time.monotonic()
+        self._waits = {name: deque(maxlen=200) for name in PRIORITIES}
+        self._admitted = {name: 0 for name in PRIORITIES}
+        self._timeouts = 0
+
+    def _refill(self, now):
+        if self.tokens_per_minute:
+            elapsed = now - self._refilled_at
+            self._tokens = min(self.tokens_per_minute,
+                               self._tokens + elapsed * self.tokens_per_minute / 60)
+        self._refilled_at = now
+
+    def _reservation(self, tokens):
+        # A call larger than the whole budget waits for a full bucket instead of forever
+        return min(tokens, self.tokens_per_minute)
+
+    def _budget_delay(self, tokens):
+        """Seconds until the token budget covers a reservation"""
+        if not self.tokens_per_minute:
+            return 0.0
+        missing = self._reservation(tokens) - self._tokens
+        return max(0.0, missing * 60 / self.tokens_per_minute)
+
+    def acquire(self, tokens, priority='interactive'):
+        """Wait for a slot and token budget; returns the seconds spent waiting"""
+        entry = (PRIORITIES[priority], next(self._order))
+        started = time.monotonic()
+        deadline = started + self.queue_timeout
+
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    delay = None
+                    if self._waiting[0] == entry and self._active < self.max_concurrency:
+                        delay = self._budget_delay(tokens)
+                        if delay == 0:
+                            break
+                    if now >= deadline:
+                        self._timeouts += 1
+                        raise LLMBusyError(max(1, math.ceil(self._budget_delay(tokens))))
+                    self._cond.wait(min(deadline - now, delay) if delay else deadline - now)
+            except BaseException:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+                raise
+
+            heapq.heappop(self._waiting)
+            self._active += 1
+            if self.tokens_per_minute:
+                self._tokens -= self._reservation(tokens)
+            waited = time.monotonic() - started
+            self._waits[priority].append(waited)
+            self._admitted[priority] += 1
+            # The next caller in line may fit into a remaining slot
+            self._cond.notify_all()
+            return waited
+
+    def release(self, tokens, used=None):
+        """Free a slot and settle the reservation against the tokens actually used"""
+        with self._cond:
+            self._active -= 1
+            if self.tokens_per_minute and used is not None:
+                self._tokens += self._reservation(tokens) - used
+            self._cond.notify_all()
+
+    def set_max_concurrency(self, max_concurrency):
+        """Change the number of concurrent calls; active calls are not interrupted"""
+        with self._cond:
+            self.max_concurrency = max_concurrency
+            self._cond.notify_all()
+
+    def stats(self):
+        """Queue depth, wait times and budget state"""
+        with self._cond:
+            self._refill(time.monotonic())
+            queued = {name: 0 for name in PRIORITIES}
+            names = {value: name for name, value in PRIORITIES.items()}
+            for priority, _ in self._waiting:
+                queued[names[priority]] += 1
+
+            waits = {}
+            for name, values in self._waits.items():
+                ordered = sorted(values)
+                waits[name] = {
+                    'admitted': self._admitted[name],
+                    'avg_ms': round(sum(ordered) / len(ordered) * 1000, 1) if ordered else 0.0,
+                    'p95_ms': round(ordered[int(0.95 * (len(ordered) - 1))] * 1000, 1) if ordered else 0.0,
+                    'max_ms': round(ordered[-1] * 1000, 1) if ordered else 0.0
+                }
+
+            return {
+                'active': self._active,
+                'max_concurrency': self.max_concurrency,
+                'queued': queued,
+                'tokens_per_minute': self.tokens_per_minute,
+                'tokens_available': int(self._tokens) if self.tokens_per_minute else None,
+                'queue_timeout': self.queue_timeout,
+                'timeouts': self._timeouts,
+                'waits': waits
+            }
+
+
+class OpenAICompatibleBackend:
+    """Backend for the OpenAI API or any server implementing its chat API"""
+
+    def __init__(self, name, base_url=None, api_key=None, api_key_env='OPENAI_API_KEY',
+                 timeout=None, connect_timeout=5.0, max_retries=2, max_connections=8):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.api_key_env = api_key_env
+        self.timeout = timeout or float(os.getenv('LLM_TIMEOUT', '120'))
+        self.connect_timeout = connect_timeout
+        self.max_retries = max_retries
+        self.max_connections = max_connections
+        self._client = None
+
+    def is_configured(self):
+        """Check whether the backend has the credentials it needs"""
+        return bool(self.api_key or os.getenv(self.api_key_env))
+
+    @property
+    def client(self):
+        """OpenAI client, created on first use"""
+        if self._client is None:
+            import httpx
+            from openai import DefaultHttpxClient, OpenAI
+            timeout = httpx.Timeout(self.timeout, connect=self.connect_timeout)
+            self._client = OpenAI(
+                api_key=self.api_key or os.getenv(self.api_key_env),
+                base_url=self.base_url,
+                timeout=timeout,
+                max_retries=self.max_retries,
+                http_client=DefaultHttpxClient(
+                    timeout=timeout,
+                    limits=httpx.Limits(max_connections=self.max_connections,
+                                        max_keepalive_connections=self.max_connections)
+                )
+            )
+        return self._client
+
+    def complete(self, model, messages, max_tokens, temperature=0.7):
+        """Run a chat completion"""
+        started = time.perf_counter()
+        response = self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+        usage = response.usage
+        return Completion(
+            response.choices[0].message.content,
+            response.model or model,
+            usage.prompt_tokens if usage else None,
+            usage.completion_tokens if usage else None,
+            time.perf_counter() - started
+        )
+
+
+class StubBackend:
+    """Offline stand-in that answers instantly with a canned response"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def is_configured(self):
+        return True
+
+    def complete(self, model, messages, max_tokens, temperature=0.7):
+        """Return a deterministic response describing the request"""
+        prompt = messages[-1]['content']
+        request = prompt.rsplit('User request:', 1)[-1].strip()
+        text = f"[stub:{model}] {request}"
+        return Completion(text, model, estimate_tokens(prompt), estimate_tokens(text), 0.0)
+
+
+BACKEND_TYPES = {
+    'openai': OpenAICompatibleBackend,
+    'stub': StubBackend
+}
+
+
+class Route:
+    """A model on a backend and the requests it accepts"""
+
+    def __init__(self, backend, model, max_input_tokens, prompt_types=None):
+        self.backend = backend
+        self.model = model
+        self.max_input_tokens = max_input_tokens
+        self.prompt_types = prompt_types
+
+    def accepts(self, input_tokens, prompt_type):
+        """Check whether this route can serve the request"""
+        if input_tokens > self.max_input_tokens:
+            return False
+        return self.prompt_types is None or prompt_type in self.prompt_types
+
+
+class LLMRouter:
+    """Routes chat requests to the fastest suitable model"""
+
+    def __init__(self, backends, routes, governor=None):
+        self.backends = backends
+        self.routes = routes
+        self.governor = governor or LLMGovernor()
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a router from a configuration dict"""
+        governor = LLMGovernor(**(config.get('governor') or {}))
+
+        backend_configs = config.get('backends') or {'openai': {'type': 'openai'}}
+        backends = {}
+        for name, options in backend_configs.items():
+            options = dict(options)
+            backend_type = options.pop('type', 'openai')
+            if backend_type == 'openai':
+                options.setdefault('max_connections', governor.max_concurrency)
+            backends[name] = BACKEND_TYPES[backend_type](name, **options)
+
+        routes = [
+            Route(backends[r['backend']], r['model'], r.get('max_input_tokens', 100000),
+                  r.get('prompt_types'))
+            for r in config.get('routes') or DEFAULT_ROUTES
+        ]
+        return cls(backends, routes, governor)
+
+    @classmethod
+    def from_file(cls, path, overrides=None):
+        """Build a router from a JSON file, falling back to defaults if it is missing"""
+        config = {}
+        if path and os.path.exists(path):
+            with open(path, 'r') as f:
+                config = json.load(f)
+
+        # Governor settings are merged key by key; everything else is replaced
+        overrides = dict(overrides or {})
+        governor = dict(config.get('governor') or {}, **overrides.pop('governor', {}))
+        config.update(overrides)
+        config['governor'] = governor
+        return cls.from_config(config)
+
+    def is_configured(self):
+        """Check whether any route's backend can be used"""
+        return any(route.backend.is_configured() for route in self.routes)
+
+    def route(self, messages, prompt_type):
+        """Choose (route, max_tokens) for a request"""
+        input_tokens = sum(estimate_tokens(m['content']) for m in messages)
+        candidates = [r for r in self.routes if r.backend.is_configured()]
+        if not candidates:
+            raise RuntimeError('No LLM backend configured on server')
+
+        route = next((r for r in candidates if r.accepts(input_tokens, prompt_type)), None)
+        if route is None:
+            # Nothing advertises support; use the largest context available
+            route = max(candidates, key=lambda r: r.max_input_tokens)
+
+        return route, output_budget(prompt_type, input_tokens)
+
+    def complete(self, messages, prompt_type='general', temperature=0.7, priority='interactive'):
+        """Route and run a chat completion, waiting for the governor to admit it"""
+        route, max_tokens = self.route(messages, prompt_type)
+        reserved = sum(estimate_tokens(m['content']) for m in messages) + max_tokens
+        waited = self.governor.acquire(reserved, priority)
+
+        completion = None
+        try:
+            completion = route.backend.complete(route.model, messages, max_tokens, temperature)
+            completion.queue_wait = waited
+            return completion
+        finally:
+            self.governor.release(reserved, completion.total_tokens if completion else None)
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Hermetic load-test harness for the YouTube Transcript Downloader
+
+Starts a stub server that stands in for both YouTube and OpenAI, launches the
+app against it with a throw-away data directory, drives /api/transcript,
+/api/analyze and /api/prompts with a configurable concurrency and request mix,
+and reports throughput and p50/p95/p99 latency per endpoint. Nothing leaves
+the machine, so serving-mode, caching and pool-size changes can be measured
+on the Pi itself.
+
+The stub serves:
+    GET  /watch?v=<id>                 HTML5 video page with a caption track,
+                                       extracted by yt-dlp's generic extractor
+    GET  /timedtext/<id>.<lang>.vtt    WebVTT captions
+    POST /v1/chat/completions          OpenAI-compatible chat completion
+
+Example:
+    python loadtest.py --concurrency 8 --duration 60 --mix transcript=3,analyze=1,prompts=6
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+APP_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'youtube_transcript_app.py')
+
+WORDS = ("the model learns attention weights over tokens while training data quality "
+         "matters more than size and gradient descent slowly lowers the loss").split()
+
+WATCH_PAGE = """<!DOCTYPE html>
+<html>
+<head><title>Stub Video {video_id}</title></head>
+<body>
+<video controls src="/media/{video_id}.mp4">
+<track kind="captions" src="/timedtext/{video_id}.en.vtt" srclang="en" label="English">
+</video>
+</body>
+</html>
+"""
+
+
+def make_vtt(video_id, cues):
+    """Generate deterministic captions for a stub video"""
+    rng = random.Random(video_id)
+    lines = ['WEBVTT', '']
+    for cue in range(cues):
+        start = cue * 4
+        lines.append(f"{start // 3600:02d}:{start // 60 % 60:02d}:{start % 60:02d}.000 --> "
+                     f"{(start + 4) // 3600:02d}:{(start + 4) // 60 % 60:02d}:{(start + 4) % 60:02d}.000")
+        lines.append(' '.join(rng.choice(WORDS) for _ in range(10)))
+        lines.append('')
+    return '\n'.join(lines)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Request handler for the stub YouTube and OpenAI endpoints"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        config = self.server.config
+        parts = urlparse(self.path)
+
+        if parts.path == '/watch':
+            video_id = parse_qs(parts.query).get('v', [''])[0]
+            time.sleep(config['page_latency'])
+            self._send(200, WATCH_PAGE.format(video_id=video_id), 'text/html')
+        elif parts.path.startswith('/timedtext/'):
+            video_id = parts.path.rsplit('/', 1)[-1].split('.')[0]
+            time.sleep(config['caption_latency'])
+            self._send(200, make_vtt(video_id, config['cues']), 'text/vtt')
+        else:
+            self._send(404, 'not found', 'text/plain')
+
+    def do_POST(self):
+        config = self.server.config
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        if self.path.rstrip('/').endswith('/chat/completions'):
+            request = json.loads(body)
+            prompt_tokens = sum(len(m['content']) for m in request['messages']) // 4
+            time.sleep(max(0.0, random.gauss(config['llm_latency'], config['llm_latency'] / 5)))
+            self._send(200, json.dumps({
+                'id': 'chatcmpl-stub',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': request.get('model', 'stub'),
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': 'Stub analysis of the transcript.'},
+                    'finish_reason': 'stop'
+                }],
+                'usage': {
+                    'prompt_tokens': prompt_tokens,
+                    'completion_tokens': 6,
+                    'total_tokens': prompt_tokens + 6
+                }
+            }), 'application/json')
+        else:
+            self._send(404, 'not found', 'text/plain')
+
+
+def start_stub_server(config, port=0):
+    """Start the stub server on a background thread"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+    server.daemon_threads = True
+    server.config = config
+    threading.Thread(target=server.serve_forever, name='stub', daemon=True).start()
+    return server
+
+
+def start_app(stub_url, port, extra_env):
+    """Launch the app against the stub server with a temporary data directory
+
+    The caller removes the directory once the app has exited.
+    """
+    data_dir = tempfile.mkdtemp(prefix='loadtest-')
+    env = dict(os.environ)
+    env.update({
+        'TRANSCRIPT_DATA_DIR': data_dir,
+        'LLM_BASE_URL': f"{stub_url}/v1",
+        'LLM_MODEL': 'stub-model',
+        'LLM_API_KEY': 'stub',
+        'EMBEDDER': 'local',
+        'PYTHONUNBUFFERED': '1'
+    })
+    env.update(extra_env)
+
+    process = subprocess.Popen(
+        [sys.executable, APP_SCRIPT, 'serve', '--host', '127.0.0.1', '--port', str(port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    return process, data_dir
+
+
+def wait_until_ready(app_url, timeout=60):
+    """Wait until the app answers requests"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"{app_url}/api/prompts", timeout=2):
+                return True
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    return False
+
+
+def call(app_url, method, path, payload=None, timeout=300):
+    """Make one request; returns (status, parsed JSON body or None)"""
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    request = urllib.request.Request(f"{app_url}{path}", data=data, method=method,
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, None
+
+
+class LoadDriver:
+    """Issues the request mix from worker threads and records latencies"""
+
+    def __init__(self, app_url, stub_url, mix, videos, unique_prompts):
+        self.app_url = app_url
+        self.stub_url = stub_url
+        self.kinds = [kind for kind, weight in mix.items() for _ in range(weight)]
+        self.videos = [f"stub{n:07d}" for n in range(videos)]
+        self.unique_prompts = unique_prompts
+        self.transcripts = {}
+        self.lock = threading.Lock()
+        self.latencies = {kind: [] for kind in mix}
+        self.errors = {kind: 0 for kind in mix}
+
+    def _video_url(self, video_id):
+        return f"{self.stub_url}/watch?v={video_id}"
+
+    def _transcript(self, rng):
+        video_id = rng.choice(self.videos)
+        status, body = call(self.app_url, 'POST', '/api/transcript', {'url': self._video_url(video_id)})
+        if status == 200 and body and body.get('success'):
+            with self.lock:
+                self.transcripts[video_id] = body['transcript']
+        return status
+
+    def _analyze(self, rng):
+        with self.lock:
+            transcript = rng.choice(list(self.transcripts.values())) if self.transcripts else None
+        if transcript is None:
+            return self._transcript(rng)
+        prompt = 'Summarize the key points of this video in 3-5 bullet points.'
+        if self.unique_prompts:
+            prompt += f" (run {rng.random()})"
+        status, _ = call(self.app_url, 'POST', '/api/analyze', {'transcript': transcript, 'prompt': prompt})
+        return status
+
+    def _prompts(self, rng):
+        status, _ = call(self.app_url, 'GET', '/api/prompts')
+        return status
+
+    def worker(self, deadline, seed):
+        """Send requests until the deadline"""
+        rng = random.Random(seed)
+        actions = {'transcript': self._transcript, 'analyze': self._analyze, 'prompts': self._prompts}
+        while time.time() < deadline:
+            kind = rng.choice(self.kinds)
+            started = time.perf_counter()
+            try:
+                status = actions[kind](rng)
+            except Exception:
+                status = 0
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                self.latencies[kind].append(elapsed)
+                if status != 200:
+                    self.errors[kind] += 1
+
+    def run(self, concurrency, duration):
+        """Run the load for duration seconds and return the elapsed wall time"""
+        deadline = time.time() + duration
+        threads = [threading.Thread(target=self.worker, args=(deadline, n)) for n in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(driver, elapsed):
+    """Build the report of throughput and latency percentiles"""
+    report = {'elapsed_seconds': round(elapsed, 2), 'endpoints': {}}
+    total = 0
+    for kind, values in driver.latencies.items():
+        values = sorted(values)
+        total += len(values)
+        report['endpoints'][kind] = {
+            'requests': len(values),
+            'errors': driver.errors[kind],
+            'throughput_rps': round(len(values) / elapsed, 2) if elapsed else 0.0,
+            'p50_ms': round(percentile(values, 0.50) * 1000, 1),
+            'p95_ms': round(percentile(values, 0.95) * 1000, 1),
+            'p99_ms': round(percentile(values, 0.99) * 1000, 1)
+        }
+    report['total_requests'] = total
+    report['throughput_rps'] = round(total / elapsed, 2) if elapsed else 0.0
+    return report
+
+
+def print_report(report):
+    """Print the report as a table"""
+    print(f"{'endpoint':<12}{'requests':>10}{'errors':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for kind, stats in report['endpoints'].items():
+        print(f"{kind:<12}{stats['requests']:>10}{stats['errors']:>8}{stats['throughput_rps']:>9}"
+              f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}")
+    print(f"\nTotal: {report['total_requests']} requests in {report['elapsed_seconds']}s "
+          f"({report['throughput_rps']} req/s)")
+
+
+def parse_mix(text):
+    """Parse a request mix like 'transcript=3,analyze=1,prompts=6'"""
+    mix = {}
+    for item in text.split(','):
+        kind, _, weight = item.partition('=')
+        kind = kind.strip()
+        if kind not in ('transcript', 'analyze', 'prompts'):
+            raise argparse.ArgumentTypeError(f"Unknown endpoint in mix: {kind}")
+        if int(weight or 1) > 0:
+            mix[kind] = int(weight or 1)
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Hermetic load test against stub YouTube and OpenAI servers')
+    parser.add_argument('-c', '--concurrency', type=int, default=4, help='Concurrent clients')
+    parser.add_argument('-d', '--duration', type=float, default=30, help='Test duration in seconds')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('transcript=3,analyze=1,prompts=6'),
+                        help='Relative weights of transcript, analyze and prompts requests')
+    parser.add_argument('--videos', type=int, default=50,
+                        help='Distinct stub videos; fewer videos means more cache hits')
+    parser.add_argument('--cues', type=int, default=900, help='Caption cues per video (4 s each)')
+    parser.add_argument('--unique-prompts', action='store_true',
+                        help='Make every analysis prompt unique so none are served from cache')
+    parser.add_argument('--llm-latency', type=float, default=1.0, help='Mean stub chat completion latency (s)')
+    parser.add_argument('--page-latency', type=float, default=0.05, help='Stub watch page latency (s)')
+    parser.add_argument('--caption-latency', type=float, default=0.05, help='Stub caption latency (s)')
+    parser.add_argument('--app-port', type=int, default=8765, help='Port for the app under test')
+    parser.add_argument('--app-url', help='Test an already running app instead of starting one '
+                                          '(it must be configured to use the stub server)')
+    parser.add_argument('--stub-port', type=int, default=0, help='Port for the stub server (default: any)')
+    parser.add_argument('--app-env', action='append', default=[], metavar='KEY=VALUE',
+                        help='Extra environment for the app, e.g. YOUTUBE_RATE=50')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args(argv)
+
+    stub = start_stub_server({
+        'cues': args.cues,
+        'llm_latency': args.llm_latency,
+        'page_latency': args.page_latency,
+        'caption_latency': args.caption_latency
+    }, args.stub_port)
+    stub_url = f"http://127.0.0.1:{stub.server_address[1]}"
+    print(f"Stub server on {stub_url}", file=sys.stderr)
+
+    process = data_dir = None
+    app_url = args.app_url
+    if not app_url:
+        extra_env = dict(item.split('=', 1) for item in args.app_env)
+        # The harness measures the app, not the YouTube rate limits it enforces
+        extra_env.setdefault('YOUTUBE_RATE', '1000')
+        extra_env.setdefault('YOUTUBE_MAX_RATE', '1000')
+        process, data_dir = start_app(stub_url, args.app_port, extra_env)
+        app_url = f"http://127.0.0.1:{args.app_port}"
+        print(f"App on {app_url} (data in {data_dir})", file=sys.stderr)
+
+    try:
+        started = time.perf_counter()
+        if not wait_until_ready(app_url):
+            print("App did not become ready", file=sys.stderr)
+            return 1
+        print(f"App ready after {time.perf_counter() - started:.2f}s; "
+              f"running {args.concurrency} clients for {args.duration:.0f}s", file=sys.stderr)
+
+        driver = LoadDriver(app_url, stub_url, args.mix, args.videos, args.unique_prompts)
+        elapsed = driver.run(args.concurrency, args.duration)
+        report = summarize(driver, elapsed)
+
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            print_report(report)
+        return 0
+    finally:
+        if process:
+            process.terminate()
+            process.wait(timeout=10)
+        if data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+        stub.shutdown()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
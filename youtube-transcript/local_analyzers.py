@@ -0,0 +1,244 @@
+"""
+Local analyzers that answer some prompts without an LLM
+
+An analyzer is a plain function over a transcript's timed segments that
+returns markdown, or None when it finds nothing to report. Saved prompts can
+be bound to an analyzer by name, with a mode:
+
+    local    - answer with the analyzer only
+    fallback - answer with the analyzer, asking the LLM only if it found nothing
+    augment  - give the analyzer's findings to the LLM along with the prompt
+
+New analyzers are added to the registry with the @analyzer decorator.
+"""
+
+import re
+from bisect import bisect_right
+from collections import Counter
+
+from segment_index import format_time
+
+ANALYZER_MODES = ('local', 'fallback', 'augment')
+
+ANALYZERS = {}
+
+
+class Analyzer:
+    """A registered local analyzer"""
+
+    def __init__(self, name, description, fn, needs_times=False):
+        self.name = name
+        self.description = description
+        self.fn = fn
+        self.needs_times = needs_times
+
+    def run(self, segments, chapters=None):
+        """Markdown findings for the segments, or None if there is nothing to report"""
+        if self.needs_times and not any(s['start'] is not None for s in segments):
+            return None
+        return self.fn(segments, chapters or [])
+
+
+def analyzer(name, description, needs_times=False):
+    """Decorator registering fn(segments, chapters) as a local analyzer"""
+    def register(fn):
+        ANALYZERS[name] = Analyzer(name, description, fn, needs_times)
+        return fn
+    return register
+
+
+TIMESTAMP_RE = re.compile(r'\[(\d+):(\d{2})\]\s*')
+
+
+def segments_from_text(text):
+    """Segments from transcript text, using [MM:SS] markers when it has them
+
+    Text without markers becomes a single segment with unknown times.
+    """
+    markers = list(TIMESTAMP_RE.finditer(text))
+    if not markers:
+        return [{'start': None, 'end': None, 'text': text.strip()}] if text.strip() else []
+
+    segments = []
+    for number, marker in enumerate(markers):
+        end_offset = markers[number + 1].start() if number + 1 < len(markers) else len(text)
+        start = int(marker.group(1)) * 60 + int(marker.group(2))
+        segments.append({'start': float(start), 'end': None, 'text': text[marker.end():end_offset].strip()})
+    for segment, following in zip(segments, segments[1:]):
+        segment['end'] = following['start']
+    return segments
+
+
+def stamp(seconds):
+    """Timestamp prefix for a finding, empty when the time is unknown"""
+    return f"[{format_time(seconds)}] " if seconds is not None else ''
+
+
+class JoinedText:
+    """Segments joined into one string, mapping character offsets back to start times"""
+
+    def __init__(self, segments):
+        self.offsets = []
+        self.starts = []
+        parts = []
+        offset = 0
+        for segment in segments:
+            self.offsets.append(offset)
+            self.starts.append(segment['start'])
+            parts.append(segment['text'])
+            offset += len(segment['text']) + 1
+        self.text = ' '.join(parts)
+
+    def time_at(self, offset):
+        """Start time of the segment containing a character offset"""
+        index = bisect_right(self.offsets, offset) - 1
+        return self.starts[index] if index >= 0 else None
+
+    def context(self, start, end, width=40):
+        """The match with some surrounding words"""
+        left = self.text.rfind(' ', 0, max(0, start - width)) + 1
+        right = self.text.find(' ', min(len(self.text), end + width))
+        snippet = self.text[left:right if right != -1 else len(self.text)].strip()
+        return f"{'...' if left > 0 else ''}{snippet}{'...' if right != -1 else ''}"
+
+
+MONTHS = (r'(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|June?|July?|Aug(?:ust)?|'
+          r'Sep(?:t(?:ember)?)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)')
+NUMBER = r'\d[\d,]*(?:\.\d+)?'
+SCALE = r'(?:\s?(?:k|K|thousand|million|billion|trillion|[mb]n))?'
+
+NUMERIC_PATTERNS = [
+    ('Percentages', re.compile(rf'{NUMBER}\s?(?:%|percent\b|per cent\b|percentage points?\b)', re.I)),
+    ('Money', re.compile(rf'(?:[$€£¥]\s?{NUMBER}{SCALE}\b|{NUMBER}{SCALE}\s(?:dollars|euros|pounds|yen)\b)', re.I)),
+    ('Dates', re.compile(
+        rf'\b(?:{MONTHS}\.?\s+\d{{1,2}}(?:st|nd|rd|th)?(?:,?\s+\d{{4}})?|'
+        rf'\d{{1,2}}(?:st|nd|rd|th)?\s+(?:of\s+)?{MONTHS}(?:,?\s+\d{{4}})?|'
+        rf'{MONTHS}\s+\d{{4}}|\d{{4}}-\d{{2}}-\d{{2}}|(?:1[6-9]|20)\d{{2}}s?)\b')),
+    ('Other numbers', re.compile(rf'\b{NUMBER}{SCALE}\b', re.I))
+]
+
+MAX_FINDINGS_PER_KIND = 40
+
+
+@analyzer('numeric_facts', 'Numbers, percentages, money and dates with timestamps and context')
+def numeric_facts(segments, chapters):
+    joined = JoinedText(segments)
+    taken = []
+    sections = []
+    for kind, pattern in NUMERIC_PATTERNS:
+        findings = []
+        for match in pattern.finditer(joined.text):
+            start, end = match.span()
+            # Single digits are mostly counting words ("step 1", "2 ways")
+            if len(match.group(0)) == 1:
+                continue
+            # Each span is reported under the first kind that matched it
+            if any(start < t_end and end > t_start for t_start, t_end in taken):
+                continue
+            taken.append((start, end))
+            findings.append(f"- {stamp(joined.time_at(start))}**{match.group(0).strip()}**: "
+                            f"{joined.context(start, end)}")
+        if findings:
+            extra = len(findings) - MAX_FINDINGS_PER_KIND
+            lines = findings[:MAX_FINDINGS_PER_KIND] + ([f"- ...and {extra} more"] if extra > 0 else [])
+            sections.append(f"**{kind}**\n" + '\n'.join(lines))
+
+    if not sections:
+        return None
+    return '## Numbers and statistics\n\n' + '\n\n'.join(sections)
+
+
+STOPWORDS = set("""
+a about above after again against all also am an and any are aren't as at be because been before being
+below between both but by can can't cannot could couldn't did didn't do does doesn't doing don't down
+during each even few for from further get gets getting go goes going gonna got had hasn't has have
+haven't having he he'd he'll he's her here here's hers herself him himself his how how's i i'd i'll
+i'm i've if in into is isn't it it's its itself just kind know let let's like lot make many me might
+more most much must my myself need no nor not now of off oh okay on once one only or other our ours
+ourselves out over own pretty quite really right said same say says see she she'd she'll she's should
+shouldn't so some something still such sure take than that that's the their theirs them themselves
+then there there's these they they'd they'll they're they've thing things think this those though
+through to too um uh under until up us very via want wanna was wasn't way we we'd we'll we're we've
+well were weren't what what's when when's where where's whether which while who who's whom why why's
+will with won't would wouldn't yeah yes yet you you'd you'll you're you've your yours yourself
+yourselves actually basically
+""".split())
+
+WORD_RE = re.compile(r"[a-z][a-z'-]*[a-z]|[a-z]")
+
+
+@analyzer('keyword_frequency', 'Most frequent keywords and phrases with their first mention')
+def keyword_frequency(segments, chapters):
+    words = Counter()
+    phrases = Counter()
+    first_seen = {}
+    for segment in segments:
+        tokens = WORD_RE.findall(segment['text'].lower())
+        for token, following in zip(tokens, tokens[1:] + [None]):
+            if token in STOPWORDS or len(token) < 3:
+                continue
+            words[token] += 1
+            first_seen.setdefault(token, segment['start'])
+            if following and following not in STOPWORDS and len(following) >= 3:
+                phrase = f"{token} {following}"
+                phrases[phrase] += 1
+                first_seen.setdefault(phrase, segment['start'])
+
+    if not words:
+        return None
+    lines = ['## Keywords', '', '| Keyword | Mentions | First mention |', '|---|---|---|']
+    lines += [f"| {word} | {count} | {format_time(first_seen[word]) if first_seen[word] is not None else '-'} |"
+              for word, count in words.most_common(20)]
+    repeated = [(phrase, count) for phrase, count in phrases.most_common(10) if count > 1]
+    if repeated:
+        lines += ['', '**Recurring phrases**']
+        lines += [f"- {stamp(first_seen[phrase])}{phrase} ({count}x)" for phrase, count in repeated]
+    return '\n'.join(lines)
+
+
+WINDOW_SECONDS = 300
+PAUSE_SECONDS = 3.0
+
+
+def words_per_minute(segments):
+    words = sum(len(s['text'].split()) for s in segments)
+    span = (segments[-1]['end'] or segments[-1]['start']) - segments[0]['start'] if segments else 0
+    return words, (words * 60 / span if span > 0 else None)
+
+
+@analyzer('speaking_rate', 'Words per minute overall and per chapter or 5-minute window, and long pauses',
+          needs_times=True)
+def speaking_rate(segments, chapters):
+    segments = [s for s in segments if s['start'] is not None]
+    words, rate = words_per_minute(segments)
+    if not rate:
+        return None
+
+    if chapters:
+        parts = [(f"Chapter {number}: {chapter['title']}",
+                  [s for s in segments if chapter['start'] <= s['start'] < chapter['end']])
+                 for number, chapter in enumerate(chapters, 1)]
+    else:
+        windows = {}
+        for segment in segments:
+            windows.setdefault(int(segment['start'] // WINDOW_SECONDS), []).append(segment)
+        parts = [(f"{format_time(window * WINDOW_SECONDS)}-{format_time((window + 1) * WINDOW_SECONDS)}", part)
+                 for window, part in sorted(windows.items())]
+
+    lines = ['## Speaking rate', '',
+             f"- Words: {words}",
+             f"- Average: {rate:.0f} words per minute", '',
+             '| Part | Words | Words per minute |', '|---|---|---|']
+    for label, part in parts:
+        part_words, part_rate = words_per_minute(part)
+        lines.append(f"| {label} | {part_words} | {f'{part_rate:.0f}' if part_rate else '-'} |")
+
+    pauses = []
+    for segment, following in zip(segments, segments[1:]):
+        gap = following['start'] - (segment['end'] or segment['start'])
+        if gap >= PAUSE_SECONDS:
+            pauses.append((gap, segment['end'] or segment['start']))
+    if pauses:
+        lines += ['', '**Longest pauses**']
+        lines += [f"- {stamp(at)}{gap:.1f}s" for gap, at in sorted(pauses, reverse=True)[:5]]
+    return '\n'.join(lines)
@@ -0,0 +1,185 @@
+"""
+Resident memory budget and allocation tracing
+
+A monitor thread samples the resident set size of this process and its child
+processes (yt-dlp workers) from /proc and compares it with the budget. When
+the pressure level changes between 'normal', 'high' and 'critical' a callback
+is run so the app can shrink caches, lower concurrency and recycle workers;
+levels drop again only once usage is clearly below the threshold, so the app
+does not flap around it.
+
+tracemalloc can be switched on at runtime to report which source lines hold
+the most Python memory.
+"""
+
+import ctypes
+import ctypes.util
+import gc
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+LEVELS = ('normal', 'high', 'critical')
+
+
+def rss_bytes(pid='self'):
+    """Resident set size of a process from /proc/<pid>/statm, or None"""
+    try:
+        with open(f'/proc/{pid}/statm', 'r') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def descendant_pids(root=None):
+    """PIDs of all processes below root (default: this process)"""
+    root = root or os.getpid()
+    children = {}
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        return []
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', 'r') as f:
+                # The command name may contain spaces, so split after its closing paren
+                ppid = int(f.read().rpartition(')')[2].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    pids = []
+    pending = [root]
+    while pending:
+        for child in children.get(pending.pop(), []):
+            pids.append(child)
+            pending.append(child)
+    return pids
+
+
+def deep_sizeof(obj, seen=None):
+    """Approximate memory held by a structure of dicts, lists and scalars"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    return size
+
+
+def release_free_memory():
+    """Collect garbage and ask glibc to return freed heap pages to the system"""
+    gc.collect()
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6')
+        libc.malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def top_allocations(limit=20, group_by='lineno'):
+    """Largest tracemalloc allocation sites, or None when tracing is off"""
+    if not tracemalloc.is_tracing():
+        return None
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>')
+    ))
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        'traced_bytes': current,
+        'peak_bytes': peak,
+        'frames': tracemalloc.get_traceback_limit(),
+        'top': [{
+            'size_bytes': stat.size,
+            'count': stat.count,
+            'traceback': [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback]
+        } for stat in snapshot.statistics(group_by)[:limit]]
+    }
+
+
+class MemoryBudget:
+    """Samples resident memory and reports changes of the pressure level"""
+
+    def __init__(self, limit, on_level_change, high=0.8, critical=0.95, recover=0.9, interval=5.0):
+        self.limit = limit
+        self.on_level_change = on_level_change
+        self.high = high
+        self.critical = critical
+        self.recover = recover
+        self.interval = interval
+        self.level = 'normal'
+        self._lock = threading.Lock()
+        self._last = {'rss_bytes': None, 'children_rss_bytes': 0, 'sampled_at': None}
+        self._peak = 0
+        self._changes = []
+
+    def _threshold(self, level):
+        return {'normal': 0.0, 'high': self.high, 'critical': self.critical}[level] * self.limit
+
+    def _level_for(self, used):
+        """New level for a usage, rising at once but falling only below recover x threshold"""
+        level = 'normal'
+        for candidate in ('high', 'critical'):
+            threshold = self._threshold(candidate)
+            if LEVELS.index(candidate) <= LEVELS.index(self.level):
+                threshold *= self.recover
+            if used >= threshold:
+                level = candidate
+        return level
+
+    def sample(self):
+        """Measure memory now and run the callback if the level changed; returns the level"""
+        own = rss_bytes() or 0
+        children = sum(rss_bytes(pid) or 0 for pid in descendant_pids())
+        used = own + children
+
+        with self._lock:
+            self._last = {'rss_bytes': own, 'children_rss_bytes': children, 'sampled_at': time.time()}
+            self._peak = max(self._peak, used)
+            previous, self.level = self.level, self._level_for(used)
+            if self.level != previous:
+                self._changes.append({'level': self.level, 'used_bytes': used, 'at': time.time()})
+                del self._changes[:-20]
+
+        if self.level != previous:
+            print(f"Memory {self.level}: {used / 1048576:.0f} MiB of {self.limit / 1048576:.0f} MiB budget")
+            self.on_level_change(self.level)
+            if LEVELS.index(self.level) > LEVELS.index(previous):
+                release_free_memory()
+        return self.level
+
+    def _run(self):
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"Memory budget check failed: {e}")
+            time.sleep(self.interval)
+
+    def start(self):
+        """Start sampling on a daemon thread"""
+        threading.Thread(target=self._run, name='memory-budget', daemon=True).start()
+
+    def state(self):
+        """Budget, latest sample, peak and recent level changes"""
+        with self._lock:
+            return {
+                'limit_bytes': self.limit,
+                'level': self.level,
+                'high_bytes': int(self._threshold('high')),
+                'critical_bytes': int(self._threshold('critical')),
+                'peak_bytes': self._peak,
+                'level_changes': list(self._changes),
+                **self._last
+            }
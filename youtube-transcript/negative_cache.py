@@ -0,0 +1,128 @@
+"""
+Negative cache for transcript fetches that are known to fail
+
+Videos without captions, private or removed videos and URLs yt-dlp cannot
+handle fail the same way every time, yet each retry costs a full yt-dlp
+extraction. Such failures are classified from their error message and
+remembered for a per-class TTL, and requests for them are answered from here
+until the entry expires. Transient failures (network errors, throttling,
+server errors) are never cached.
+
+Each class has a scope: 'url' failures are keyed by the requested URL,
+'video' failures by video ID and 'lang' failures by video ID and caption
+language, since a video without German captions may still have English ones.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# (class, HTTP status, scope, message pattern), checked in order
+FAILURE_CLASSES = [
+    ('invalid', 400, 'url', re.compile(
+        r'Unsupported URL|is not a valid URL|Incomplete YouTube ID|Invalid URL', re.I)),
+    ('private', 403, 'video', re.compile(r'Private video|video is private', re.I)),
+    ('age_restricted', 403, 'video', re.compile(
+        r'confirm your age|age-restricted|inappropriate for some users', re.I)),
+    ('members_only', 403, 'video', re.compile(r'members-only|Join this channel', re.I)),
+    ('not_started', 404, 'video', re.compile(r'live event will begin|Premieres in', re.I)),
+    ('removed', 404, 'video', re.compile(
+        r'Video unavailable|video is unavailable|been removed|no longer available|account .*terminated|'
+        r'copyright claim|Could not retrieve video information', re.I)),
+    ('no_captions', 404, 'lang', re.compile(
+        r'No subtitles or transcripts available|Could not find downloadable subtitle format', re.I))
+]
+
+# Seconds each class is remembered; captions and premieres appear on their own
+DEFAULT_TTLS = {
+    'invalid': 86400,
+    'private': 3600,
+    'age_restricted': 3600,
+    'members_only': 3600,
+    'not_started': 300,
+    'removed': 21600,
+    'no_captions': 1800
+}
+
+
+def classify_failure(message):
+    """(class, status, scope) for a deterministic failure message, or None"""
+    for error_class, status, scope, pattern in FAILURE_CLASSES:
+        if pattern.search(message):
+            return error_class, status, scope
+    return None
+
+
+def clean_message(message):
+    """yt-dlp error text without its "ERROR: [extractor] id:" prefix"""
+    message = re.sub(r'^ERROR:\s*', '', message)
+    return re.sub(r'^\[[\w:]+\]\s*[\w-]+:\s*', '', message).strip()
+
+
+class NegativeCache:
+    """Failures remembered until their class's TTL runs out"""
+
+    def __init__(self, ttls=None, max_items=10000):
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._stats = {'hits': 0, 'stored': 0}
+
+    def get(self, *keys):
+        """The first unexpired entry among keys, or None"""
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry['expires_at'] <= now:
+                    del self._entries[key]
+                    continue
+                self._stats['hits'] += 1
+                return entry
+        return None
+
+    def put(self, key, video_id, error_class, status, message):
+        """Remember a failure; returns the entry, or None when its class has no TTL"""
+        ttl = self.ttls.get(error_class, 0)
+        if ttl <= 0:
+            return None
+        entry = {
+            'video_id': video_id,
+            'error': message,
+            'error_class': error_class,
+            'status': status,
+            'expires_at': time.time() + ttl
+        }
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            self._stats['stored'] += 1
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+        return entry
+
+    def forget(self, video_id):
+        """Drop every entry for a video; returns how many were removed"""
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if entry['video_id'] == video_id]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def state(self):
+        """TTLs, counters and the unexpired entries"""
+        now = time.time()
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry['expires_at'] <= now]:
+                del self._entries[key]
+            return {
+                'ttls': dict(self.ttls),
+                'items': len(self._entries),
+                **self._stats,
+                'entries': [{'key': key, **entry, 'expires_in': round(entry['expires_at'] - now)}
+                            for key, entry in self._entries.items()]
+            }
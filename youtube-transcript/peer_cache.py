@@ -0,0 +1,140 @@
+"""
+Peer cache sharing between instances
+
+On a local cache miss an instance asks its configured peers for the entry by
+cache key before going to YouTube or the LLM, so several nodes act as one
+larger cache. Peers answer only from their own local stores and never ask
+their peers in turn, so lookups cannot loop.
+
+Peers share a secret. Every request is signed with an HMAC of the store, key
+and current time, and is refused unless the signature checks out and is
+recent, so only peers can read cached entries. Every response carries a
+digest of its body: SHA-256, or HMAC-SHA256 when a shared secret is
+configured. Entries whose digest does not match, or which fail the caller's
+validation, are discarded. Timeouts are short, and a peer
+that fails is skipped for a while rather than slowing every miss.
+"""
+
+import hashlib
+import hmac
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+DIGEST_HEADER = 'X-Cache-Digest'
+AUTH_HEADER = 'X-Peer-Auth'
+# Seconds a request signature stays valid, allowing for clock skew between nodes
+AUTH_WINDOW = 60
+
+
+def body_digest(body, secret=None):
+    """Digest of a response body, keyed when a shared secret is set"""
+    if secret:
+        return 'hmac-sha256=' + hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    return 'sha256=' + hashlib.sha256(body).hexdigest()
+
+
+def request_auth(store, key, secret, timestamp=None):
+    """Signature header value for a peer request: <unix time>:<HMAC of store/key/time>"""
+    timestamp = int(time.time() if timestamp is None else timestamp)
+    message = f"{store}/{key}/{timestamp}".encode('utf-8')
+    return f"{timestamp}:{hmac.new(secret.encode('utf-8'), message, hashlib.sha256).hexdigest()}"
+
+
+def check_request_auth(value, store, key, secret, window=AUTH_WINDOW):
+    """Whether a peer request's signature header is valid and recent"""
+    try:
+        timestamp = int(value.split(':', 1)[0])
+    except (AttributeError, ValueError):
+        return False
+    if abs(time.time() - timestamp) > window:
+        return False
+    return hmac.compare_digest(value, request_auth(store, key, secret, timestamp))
+
+
+def encode_entry(entry, secret=None):
+    """Serialize a cache entry for a peer; returns (body, digest)"""
+    body = json.dumps(entry).encode('utf-8')
+    return body, body_digest(body, secret)
+
+
+class PeerCache:
+    """Looks up cache entries on peer instances"""
+
+    def __init__(self, peers, timeout=0.5, secret=None, retry_after=30):
+        self.peers = [peer.rstrip('/') for peer in peers]
+        self.timeout = timeout
+        self.secret = secret
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+        self._down_until = {}
+        self._stats = {peer: {'hits': 0, 'misses': 0, 'errors': 0, 'rejected': 0} for peer in self.peers}
+
+    def _count(self, peer, outcome):
+        with self._lock:
+            self._stats[peer][outcome] += 1
+
+    def _available(self, peer):
+        with self._lock:
+            return self._down_until.get(peer, 0) <= time.monotonic()
+
+    def _mark_down(self, peer):
+        with self._lock:
+            self._down_until[peer] = time.monotonic() + self.retry_after
+
+    def fetch(self, store, key, validate=None):
+        """Return the first valid entry a peer holds for key, or None
+
+        validate(entry) may reject an entry that does not belong to the key.
+        """
+        for peer in self.peers:
+            if not self._available(peer):
+                continue
+            request = urllib.request.Request(f"{peer}/api/peer/{store}/{key}")
+            if self.secret:
+                request.add_header(AUTH_HEADER, request_auth(store, key, self.secret))
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    body = response.read()
+                    digest = response.headers.get(DIGEST_HEADER, '')
+            except urllib.error.HTTPError as e:
+                self._count(peer, 'misses' if e.code == 404 else 'errors')
+                continue
+            except (urllib.error.URLError, OSError) as e:
+                print(f"Peer {peer} unavailable: {e}")
+                self._count(peer, 'errors')
+                self._mark_down(peer)
+                continue
+
+            if not hmac.compare_digest(digest, body_digest(body, self.secret)):
+                print(f"Peer {peer}: digest mismatch for {store}/{key}")
+                self._count(peer, 'rejected')
+                continue
+            try:
+                entry = json.loads(body)
+            except ValueError:
+                self._count(peer, 'rejected')
+                continue
+            if validate and not validate(entry):
+                self._count(peer, 'rejected')
+                continue
+
+            self._count(peer, 'hits')
+            return entry
+        return None
+
+    def state(self):
+        """Peers, whether each is being skipped, and lookup counts"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                'timeout': self.timeout,
+                'signed': bool(self.secret),
+                'peers': [{
+                    'url': peer,
+                    'skipped_for_seconds': max(0, round(self._down_until.get(peer, 0) - now, 1)),
+                    **self._stats[peer]
+                } for peer in self.peers]
+            }
@@ -0,0 +1,96 @@
+"""
+Time-indexed access to transcript segments and chapters
+
+Caption segments are kept sorted by start time, so a time range or a chapter
+is found with two binary searches over the start times rather than a scan of
+the whole transcript. Long videos can then be read, or sent to the LLM, one
+part at a time.
+"""
+
+import re
+from bisect import bisect_left, bisect_right
+
+TIME_RE = re.compile(r'^(?:(\d+):)?(?:(\d+):)?(\d+(?:\.\d+)?)$')
+
+
+def parse_time(value):
+    """Seconds from a number or a timestamp like 1:20:00 or 04:30; None if invalid"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value) if value >= 0 else None
+    match = TIME_RE.match(str(value).strip())
+    if not match:
+        return None
+    parts = [part for part in match.groups() if part is not None]
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def format_time(seconds):
+    """Format seconds as H:MM:SS, or M:SS under an hour"""
+    total = int(seconds)
+    hours, minutes, secs = total // 3600, total // 60 % 60, total % 60
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+
+def video_chapters(info):
+    """Chapters from a yt-dlp info dict as {'title', 'start', 'end'} dicts"""
+    chapters = []
+    duration = info.get('duration') or 0
+    raw = sorted(info.get('chapters') or [], key=lambda c: c.get('start_time') or 0)
+    for number, chapter in enumerate(raw):
+        start = float(chapter.get('start_time') or 0)
+        end = chapter.get('end_time')
+        if end is None:
+            end = raw[number + 1].get('start_time') if number + 1 < len(raw) else duration
+        chapters.append({
+            'title': chapter.get('title') or f"Chapter {number + 1}",
+            'start': start,
+            'end': float(end or start)
+        })
+    return chapters
+
+
+def chapter_at(chapters, time):
+    """Index of the chapter containing time, or None"""
+    number = bisect_right([c['start'] for c in chapters], time) - 1
+    if number >= 0 and time < chapters[number]['end']:
+        return number
+    return None
+
+
+class SegmentIndex:
+    """Binary-search index over a transcript's segments"""
+
+    def __init__(self, segments):
+        self.source = segments
+        self.segments = []
+        self.starts = []
+        self.sync()
+
+    def sync(self):
+        """Index segments appended to the source since the last call, as live transcripts grow"""
+        new = self.source[len(self.segments):]
+        if not new:
+            return
+        starts = [s['start'] for s in new]
+        ordered = self.starts[-1:] + starts
+        if any(a > b for a, b in zip(ordered, ordered[1:])):
+            # Captions are normally in order already; only sort when they are not
+            self.segments = sorted(self.source, key=lambda s: s['start'])
+            self.starts = [s['start'] for s in self.segments]
+        else:
+            self.segments.extend(new)
+            self.starts.extend(starts)
+
+    def range(self, start=None, end=None):
+        """Segments overlapping [start, end); either bound may be None"""
+        lo = 0
+        if start is not None:
+            lo = bisect_left(self.starts, start)
+            # A cue that began just before start may still be running
+            if lo > 0 and self.segments[lo - 1]['end'] > start:
+                lo -= 1
+        hi = len(self.starts) if end is None else bisect_left(self.starts, end)
+        return self.segments[lo:max(lo, hi)]
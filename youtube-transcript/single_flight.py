@@ -0,0 +1,87 @@
+"""
+Single-flight deduplication of concurrent calls
+
+While a call for a key is running, further callers for the same key wait for
+its result instead of starting their own. A speculative prefetch and the real
+request that follows it therefore share one yt-dlp extraction. Progress
+stages reported by the running call are passed on to every waiting caller,
+so a request that joins late still sees the stages it has not missed.
+"""
+
+import threading
+from concurrent.futures import Future
+
+
+class _Flight:
+    """One running call and the callers waiting for it"""
+
+    def __init__(self):
+        self.future = Future()
+        self.listeners = []
+        self.stage = None
+        self.joined = 0
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time and shares its outcome"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._stats = {'calls': 0, 'joined': 0}
+
+    def running(self, key):
+        """Whether a call for key is in progress"""
+        with self._lock:
+            return key in self._flights
+
+    def _report(self, flight, stage):
+        with self._lock:
+            flight.stage = stage
+            listeners = list(flight.listeners)
+        for listener in listeners:
+            try:
+                listener(stage)
+            except Exception as e:
+                print(f"Progress callback failed: {e}")
+
+    def do(self, key, fn, progress=None):
+        """Run fn(progress) for key, or wait for the call already running
+
+        Returns a (result, shared) tuple; shared is True when the result came
+        from another caller's call. Exceptions are shared the same way.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self._stats['calls'] += 1
+            else:
+                flight.joined += 1
+                self._stats['joined'] += 1
+            if progress:
+                flight.listeners.append(progress)
+            stage = flight.stage
+
+        if not leader:
+            if progress and stage:
+                progress(stage)
+            return flight.future.result(), True
+
+        try:
+            result = fn(lambda stage: self._report(flight, stage))
+        except BaseException as e:
+            flight.future.set_exception(e)
+            raise
+        else:
+            flight.future.set_result(result)
+        finally:
+            with self._lock:
+                del self._flights[key]
+        return result, False
+
+    def stats(self):
+        """Calls started, callers that joined a running call, and keys in flight"""
+        with self._lock:
+            return {'in_flight': len(self._flights), **self._stats}
@@ -0,0 +1,223 @@
+"""
+Incremental subtitle parsing
+
+Caption tracks are read from a text stream a chunk at a time and segments are
+yielded as soon as they are decoded, so the raw track is never held in memory
+as a whole. YouTube's json3 format is scanned one event at a time with
+JSONDecoder.raw_decode over a small rolling buffer; VTT and SRT are parsed
+line by line.
+"""
+
+import io
+import itertools
+import json
+import re
+import time
+
+CHUNK_SIZE = 65536
+
+_decoder = json.JSONDecoder()
+_whitespace = re.compile(r'\s*')
+
+
+def parse_cue_time(text):
+    """Convert a VTT/SRT cue time like 01:02:03.450 or 02:03,450 to seconds"""
+    match = re.search(r'(?:(\d+):)?(\d{1,2}):(\d{2})(?:[.,](\d{1,3}))?', text)
+    if not match:
+        return 0.0
+    hours, minutes, seconds, millis = match.groups()
+    return (int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds)
+            + int((millis or '0').ljust(3, '0')) / 1000)
+
+
+class CountingReader(io.RawIOBase):
+    """Binary stream wrapper counting the bytes read and the time spent waiting for them
+
+    Since parsing happens between reads, the rest of the elapsed time is
+    parse time.
+    """
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.bytes = 0
+        self.read_time = 0.0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        started = time.perf_counter()
+        count = self.raw.readinto(buffer)
+        self.read_time += time.perf_counter() - started
+        self.bytes += count or 0
+        return count
+
+
+class _JsonScanner:
+    """Reads JSON values one at a time from an iterable of text chunks"""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = ''
+        self.pos = 0
+
+    def _fill(self):
+        """Append the next chunk, dropping what has been consumed; False at the end"""
+        chunk = next(self.chunks, '')
+        if not chunk:
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character, or '' at the end of input"""
+        while True:
+            self.pos = _whitespace.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} in JSON captions")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete value, reading more input as needed"""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise ValueError('Truncated or invalid JSON captions')
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def json3_segment(event, after=None):
+    """Segment for one json3 event, or None if it has no text or starts too early"""
+    start = event.get('tStartMs', 0) / 1000
+    if after is not None and start <= after:
+        return None
+    texts = []
+    for seg in event.get('segs') or []:
+        if 'utf8' in seg:
+            # Remove newline characters within segments
+            text = seg['utf8'].strip().replace('\n', ' ')
+            if text:
+                texts.append(text)
+    if not texts:
+        return None
+    return {
+        'start': start,
+        'end': start + event.get('dDurationMs', 0) / 1000,
+        'text': ' '.join(texts)
+    }
+
+
+def iter_json3_segments(chunks, after=None):
+    """Yield segments from json3 text chunks, decoding one event at a time
+
+    Top-level values other than "events" (pens, window styles) are decoded
+    and discarded as they are reached.
+    """
+    scanner = _JsonScanner(chunks)
+    scanner.expect('{')
+    while True:
+        char = scanner.peek()
+        if char in ('}', ''):
+            return
+        if char == ',':
+            scanner.pos += 1
+            continue
+        key = scanner.value()
+        scanner.expect(':')
+        if key != 'events':
+            scanner.value()
+            continue
+
+        scanner.expect('[')
+        while True:
+            char = scanner.peek()
+            if char == ']':
+                scanner.pos += 1
+                break
+            if char == ',':
+                scanner.pos += 1
+                continue
+            if not char:
+                raise ValueError('Truncated JSON captions')
+            event = scanner.value()
+            segment = json3_segment(event, after) if isinstance(event, dict) else None
+            if segment:
+                yield segment
+
+
+def iter_lines(chunks):
+    """Yield lines from text chunks without joining the chunks"""
+    pending = ''
+    for chunk in chunks:
+        lines = (pending + chunk).split('\n')
+        pending = lines.pop()
+        yield from lines
+    if pending:
+        yield pending
+
+
+def iter_cue_segments(lines, after=None):
+    """Yield segments from VTT or SRT lines as each cue is completed"""
+    current = None
+    for line in lines:
+        line = line.strip()
+
+        # Check for timestamp line (format: 00:00:15.000 --> 00:00:18.000)
+        if '-->' in line:
+            if current and current['texts'] and (after is None or current['start'] > after):
+                yield {'start': current['start'], 'end': current['end'], 'text': ' '.join(current['texts'])}
+            start_text, _, end_text = line.partition('-->')
+            current = {
+                'start': parse_cue_time(start_text),
+                'end': parse_cue_time(end_text),
+                'texts': []
+            }
+            continue
+
+        # Skip empty lines and VTT headers
+        if not line or line.startswith('WEBVTT') or line.isdigit():
+            continue
+
+        # Skip lines that are just timestamps
+        if re.match(r'^\d{2}:\d{2}:\d{2}', line):
+            continue
+
+        # Remove HTML tags
+        line = re.sub(r'<[^>]+>', '', line)
+
+        if line:
+            if current is None:
+                current = {'start': 0.0, 'end': 0.0, 'texts': []}
+            current['texts'].append(line)
+
+    if current and current['texts'] and (after is None or current['start'] > after):
+        yield {'start': current['start'], 'end': current['end'], 'text': ' '.join(current['texts'])}
+
+
+def iter_subtitle_segments(stream, after=None, chunk_size=CHUNK_SIZE):
+    """Yield segments from a text stream of json3, VTT or SRT captions
+
+    The format is detected from the first character. With after, only
+    segments starting later than that many seconds are yielded.
+    """
+    chunks = iter(lambda: stream.read(chunk_size), '')
+    first = next(chunks, '')
+    chunks = itertools.chain([first], chunks)
+    if first.lstrip().startswith('{'):
+        return iter_json3_segments(chunks, after)
+    return iter_cue_segments(iter_lines(chunks), after)
@@ -0,0 +1,204 @@
+"""
+Adaptive outbound request governor for YouTube traffic
+
+All yt-dlp extractions and subtitle downloads pass through one governor that
+combines a token bucket (request rate) with an AIMD concurrency limit:
+successful requests slowly raise both the rate and the number of requests in
+flight, while a 429/403 halves them and honours any Retry-After. Throttled
+calls are retried with full-jitter exponential backoff so retries from
+concurrent requests do not arrive in bursts.
+"""
+
+import math
+import random
+import re
+import threading
+import time
+import urllib.error
+
+# yt-dlp reports HTTP failures inside DownloadError messages
+YTDLP_HTTP_ERROR_RE = re.compile(r'HTTP Error (429|403)')
+
+THROTTLE_STATUSES = (429, 403)
+
+
+class ThrottledError(Exception):
+    """Raised when YouTube is throttling us and retries are exhausted"""
+
+    def __init__(self, retry_after, message=None):
+        message = message or f"YouTube is rate limiting requests; retry in {math.ceil(retry_after)}s"
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class BackpressureError(ThrottledError):
+    """Raised when a call waited too long for the governor's own rate or concurrency limit"""
+
+    def __init__(self, retry_after):
+        super().__init__(retry_after, f"Too many YouTube requests queued locally; retry in {math.ceil(retry_after)}s")
+
+
+def parse_retry_after(value):
+    """Parse a Retry-After header given in seconds; HTTP dates are ignored"""
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_throttle(exc):
+    """Return (throttled, retry_after) for an exception from an outbound call"""
+    if isinstance(exc, urllib.error.HTTPError):
+        if exc.code in THROTTLE_STATUSES:
+            return True, parse_retry_after(exc.headers.get('Retry-After') if exc.headers else None)
+        return False, None
+
+    # yt-dlp wraps the original networking error in DownloadError.exc_info
+    cause = getattr(exc, 'exc_info', None)
+    cause = cause[1] if cause else None
+    response = getattr(cause, 'response', None)
+    status = getattr(cause, 'status', None) or getattr(response, 'status', None)
+    if status in THROTTLE_STATUSES:
+        headers = getattr(response, 'headers', None) or {}
+        return True, parse_retry_after(headers.get('Retry-After'))
+
+    if YTDLP_HTTP_ERROR_RE.search(str(exc)):
+        return True, None
+
+    return False, None
+
+
+class OutboundGovernor:
+    """Token bucket plus AIMD concurrency limit with jittered retries"""
+
+    def __init__(self, rate=1.0, burst=3, min_rate=0.05, max_rate=5.0, rate_increase=0.05,
+                 max_concurrency=4, max_retries=3, base_delay=1.0, max_delay=60.0,
+                 acquire_timeout=60.0):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate_increase = rate_increase
+        self.limit = float(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.acquire_timeout = acquire_timeout
+
+        self._cond = threading.Condition()
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._in_flight = 0
+        self._blocked_until = 0.0
+        self._stats = {
+            'requests': 0,
+            'throttled': 0,
+            'retries': 0,
+            'rejected': 0,
+            'last_throttled_at': None
+        }
+
+    def _refill(self, now):
+        """Add tokens accrued since the last refill"""
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def _retry_after(self, now):
+        """Seconds a caller should wait before the next attempt could be admitted"""
+        return max(self._blocked_until - now, (1 - min(self._tokens, 1)) / self.rate, 1.0)
+
+    def acquire(self, timeout=None):
+        """Wait for a concurrency slot and a rate token"""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        with self._cond:
+            deadline = time.monotonic() + timeout
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                elif self._in_flight >= max(int(self.limit), 1):
+                    wait = None
+                elif self._tokens < 1:
+                    wait = (1 - self._tokens) / self.rate
+                else:
+                    self._tokens -= 1
+                    self._in_flight += 1
+                    self._stats['requests'] += 1
+                    return
+
+                remaining = deadline - now
+                if remaining <= 0:
+                    self._stats['rejected'] += 1
+                    raise BackpressureError(self._retry_after(now))
+                self._cond.wait(remaining if wait is None else min(wait, remaining))
+
+    def release(self, throttled=False, retry_after=None, success=True):
+        """Return a slot and adapt the rate and concurrency limit to the outcome"""
+        with self._cond:
+            self._in_flight -= 1
+            if throttled:
+                # Multiplicative decrease
+                now = time.monotonic()
+                self._stats['throttled'] += 1
+                self._stats['last_throttled_at'] = time.time()
+                self.limit = max(1.0, self.limit / 2)
+                self.rate = max(self.min_rate, self.rate / 2)
+                self._tokens = min(self._tokens, 0.0)
+                if retry_after:
+                    self._blocked_until = max(self._blocked_until, now + retry_after)
+            elif success:
+                # Additive increase
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+                self.rate = min(self.max_rate, self.rate + self.rate_increase)
+            self._cond.notify_all()
+
+    def set_max_concurrency(self, max_concurrency):
+        """Change the concurrency ceiling; in-flight requests above it are not interrupted"""
+        with self._cond:
+            self.max_concurrency = max_concurrency
+            self.limit = min(self.limit, float(max_concurrency))
+            self._cond.notify_all()
+
+    def call(self, fn, *args, **kwargs):
+        """Run fn under the governor, retrying throttled attempts with backoff"""
+        for attempt in range(self.max_retries + 1):
+            self.acquire()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                throttled, retry_after = classify_throttle(e)
+                if not throttled:
+                    self.release(success=False)
+                    raise
+                self.release(throttled=True, retry_after=retry_after)
+
+                if attempt == self.max_retries:
+                    with self._cond:
+                        wait = self._retry_after(time.monotonic())
+                    raise ThrottledError(max(wait, retry_after or 0)) from e
+
+                # Full jitter, but never sooner than the server asked for
+                backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                with self._cond:
+                    self._stats['retries'] += 1
+                time.sleep(max(backoff, retry_after or 0))
+            else:
+                self.release()
+                return result
+
+    def state(self):
+        """Snapshot of the governor's current throttle state"""
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                'rate_per_second': round(self.rate, 3),
+                'concurrency_limit': round(self.limit, 2),
+                'in_flight': self._in_flight,
+                'tokens': round(self._tokens, 2),
+                'blocked_for_seconds': round(max(self._blocked_until - now, 0.0), 1),
+                **self._stats
+            }
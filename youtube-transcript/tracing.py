@@ -0,0 +1,293 @@
+"""
+Request tracing with spans around each pipeline stage
+
+A span times one stage (yt-dlp extraction, caption download, LLM call, cache
+lookup) and carries attributes such as the video ID, caption format, bytes
+and tokens. The active span is kept in a context variable, so spans started
+while another is open become its children without being passed around, and
+every span of one request shares a trace ID.
+
+Finished spans are queued and written by a background thread to the
+configured exporters: a JSON-lines file for offline analysis, and/or an
+OpenTelemetry collector over OTLP/HTTP with JSON encoding. Both need only
+the standard library. With no exporter configured, spans are no-ops.
+"""
+
+import contextvars
+import json
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+
+_current = contextvars.ContextVar('span', default=None)
+
+TRACEPARENT_RE = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+
+class Span:
+    """A timed stage of a trace with attributes"""
+
+    recording = True
+
+    def __init__(self, name, trace_id, parent_id=None, kind='internal', attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    def set_attribute(self, key, value):
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, attributes):
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def record_error(self, error):
+        self.error = f"{type(error).__name__}: {error}"
+
+    @property
+    def duration_ms(self):
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    @property
+    def traceparent(self):
+        """W3C traceparent header value naming this span"""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'kind': self.kind,
+            'start_ns': self.start_ns,
+            'end_ns': self.end_ns,
+            'duration_ms': round(self.duration_ms, 3),
+            'attributes': self.attributes,
+            'error': self.error
+        }
+
+
+class _NoopSpan:
+    """Stands in for a span when tracing is off or the trace is not sampled"""
+
+    recording = False
+    traceparent = None
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def record_error(self, error):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def current_span():
+    """The active span, or a no-op span outside any trace"""
+    return _current.get() or NOOP_SPAN
+
+
+def set_attributes(**attributes):
+    """Add attributes to the active span"""
+    current_span().set_attributes(attributes)
+
+
+class JsonFileExporter:
+    """Appends finished spans to a file, one JSON object per line"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def export(self, spans):
+        with open(self.path, 'a') as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), default=str) + '\n')
+
+
+def otlp_value(value):
+    """OTLP JSON AnyValue for an attribute value"""
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+OTLP_KINDS = {'internal': 1, 'server': 2, 'client': 3}
+
+
+class OtlpHttpExporter:
+    """Posts finished spans to an OpenTelemetry collector as OTLP/HTTP JSON"""
+
+    def __init__(self, endpoint, service_name, timeout=5.0):
+        self.url = endpoint.rstrip('/') + ('' if endpoint.rstrip('/').endswith('/v1/traces') else '/v1/traces')
+        self.service_name = service_name
+        self.timeout = timeout
+
+    def payload(self, spans):
+        return {'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': otlp_value(self.service_name)}]},
+            'scopeSpans': [{
+                'scope': {'name': 'youtube-transcript'},
+                'spans': [{
+                    'traceId': span.trace_id,
+                    'spanId': span.span_id,
+                    **({'parentSpanId': span.parent_id} if span.parent_id else {}),
+                    'name': span.name,
+                    'kind': OTLP_KINDS.get(span.kind, 1),
+                    'startTimeUnixNano': str(span.start_ns),
+                    'endTimeUnixNano': str(span.end_ns),
+                    'attributes': [{'key': key, 'value': otlp_value(value)}
+                                   for key, value in span.attributes.items()],
+                    'status': {'code': 2, 'message': span.error} if span.error else {'code': 1}
+                } for span in spans]
+            }]
+        }]}
+
+    def export(self, spans):
+        request = urllib.request.Request(self.url, data=json.dumps(self.payload(spans)).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'}, method='POST')
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class Tracer:
+    """Creates spans and hands finished ones to the exporters in batches"""
+
+    def __init__(self, exporters, sample_rate=1.0, max_queue=2048, batch_size=256, interval=2.0):
+        self.exporters = list(exporters)
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stats = {'started': 0, 'exported': 0, 'dropped': 0, 'export_errors': 0}
+        self._lock = threading.Lock()
+        if self.exporters:
+            threading.Thread(target=self._run, name='trace-exporter', daemon=True).start()
+
+    @property
+    def enabled(self):
+        return bool(self.exporters)
+
+    def start_span(self, name, attributes=None, kind='internal', traceparent=None):
+        """Start a span as a child of the active one and make it active
+
+        A root span continues the trace in a valid traceparent header value,
+        if given. Returns (span, token); pass both to end_span.
+        """
+        parent = _current.get()
+        if not self.enabled or parent is NOOP_SPAN:
+            return NOOP_SPAN, None
+        if parent is not None:
+            span = Span(name, parent.trace_id, parent.span_id, kind, attributes)
+        else:
+            match = TRACEPARENT_RE.match(traceparent or '')
+            if match:
+                sampled = int(match.group(3), 16) & 1
+                trace_id, parent_id = match.group(1), match.group(2)
+            else:
+                sampled = random.random() < self.sample_rate
+                trace_id, parent_id = f"{random.getrandbits(128):032x}", None
+            if not sampled:
+                return NOOP_SPAN, _current.set(NOOP_SPAN)
+            span = Span(name, trace_id, parent_id, kind, attributes)
+        with self._lock:
+            self._stats['started'] += 1
+        return span, _current.set(span)
+
+    def end_span(self, span, token, error=None):
+        """Finish a span, restore the previously active one and queue it for export"""
+        if token is not None:
+            try:
+                _current.reset(token)
+            except ValueError:
+                # Ended from another context, e.g. after a streamed response
+                _current.set(None)
+        if not span.recording:
+            return
+        if error is not None:
+            span.record_error(error)
+        span.end_ns = time.time_ns()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            with self._lock:
+                self._stats['dropped'] += 1
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Run a with block as a span; exceptions are recorded and re-raised"""
+        span, token = self.start_span(name, attributes)
+        try:
+            yield span
+        except BaseException as e:
+            self.end_span(span, token, e)
+            raise
+        else:
+            self.end_span(span, token)
+
+    def wrap(self, name, fn):
+        """fn bound to the active trace, to run later on another thread as a child span"""
+        context = contextvars.copy_context()
+
+        def traced(*args, **kwargs):
+            with self.span(name):
+                return fn(*args, **kwargs)
+
+        def run(*args, **kwargs):
+            return context.run(traced, *args, **kwargs)
+        return run
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._export(batch)
+
+    def _export(self, batch):
+        for exporter in self.exporters:
+            try:
+                exporter.export(batch)
+                with self._lock:
+                    self._stats['exported'] += len(batch)
+            except Exception as e:
+                with self._lock:
+                    self._stats['export_errors'] += 1
+                print(f"Trace export to {type(exporter).__name__} failed: {e}")
+
+    def state(self):
+        """Exporters, sampling and counters"""
+        with self._lock:
+            return {
+                'exporters': [type(exporter).__name__ for exporter in self.exporters],
+                'sample_rate': self.sample_rate,
+                'queued': self._queue.qsize(),
+                **self._stats
+            }
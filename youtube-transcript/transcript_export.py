@@ -0,0 +1,228 @@
+"""
+Streaming export of cached transcripts
+
+Exports are produced one transcript at a time by generators, so memory use
+does not depend on the size of the archive. Records are exported in cache key
+order as (key, record) pairs and the last exported key acts as the resume
+cursor.
+"""
+
+import io
+import json
+import os
+import struct
+import zipfile
+import zlib
+
+EXPORT_FORMATS = ('ndjson', 'txt', 'srt', 'vtt')
+
+EXPORT_MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'txt': 'application/zip',
+    'srt': 'application/zip',
+    'vtt': 'application/zip'
+}
+
+
+def format_cue_time(seconds, separator='.'):
+    """Format seconds as an HH:MM:SS.mmm cue time"""
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}"
+
+
+def segments_to_srt(segments):
+    """Render segments as an SRT document"""
+    cues = []
+    for number, segment in enumerate(segments, 1):
+        cues.append(
+            f"{number}\n"
+            f"{format_cue_time(segment['start'], ',')} --> {format_cue_time(segment['end'], ',')}\n"
+            f"{segment['text']}\n"
+        )
+    return '\n'.join(cues)
+
+
+def segments_to_vtt(segments):
+    """Render segments as a WebVTT document"""
+    cues = ['WEBVTT\n']
+    for segment in segments:
+        cues.append(
+            f"{format_cue_time(segment['start'])} --> {format_cue_time(segment['end'])}\n"
+            f"{segment['text']}\n"
+        )
+    return '\n'.join(cues)
+
+
+def export_entry(key, record, fmt, format_text):
+    """Return the (file name, content) of one record in a file-per-video format"""
+    if fmt == 'srt':
+        return f"{key}.srt", segments_to_srt(record['segments'])
+    if fmt == 'vtt':
+        return f"{key}.vtt", segments_to_vtt(record['segments'])
+    return f"{key}.txt", format_text(record)
+
+
+def ndjson_line(key, record, format_text):
+    """Serialize one record as an NDJSON line"""
+    return json.dumps({
+        'cursor': key,
+        'video_id': record['video_id'],
+        'title': record['title'],
+        'channel': record['channel'],
+        'duration': record['duration'],
+        'fetched_at': record.get('fetched_at'),
+        'text': format_text(record),
+        'segments': record['segments']
+    }) + '\n'
+
+
+class _StreamBuffer(io.RawIOBase):
+    """Unseekable sink that hands written bytes back to a generator"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        """Return and forget everything written so far"""
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_ndjson(records, format_text):
+    """Yield NDJSON bytes for an iterable of (key, record) pairs"""
+    for key, record in records:
+        yield ndjson_line(key, record, format_text).encode('utf-8')
+
+
+def stream_zip(records, fmt, format_text):
+    """Yield a zip archive with one file per record, built incrementally"""
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for key, record in records:
+            name, content = export_entry(key, record, fmt, format_text)
+            archive.writestr(name, content)
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+def stream_export(records, fmt, format_text):
+    """Yield the export of records in the requested format"""
+    if fmt == 'ndjson':
+        return stream_ndjson(records, format_text)
+    return stream_zip(records, fmt, format_text)
+
+
+def _rfind_newline(f, end, block=65536):
+    """Position of the last newline before end in a binary file, or -1"""
+    while end > 0:
+        start = max(0, end - block)
+        f.seek(start)
+        found = f.read(end - start).rfind(b'\n')
+        if found != -1:
+            return start + found
+        end = start
+    return -1
+
+
+def resume_ndjson(path):
+    """Prepare an NDJSON export file for appending and return its last cursor
+
+    A partially written trailing line from an interrupted export is removed.
+    """
+    if not os.path.exists(path):
+        return None
+
+    with open(path, 'r+b') as f:
+        size = f.seek(0, os.SEEK_END)
+        valid_end = _rfind_newline(f, size) + 1
+        if valid_end != size:
+            f.truncate(valid_end)
+        if valid_end == 0:
+            return None
+
+        f.seek(_rfind_newline(f, valid_end - 1) + 1)
+        return json.loads(f.readline())['cursor']
+
+
+LOCAL_HEADER = struct.Struct('<4s5H3L2H')
+LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+
+
+def iter_local_entries(f):
+    """Yield (name, date_time, content) for each complete entry of a zip without a central directory
+
+    Entries are read from their local file headers in order; scanning stops
+    at the first entry that is truncated, fails its CRC check or has no
+    sizes in its header.
+    """
+    while True:
+        header = f.read(LOCAL_HEADER.size)
+        if len(header) < LOCAL_HEADER.size:
+            return
+        (signature, _, flags, method, mod_time, mod_date, crc,
+         compressed_size, _, name_length, extra_length) = LOCAL_HEADER.unpack(header)
+        if signature != LOCAL_HEADER_SIGNATURE or flags & 0x08 or method not in (zipfile.ZIP_STORED,
+                                                                                 zipfile.ZIP_DEFLATED):
+            return
+        name = f.read(name_length).decode('utf-8' if flags & 0x800 else 'cp437')
+        f.read(extra_length)
+        data = f.read(compressed_size)
+        if len(data) < compressed_size:
+            return
+        try:
+            content = zlib.decompress(data, -15) if method == zipfile.ZIP_DEFLATED else data
+        except zlib.error:
+            return
+        if zlib.crc32(content) != crc:
+            return
+        date_time = ((mod_date >> 9) + 1980, (mod_date >> 5) & 0xF, mod_date & 0x1F,
+                     mod_time >> 11, (mod_time >> 5) & 0x3F, (mod_time & 0x1F) * 2)
+        yield name, date_time, content
+
+
+def recover_zip(path):
+    """Rewrite an interrupted export zip as a valid archive of its complete entries
+
+    An export that was killed mid-way has no central directory, so zipfile
+    cannot open it. The entries are rebuilt from their local headers into a
+    temporary file, which then replaces the original. Returns the number of
+    entries kept.
+    """
+    tmp_path = f"{path}.tmp"
+    kept = 0
+    with open(path, 'rb') as f, zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, date_time, content in iter_local_entries(f):
+            archive.writestr(zipfile.ZipInfo(name, date_time), content, compress_type=zipfile.ZIP_DEFLATED)
+            kept += 1
+    os.replace(tmp_path, path)
+    return kept
+
+
+def resume_zip(path):
+    """Return the last cursor stored in an existing export zip
+
+    An archive left without a central directory by an interrupted export is
+    first recovered, so it can be appended to.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with zipfile.ZipFile(path, 'r') as archive:
+            names = archive.namelist()
+    except zipfile.BadZipFile:
+        recover_zip(path)
+        with zipfile.ZipFile(path, 'r') as archive:
+            names = archive.namelist()
+    names = [os.path.splitext(name)[0] for name in names]
+    return max(names) if names else None
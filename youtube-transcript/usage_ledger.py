@@ -0,0 +1,168 @@
+"""
+SQLite ledger of analysis requests
+
+Every analysis, whether answered by the LLM or from cache, is recorded with
+its saved prompt ID, video, model, token usage and latency. Aggregates are
+computed with SQL at query time, and cost is derived from the token counts
+and MODEL_PRICES, so changing prices re-prices history.
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# USD per million (input, output) tokens; dated model names match by prefix
+MODEL_PRICES = {
+    'gpt-4.1-nano': (0.10, 0.40),
+    'gpt-4.1-mini': (0.40, 1.60),
+    'gpt-4.1': (2.00, 8.00),
+    'gpt-4o-mini': (0.15, 0.60),
+    'gpt-4o': (2.50, 10.00)
+}
+
+# Batch API requests (recorded with priority 'batch') are billed at a discount
+BATCH_DISCOUNT = 0.5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    prompt_id INTEGER,
+    prompt_type TEXT,
+    video_id TEXT,
+    video_duration REAL,
+    model TEXT,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    latency REAL,
+    llm_latency REAL,
+    queue_wait REAL,
+    cached INTEGER NOT NULL,
+    priority TEXT
+);
+CREATE INDEX IF NOT EXISTS analyses_created_at ON analyses (created_at);
+"""
+
+COLUMNS = ('prompt_id', 'prompt_type', 'video_id', 'video_duration', 'model', 'prompt_tokens',
+           'completion_tokens', 'latency', 'llm_latency', 'queue_wait', 'cached', 'priority')
+
+
+def model_price(model):
+    """(input, output) USD per million tokens for a model, or None if unknown"""
+    if not model:
+        return None
+    matches = [name for name in MODEL_PRICES if model == name or model.startswith(name + '-')]
+    return MODEL_PRICES[max(matches, key=len)] if matches else None
+
+
+def token_cost(model, prompt_tokens, completion_tokens, batch=False):
+    """Cost in USD of a call, or None if the model has no known price"""
+    price = model_price(model)
+    if price is None:
+        return None
+    cost = ((prompt_tokens or 0) * price[0] + (completion_tokens or 0) * price[1]) / 1000000
+    return cost * BATCH_DISCOUNT if batch else cost
+
+
+class UsageLedger:
+    """Append-only SQLite table of analysis usage with summary queries"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(SCHEMA)
+
+    def record(self, **fields):
+        """Record one analysis; unknown fields are ignored"""
+        values = [fields.get(column) for column in COLUMNS]
+        values[COLUMNS.index('cached')] = int(bool(fields.get('cached')))
+        with self._lock:
+            self._db.execute(
+                f"INSERT INTO analyses (created_at, {', '.join(COLUMNS)}) "
+                f"VALUES (?, {', '.join('?' for _ in COLUMNS)})",
+                [fields.get('created_at', time.time())] + values
+            )
+            self._db.commit()
+
+    def _query(self, sql, params):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def summary(self, since=0, limit=10):
+        """Aggregate usage recorded after since (Unix time)"""
+        (calls, cached, prompt_tokens, completion_tokens, avg_latency), = self._query(
+            "SELECT COUNT(*), COALESCE(SUM(cached), 0), COALESCE(SUM(prompt_tokens), 0), "
+            "COALESCE(SUM(completion_tokens), 0), AVG(CASE WHEN cached = 0 THEN latency END) "
+            "FROM analyses WHERE created_at >= ?", (since,))
+
+        # Tokens spent per minute of source video, only where the duration is known
+        (tokens_per_minute,), = self._query(
+            "SELECT SUM(prompt_tokens + completion_tokens) * 60.0 / SUM(video_duration) "
+            "FROM analyses WHERE created_at >= ? AND cached = 0 AND video_duration > 0 "
+            "AND prompt_tokens IS NOT NULL", (since,))
+
+        slowest = self._query(
+            "SELECT prompt_id, COUNT(*), AVG(latency), MAX(latency), AVG(prompt_tokens), "
+            "AVG(completion_tokens), SUM(CASE WHEN video_duration > 0 THEN prompt_tokens + completion_tokens END) "
+            "* 60.0 / SUM(CASE WHEN video_duration > 0 THEN video_duration END) "
+            "FROM analyses WHERE created_at >= ? AND cached = 0 "
+            "GROUP BY prompt_id ORDER BY AVG(latency) DESC LIMIT ?", (since, limit))
+
+        models = self._query(
+            "SELECT model, COUNT(*), COALESCE(SUM(prompt_tokens), 0), COALESCE(SUM(completion_tokens), 0), "
+            "AVG(latency) FROM analyses WHERE created_at >= ? AND cached = 0 "
+            "GROUP BY model ORDER BY COUNT(*) DESC", (since,))
+
+        daily = self._query(
+            "SELECT date(created_at, 'unixepoch', 'localtime') AS day, model, priority = 'batch' AS batch, "
+            "COUNT(*), COALESCE(SUM(prompt_tokens), 0), COALESCE(SUM(completion_tokens), 0) "
+            "FROM analyses WHERE created_at >= ? AND cached = 0 "
+            "GROUP BY day, model, batch ORDER BY day", (since,))
+
+        cost_per_day = {}
+        model_costs = {}
+        for day, model, batch, day_calls, day_prompt, day_completion in daily:
+            entry = cost_per_day.setdefault(day, {'day': day, 'calls': 0, 'tokens': 0,
+                                                  'cost_usd': 0.0, 'unpriced_tokens': 0})
+            entry['calls'] += day_calls
+            entry['tokens'] += day_prompt + day_completion
+            cost = token_cost(model, day_prompt, day_completion, batch)
+            if cost is None:
+                entry['unpriced_tokens'] += day_prompt + day_completion
+                model_costs[model] = None
+            else:
+                entry['cost_usd'] = round(entry['cost_usd'] + cost, 6)
+                model_costs[model] = model_costs.get(model, 0.0) + cost
+
+        return {
+            'calls': calls,
+            'cache_hits': cached,
+            'cache_hit_rate': round(cached / calls, 3) if calls else 0.0,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'avg_latency_ms': round(avg_latency * 1000) if avg_latency is not None else None,
+            'tokens_per_video_minute': round(tokens_per_minute, 1) if tokens_per_minute else None,
+            'slowest_prompts': [{
+                'prompt_id': prompt_id,
+                'calls': count,
+                'avg_latency_ms': round(avg * 1000) if avg is not None else None,
+                'max_latency_ms': round(peak * 1000) if peak is not None else None,
+                'avg_prompt_tokens': round(avg_prompt) if avg_prompt is not None else None,
+                'avg_completion_tokens': round(avg_completion) if avg_completion is not None else None,
+                'tokens_per_video_minute': round(per_minute, 1) if per_minute else None
+            } for prompt_id, count, avg, peak, avg_prompt, avg_completion, per_minute in slowest],
+            'models': [{
+                'model': model,
+                'calls': count,
+                'prompt_tokens': model_prompt,
+                'completion_tokens': model_completion,
+                'avg_latency_ms': round(avg * 1000) if avg is not None else None,
+                'cost_usd': round(model_costs[model], 6) if model_costs.get(model) is not None else None
+            } for model, count, model_prompt, model_completion, avg in models],
+            'cost_per_day': list(cost_per_day.values())
+        }
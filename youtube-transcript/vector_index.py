@@ -0,0 +1,265 @@
+"""
+Local vector index for semantic search over transcript chunks
+
+Transcripts are split into chunks on segment boundaries, embedded through a
+pluggable embedder and appended to a memory-mapped float32 matrix on disk.
+Queries are answered with a single vectorized cosine-similarity pass over the
+matrix followed by a top-k partial sort.
+
+Files kept in the index directory:
+    index.json   - embedder name, vector dimension and row count
+    vectors.f32  - row-major float32 matrix, one L2-normalized row per chunk
+    chunks.jsonl - one JSON line of chunk metadata per matrix row
+"""
+
+import json
+import re
+import threading
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+# Default chunk size in characters (roughly 250 tokens)
+DEFAULT_CHUNK_CHARS = 1000
+
+# Number of texts sent per embeddings request
+EMBED_BATCH_SIZE = 256
+
+WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+class HashingEmbedder:
+    """Offline stand-in embedder using signed feature hashing of words and bigrams"""
+
+    name = 'local-hashing'
+
+    def __init__(self, dimensions=256):
+        self.dimensions = dimensions
+
+    def embed(self, texts):
+        """Embed a list of texts into an (n, dimensions) float32 matrix"""
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = WORD_RE.findall(text.lower())
+            features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            if not features:
+                continue
+            hashes = np.fromiter((zlib.crc32(f.encode('utf-8')) for f in features),
+                                 dtype=np.uint32, count=len(features))
+            buckets = (hashes % self.dimensions).astype(np.intp)
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(matrix[row], buckets, signs)
+            # Sublinear term frequency keeps long chunks from dominating
+            matrix[row] = np.sign(matrix[row]) * np.log1p(np.abs(matrix[row]))
+        return matrix
+
+
+class OpenAIEmbedder:
+    """Embedder backed by the OpenAI embeddings API"""
+
+    def __init__(self, client, model='text-embedding-3-small', dimensions=256):
+        self.client = client
+        self.model = model
+        self.dimensions = dimensions
+        self.name = f"openai:{model}"
+
+    def embed(self, texts):
+        """Embed a list of texts into an (n, dimensions) float32 matrix"""
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for offset in range(0, len(texts), EMBED_BATCH_SIZE):
+            batch = texts[offset:offset + EMBED_BATCH_SIZE]
+            response = self.client.embeddings.create(
+                model=self.model,
+                input=batch,
+                dimensions=self.dimensions
+            )
+            for item in response.data:
+                matrix[offset + item.index] = item.embedding
+        return matrix
+
+
+def chunk_segments(segments, max_chars=DEFAULT_CHUNK_CHARS):
+    """Group consecutive segments into chunks of at most max_chars characters
+
+    Chunks never split a segment, so every chunk maps back to an exact
+    start/end time range in the video.
+    """
+    chunks = []
+    current = []
+    size = 0
+    for segment in segments:
+        text = segment['text']
+        if current and size + len(text) + 1 > max_chars:
+            chunks.append(current)
+            current = []
+            size = 0
+        current.append(segment)
+        size += len(text) + 1
+    if current:
+        chunks.append(current)
+
+    return [
+        {
+            'start': chunk[0]['start'],
+            'end': chunk[-1]['end'],
+            'text': ' '.join(s['text'] for s in chunk)
+        }
+        for chunk in chunks
+    ]
+
+
+def _normalize(matrix):
+    """L2-normalize the rows of a matrix in place"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+class VectorIndex:
+    """Append-only memory-mapped vector index with top-k cosine search"""
+
+    def __init__(self, directory, embedder):
+        self.directory = Path(directory)
+        self.embedder = embedder
+        self.dimensions = embedder.dimensions
+        self.header_file = self.directory / 'index.json'
+        self.vectors_file = self.directory / 'vectors.f32'
+        self.chunks_file = self.directory / 'chunks.jsonl'
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._offsets = []
+        self._video_ids = set()
+        self._load()
+
+    def _load(self):
+        """Open an existing index or create an empty one"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        if self.header_file.exists():
+            with open(self.header_file, 'r') as f:
+                header = json.load(f)
+            if header['embedder'] != self.embedder.name or header['dimensions'] != self.dimensions:
+                raise ValueError(
+                    f"Index at {self.directory} was built with {header['embedder']} "
+                    f"({header['dimensions']} dims); delete it to switch embedders"
+                )
+
+        self.vectors_file.touch()
+        self.chunks_file.touch()
+
+        # Record byte offsets of each metadata line so results can be read by seek
+        offset = 0
+        video_ids = []
+        with open(self.chunks_file, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                self._offsets.append(offset)
+                video_ids.append(json.loads(line)['video_id'])
+                offset += len(line)
+        self._offsets.append(offset)
+
+        # A crash between the two appends can leave one file longer than the other
+        rows = self.vectors_file.stat().st_size // (self.dimensions * 4)
+        count = min(rows, len(self._offsets) - 1)
+        with open(self.vectors_file, 'r+b') as f:
+            f.truncate(count * self.dimensions * 4)
+        with open(self.chunks_file, 'r+b') as f:
+            f.truncate(self._offsets[count])
+        self._offsets = self._offsets[:count]
+        self._video_ids = set(video_ids[:count])
+
+        self._write_header()
+        self._remap()
+
+    def _write_header(self):
+        """Persist the index header"""
+        with open(self.header_file, 'w') as f:
+            json.dump({
+                'embedder': self.embedder.name,
+                'dimensions': self.dimensions,
+                'count': len(self._offsets)
+            }, f, indent=2)
+
+    def _remap(self):
+        """Re-open the memory map after the vectors file has grown"""
+        count = len(self._offsets)
+        if count == 0:
+            self._matrix = np.zeros((0, self.dimensions), dtype=np.float32)
+        else:
+            self._matrix = np.memmap(self.vectors_file, dtype=np.float32, mode='r',
+                                     shape=(count, self.dimensions))
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def contains(self, video_id):
+        """Check whether a video has already been indexed"""
+        return video_id in self._video_ids
+
+    def add_transcript(self, video_id, title, channel, segments, max_chars=DEFAULT_CHUNK_CHARS):
+        """Chunk, embed and append a transcript; returns the number of chunks added"""
+        if self.contains(video_id):
+            return 0
+
+        chunks = chunk_segments(segments, max_chars)
+        if not chunks:
+            return 0
+
+        vectors = _normalize(self.embedder.embed([c['text'] for c in chunks]))
+
+        with self._lock:
+            if self.contains(video_id):
+                return 0
+
+            with open(self.vectors_file, 'ab') as f:
+                f.write(vectors.astype(np.float32).tobytes())
+
+            offset = self.chunks_file.stat().st_size
+            with open(self.chunks_file, 'ab') as f:
+                for chunk in chunks:
+                    line = json.dumps({
+                        'video_id': video_id,
+                        'title': title,
+                        'channel': channel,
+                        'start': chunk['start'],
+                        'end': chunk['end'],
+                        'text': chunk['text']
+                    }).encode('utf-8') + b'\n'
+                    f.write(line)
+                    self._offsets.append(offset)
+                    offset += len(line)
+
+            self._video_ids.add(video_id)
+            self._write_header()
+            self._remap()
+
+        return len(chunks)
+
+    def search(self, query, k=10):
+        """Return the k chunks most similar to the query text, best first"""
+        matrix = self._matrix
+        count = matrix.shape[0]
+        if count == 0 or not query.strip():
+            return []
+
+        vector = _normalize(self.embedder.embed([query]))[0]
+        scores = matrix @ vector
+
+        k = min(k, count)
+        if k < count:
+            top = np.argpartition(scores, -k)[-k:]
+        else:
+            top = np.arange(count)
+        top = top[np.argsort(scores[top])[::-1]]
+
+        results = []
+        with open(self.chunks_file, 'rb') as f:
+            for row in top:
+                f.seek(self._offsets[row])
+                chunk = json.loads(f.readline())
+                chunk['score'] = float(scores[row])
+                results.append(chunk)
+        return results
@@ -5,21 +5,279 @@ Runs on port 8000 and allows users to download transcripts from YouTube videos
 and analyze them with OpenAI
 """
 
-from flask import Flask, render_template_string, request, jsonify
-import yt_dlp
+from flask import Flask, Response, g, render_template_string, request, jsonify, stream_with_context
 import re
 import os
+import sys
 import json
+import argparse
+import contextvars
+import functools
+import zipfile
+import hashlib
+import io
+import importlib
+import math
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.error
+import urllib.request
+from urllib.parse import parse_qs, parse_qsl, urlencode, urlparse, urlunparse
+from collections import OrderedDict
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
 from pathlib import Path
-from openai import OpenAI
+from admission import AdmissionError, AdmissionGate
+from batch_analysis import LocalBatchRunner, OpenAIBatchRunner, batch_line, parse_output_line, wait_for_batch
+from cache_store import JsonStore
+from jobs import JobManager, QueueFullError
+from live_feed import LiveFeed
+from local_analyzers import ANALYZER_MODES, ANALYZERS, segments_from_text
+from negative_cache import NegativeCache, classify_failure, clean_message
+from memory_budget import MemoryBudget, deep_sizeof, descendant_pids, rss_bytes, top_allocations
+from llm_backend import PRIORITIES, LLMBusyError, LLMRouter, OpenAICompatibleBackend, classify_prompt
+from peer_cache import AUTH_HEADER, DIGEST_HEADER, PeerCache, check_request_auth, encode_entry
+from segment_index import SegmentIndex, chapter_at, format_time, parse_time, video_chapters
+from single_flight import SingleFlight
+from subtitle_stream import CountingReader, iter_subtitle_segments
+from throttle import OutboundGovernor, ThrottledError
+from tracing import JsonFileExporter, OtlpHttpExporter, Tracer, current_span, set_attributes
+from usage_ledger import UsageLedger
+from ytdlp_pool import YtdlpPool
+from transcript_export import (EXPORT_FORMATS, EXPORT_MIMETYPES, export_entry, ndjson_line,
+                               resume_ndjson, resume_zip, stream_export)
 
 app = Flask(__name__)
 
-# Initialize OpenAI client
-openai_client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+# Heavy dependencies are imported on first use; PREWARM=1 imports them in the
+# background once the server is listening
+PREWARM = os.getenv('PREWARM', '1') == '1'
+startup_status = {'started_at': time.time(), 'listening_at': None, 'warmed_at': None,
+                  'ready': False, 'prewarm': {}}
+
+# Data directory for prompts, caches and indexes
+DATA_DIR = Path(os.getenv('TRANSCRIPT_DATA_DIR', '/opt/youtube-transcript'))
+
+# Request tracing: TRACE_EXPORTER is 'json' (JSON lines in TRACE_FILE),
+# 'otlp' (OTLP/HTTP JSON to a collector) or 'json,otlp'; empty turns it off
+TRACE_EXPORTER = [name.strip() for name in os.getenv('TRACE_EXPORTER', '').split(',') if name.strip()]
+TRACE_FILE = Path(os.getenv('TRACE_FILE', str(DATA_DIR / 'traces.jsonl')))
+OTLP_ENDPOINT = os.getenv('OTEL_EXPORTER_OTLP_ENDPOINT', 'http://localhost:4318')
+# Share of requests traced; incoming traceparent headers decide for themselves
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '1.0'))
+
+def build_tracer():
+    """Build the tracer with the configured exporters"""
+    exporters = []
+    if 'json' in TRACE_EXPORTER:
+        exporters.append(JsonFileExporter(TRACE_FILE))
+    if 'otlp' in TRACE_EXPORTER:
+        exporters.append(OtlpHttpExporter(OTLP_ENDPOINT, os.getenv('OTEL_SERVICE_NAME', 'youtube-transcript')))
+    return Tracer(exporters, TRACE_SAMPLE_RATE)
+
+tracer = build_tracer()
+
+# LLM routing configuration; see llm_backend.py for the file format
+LLM_CONFIG_FILE = Path(os.getenv('LLM_CONFIG', str(DATA_DIR / 'llm_routes.json')))
+
+def build_llm_router():
+    """Build the LLM router from the config file and environment overrides
+
+    LLM_BACKEND=stub answers offline with canned responses; LLM_BASE_URL and
+    LLM_MODEL send every request to one OpenAI-compatible server.
+    LLM_MAX_CONCURRENCY, LLM_TOKENS_PER_MINUTE and LLM_QUEUE_TIMEOUT tune the
+    shared governor.
+    """
+    overrides = {}
+    if os.getenv('LLM_BACKEND') == 'stub':
+        overrides = {
+            'backends': {'stub': {'type': 'stub'}},
+            'routes': [{'backend': 'stub', 'model': 'stub', 'max_input_tokens': 10 ** 9}]
+        }
+    elif os.getenv('LLM_BASE_URL'):
+        overrides = {
+            'backends': {'local': {
+                'type': 'openai',
+                'base_url': os.getenv('LLM_BASE_URL'),
+                'api_key': os.getenv('LLM_API_KEY', 'none')
+            }},
+            'routes': [{
+                'backend': 'local',
+                'model': os.getenv('LLM_MODEL', 'local'),
+                'max_input_tokens': int(os.getenv('LLM_MAX_INPUT_TOKENS', '100000'))
+            }]
+        }
+    
+    governor = {}
+    for key, env in (('max_concurrency', 'LLM_MAX_CONCURRENCY'),
+                     ('tokens_per_minute', 'LLM_TOKENS_PER_MINUTE'),
+                     ('queue_timeout', 'LLM_QUEUE_TIMEOUT')):
+        if os.getenv(env):
+            governor[key] = int(os.getenv(env))
+    overrides['governor'] = governor
+    return LLMRouter.from_file(LLM_CONFIG_FILE, overrides)
+
+llm_router = build_llm_router()
+
+# Local pre-compression of transcripts before LLM calls
+COMPRESS_TRANSCRIPTS = os.getenv('COMPRESS_TRANSCRIPTS', '0') == '1'
+# Budgets below this leave too little of a transcript to analyze
+MIN_TOKEN_BUDGET = 500
+
+
+def parse_token_budget(value):
+    """Parse a compression token budget of at least MIN_TOKEN_BUDGET; raises ValueError"""
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or value < MIN_TOKEN_BUDGET:
+        raise ValueError(f"token_budget must be a whole number of at least {MIN_TOKEN_BUDGET}")
+    return value
+
+
+try:
+    COMPRESSION_TOKEN_BUDGET = parse_token_budget(os.getenv('COMPRESSION_TOKEN_BUDGET', '4000'))
+except ValueError as e:
+    raise SystemExit(f"COMPRESSION_TOKEN_BUDGET: {e}")
+
+# Background jobs for long transcript and analysis requests
+job_manager = JobManager(
+    max_workers=int(os.getenv('JOB_WORKERS', '2')),
+    max_queued=int(os.getenv('JOB_MAX_QUEUED', '50')),
+    ttl=int(os.getenv('JOB_RESULT_TTL', '3600'))
+)
+
+# OpenAI API access for embeddings; the client is created on first use
+openai_embeddings = OpenAICompatibleBackend('embeddings')
 
 # Saved prompts file path
-PROMPTS_FILE = Path('/opt/youtube-transcript/saved_prompts.json')
+PROMPTS_FILE = DATA_DIR / 'saved_prompts.json'
+
+# Semantic search index: 'local' (offline hashing embedder), 'openai' or 'off'.
+# OpenAI embeddings send every fetched transcript out, so they are opt-in
+EMBEDDER = os.getenv('EMBEDDER', 'local')
+EMBEDDING_DIMENSIONS = int(os.getenv('EMBEDDING_DIMENSIONS', '256'))
+SEMANTIC_INDEX_DIR = DATA_DIR / 'semantic_index'
+
+# Transcript and analysis caches
+transcript_cache = JsonStore(DATA_DIR / 'transcripts')
+analysis_cache = JsonStore(DATA_DIR / 'analyses')
+
+# Time indexes of recently used transcripts, for chapter and range requests
+segment_indexes = OrderedDict()
+segment_indexes_lock = threading.Lock()
+SEGMENT_INDEX_ITEMS = 64
+
+# Seconds either side of an ?at= time when the video has no chapters
+SECTION_WINDOW = float(os.getenv('SECTION_WINDOW', '300'))
+
+# Other instances asked for transcripts and analyses on a local cache miss
+CACHE_PEERS = [peer.strip() for peer in os.getenv('CACHE_PEERS', '').split(',') if peer.strip()]
+PEER_SECRET = os.getenv('PEER_SECRET')
+# Cached entries include answers to users' prompts, so peering needs the secret
+peer_cache = None
+if CACHE_PEERS and PEER_SECRET:
+    peer_cache = PeerCache(CACHE_PEERS, float(os.getenv('PEER_TIMEOUT', '0.5')), PEER_SECRET)
+elif CACHE_PEERS:
+    print("CACHE_PEERS is set but PEER_SECRET is not; peer cache disabled", file=sys.stderr)
+
+# Batch API input files and state for bulk analysis
+BATCH_DIR = DATA_DIR / 'batches'
+
+# Token usage and latency of every analysis, for tuning prompts and models
+usage_ledger = UsageLedger(DATA_DIR / 'usage.sqlite3')
+
+# Watchlist of channels/playlists polled for new uploads
+WATCHLIST_FILE = DATA_DIR / 'watchlist.json'
+DEFAULT_WATCHLIST = {
+    'interval_minutes': 60,
+    'max_videos_per_source': 10,
+    'sources': []
+}
+watchlist_status = {'last_poll': None, 'prefetched': 0, 'errors': {}, 'failed': {}}
+# Most recent prefetch failures kept in the watchlist status
+WATCHLIST_MAX_FAILED = 200
+watchlist_wakeup = threading.Event()
+
+VIDEO_ID_RE = re.compile(r'^[0-9A-Za-z_-]{11}$')
+
+# Live streams and premieres: captions grow while live_status is one of these
+LIVE_STATUSES = ('is_live', 'is_upcoming', 'post_live')
+LIVE_REFRESH_INTERVAL = float(os.getenv('LIVE_REFRESH_INTERVAL', '15'))
+LIVE_EXTRACT_INTERVAL = float(os.getenv('LIVE_EXTRACT_INTERVAL', '600'))
+LIVE_PERSIST_INTERVAL = float(os.getenv('LIVE_PERSIST_INTERVAL', '60'))
+
+# Caption language used when a request does not ask for one
+DEFAULT_LANG = os.getenv('DEFAULT_LANG', 'en')
+LANG_RE = re.compile(r'^[A-Za-z]{2,3}(-[0-9A-Za-z]{2,8})*$')
+
+# Subtitle formats we can parse, best first
+CAPTION_EXTS = ['json3', 'vtt', 'srv3', 'srv2', 'srv1']
+
+# Shared governor for all outbound yt-dlp and subtitle requests
+YOUTUBE_MAX_CONCURRENCY = int(os.getenv('YOUTUBE_MAX_CONCURRENCY', '4'))
+youtube_governor = OutboundGovernor(
+    rate=float(os.getenv('YOUTUBE_RATE', '1.0')),
+    max_rate=float(os.getenv('YOUTUBE_MAX_RATE', '5.0')),
+    max_concurrency=YOUTUBE_MAX_CONCURRENCY
+)
+
+# yt-dlp worker processes, each replaced after YTDLP_MAX_TASKS extractions;
+# 0 runs extractions in the app process
+YTDLP_WORKERS = int(os.getenv('YTDLP_WORKERS', '0'))
+ytdlp_pool = YtdlpPool(YTDLP_WORKERS, int(os.getenv('YTDLP_MAX_TASKS', '50'))) if YTDLP_WORKERS else None
+
+# Admission control per endpoint class: concurrent requests, queue length and
+# the longest a request may wait in the queue before it is shed with a 503.
+# Cache hits are served without entering a queue.
+admission_gates = {
+    'transcript': AdmissionGate(
+        'transcript',
+        concurrency=int(os.getenv('TRANSCRIPT_CONCURRENCY', str(YOUTUBE_MAX_CONCURRENCY))),
+        max_queue=int(os.getenv('TRANSCRIPT_QUEUE', '8')),
+        queue_timeout=float(os.getenv('TRANSCRIPT_QUEUE_TIMEOUT', '20'))
+    ),
+    'analyze': AdmissionGate(
+        'analyze',
+        concurrency=int(os.getenv('ANALYZE_CONCURRENCY', str(llm_router.governor.max_concurrency))),
+        max_queue=int(os.getenv('ANALYZE_QUEUE', '8')),
+        queue_timeout=float(os.getenv('ANALYZE_QUEUE_TIMEOUT', '30'))
+    ),
+    'prompts': AdmissionGate('prompts', concurrency=8, max_queue=32, queue_timeout=2)
+}
+
+# Speculative prefetch when a URL is pasted (0 disables it); prefetches never
+# queue, they are skipped when their slots are taken or real requests wait
+PREFETCH_CONCURRENCY = int(os.getenv('PREFETCH_CONCURRENCY', '1'))
+admission_gates['prefetch'] = AdmissionGate('prefetch', concurrency=max(PREFETCH_CONCURRENCY, 1),
+                                            max_queue=0, queue_timeout=0)
+prefetch_executor = ThreadPoolExecutor(max_workers=max(PREFETCH_CONCURRENCY, 1))
+
+# Deterministic fetch failures (no captions, private, removed, bad URL) are
+# answered from memory for a per-class TTL instead of re-running yt-dlp;
+# NEGATIVE_TTL_<CLASS> overrides a class's seconds, 0 stops caching it
+NEGATIVE_CACHE_CLASSES = ('invalid', 'private', 'age_restricted', 'members_only', 'not_started',
+                          'removed', 'no_captions')
+negative_cache = NegativeCache({
+    error_class: float(os.getenv(f'NEGATIVE_TTL_{error_class.upper()}'))
+    for error_class in NEGATIVE_CACHE_CLASSES if os.getenv(f'NEGATIVE_TTL_{error_class.upper()}')
+})
+
+# Concurrent fetches of one transcript (a prefetch and the request it
+# anticipated, or two users) share a single extraction
+transcript_flights = SingleFlight()
+
+# Resident memory budget in MiB including yt-dlp workers (0 disables it); as
+# usage approaches it caches shrink, concurrency drops and workers recycle
+MEMORY_BUDGET_MB = float(os.getenv('MEMORY_BUDGET_MB', '0'))
+# Share of the normal cache sizes and concurrency kept at each pressure level
+MEMORY_PRESSURE_FRACTIONS = {'normal': 1.0, 'high': 0.5, 'critical': 0.125}
+# Stack frames recorded per allocation when tracemalloc runs from startup (0 = off)
+TRACEMALLOC_FRAMES = int(os.getenv('TRACEMALLOC_FRAMES', '0'))
 
 # Default prompts
 DEFAULT_PROMPTS = [
@@ -41,7 +299,9 @@ DEFAULT_PROMPTS = [
     {
         "id": 4,
         "name": "Extract Statistics",
-        "prompt": "Extract all statistics, data points, and numerical information mentioned in this video."
+        "prompt": "Extract all statistics, data points, and numerical information mentioned in this video.",
+        "analyzer": "numeric_facts",
+        "analyzer_mode": "fallback"
     },
     {
         "id": 5,
@@ -57,8 +317,11 @@ def load_prompts():
         return DEFAULT_PROMPTS
     
     try:
-        with open(PROMPTS_FILE, 'r') as f:
-            return json.load(f)
+        with tracer.span('prompts.load') as span:
+            with open(PROMPTS_FILE, 'r') as f:
+                prompts = json.load(f)
+            span.set_attributes({'prompts.count': len(prompts), 'file.bytes': PROMPTS_FILE.stat().st_size})
+        return prompts
     except Exception as e:
         print(f"Error loading prompts: {e}")
         return DEFAULT_PROMPTS
@@ -66,8 +329,9 @@ def load_prompts():
 def save_prompts(prompts):
     """Save prompts to file"""
     try:
-        with open(PROMPTS_FILE, 'w') as f:
-            json.dump(prompts, f, indent=2)
+        with tracer.span('prompts.save', **{'prompts.count': len(prompts)}):
+            with open(PROMPTS_FILE, 'w') as f:
+                json.dump(prompts, f, indent=2)
         return True
     except Exception as e:
         print(f"Error saving prompts: {e}")
@@ -79,6 +343,34 @@ def get_next_prompt_id(prompts):
         return 1
     return max(p['id'] for p in prompts) + 1
 
+# Semantic index is opened lazily; embedding runs on a single background worker
+semantic_index = None
+semantic_index_lock = threading.Lock()
+index_executor = ThreadPoolExecutor(max_workers=1)
+
+def get_semantic_index():
+    """Open the semantic index on first use, or return None when disabled"""
+    global semantic_index
+    with semantic_index_lock:
+        if semantic_index is None and EMBEDDER != 'off':
+            from vector_index import VectorIndex, HashingEmbedder, OpenAIEmbedder
+            if EMBEDDER == 'openai':
+                embedder = OpenAIEmbedder(openai_embeddings.client, dimensions=EMBEDDING_DIMENSIONS)
+            else:
+                embedder = HashingEmbedder(dimensions=EMBEDDING_DIMENSIONS)
+            semantic_index = VectorIndex(SEMANTIC_INDEX_DIR, embedder)
+    return semantic_index
+
+def index_transcript(video_id, title, channel, segments):
+    """Add a transcript to the semantic index"""
+    try:
+        index = get_semantic_index()
+        if index is not None and not index.contains(video_id):
+            added = index.add_transcript(video_id, title, channel, segments)
+            print(f"Indexed {added} chunks for {video_id}")
+    except Exception as e:
+        print(f"Error indexing transcript {video_id}: {e}")
+
 HTML_TEMPLATE = """
 <!DOCTYPE html>
 <html lang="en">
@@ -300,6 +592,13 @@ HTML_TEMPLATE = """
             margin-bottom: 20px;
         }
         
+        .toggle-container .lang-input {
+            width: 200px;
+            margin-left: auto;
+            padding: 8px 12px;
+            font-size: 14px;
+        }
+        
         .toggle-switch {
             position: relative;
             display: inline-block;
@@ -452,7 +751,8 @@ HTML_TEMPLATE = """
         }
         
         .modal-body input[type="text"],
-        .modal-body textarea {
+        .modal-body textarea,
+        .modal-body select {
             width: 100%;
             padding: 10px;
             margin-bottom: 15px;
@@ -624,6 +924,14 @@ HTML_TEMPLATE = """
                 <label for="timestamp-toggle" class="toggle-label">
                     ⏱️ Include Timestamps
                 </label>
+                <input 
+                    type="text" 
+                    id="caption-lang" 
+                    class="lang-input"
+                    placeholder="Language (e.g. en, de)"
+                    title="Caption language; translated if the video has no track in it"
+                    autocomplete="off"
+                >
             </div>
             
             <div class="button-group">
@@ -688,6 +996,15 @@ HTML_TEMPLATE = """
                     </div>
                 </div>
                 
+                <div class="input-group" id="chapter-group" style="display: none;">
+                    <label for="chapter-selector">Part of the Video</label>
+                    <div class="prompt-selector">
+                        <select id="chapter-selector">
+                            <option value="">Whole video</option>
+                        </select>
+                    </div>
+                </div>
+                
                 <div class="input-group">
                     <label for="ai-prompt">Prompt for OpenAI</label>
                     <textarea 
@@ -697,6 +1014,16 @@ HTML_TEMPLATE = """
                     ></textarea>
                 </div>
                 
+                <div class="toggle-container">
+                    <label class="toggle-switch">
+                        <input type="checkbox" id="compress-toggle">
+                        <span class="toggle-slider"></span>
+                    </label>
+                    <label for="compress-toggle" class="toggle-label">
+                        🗜️ Compress transcript before sending (faster, less detail)
+                    </label>
+                </div>
+                
                 <div class="button-group">
                     <button class="btn-ai" id="analyze-btn" onclick="analyzeWithAI()" disabled>
                         🚀 Analyze with OpenAI
@@ -752,6 +1079,18 @@ HTML_TEMPLATE = """
                 
                 <label for="prompt-text">Prompt Text</label>
                 <textarea id="prompt-text" rows="6" placeholder="Enter the prompt text that will be sent to OpenAI..."></textarea>
+                
+                <label for="prompt-analyzer">Local Analyzer</label>
+                <select id="prompt-analyzer">
+                    <option value="">None (OpenAI only)</option>
+                </select>
+                
+                <label for="prompt-analyzer-mode">Analyzer Mode</label>
+                <select id="prompt-analyzer-mode">
+                    <option value="local">Local only</option>
+                    <option value="fallback">Local, OpenAI if nothing found</option>
+                    <option value="augment">Local findings added to OpenAI</option>
+                </select>
             </div>
             <div class="modal-footer">
                 <button class="btn-modal btn-modal-secondary" onclick="closePromptModal()">Cancel</button>
@@ -844,6 +1183,91 @@ HTML_TEMPLATE = """
             }
         }
         
+        const STAGE_TEXT = {
+            queued: 'Waiting for a free worker...',
+            started: 'Starting...',
+            extracting: 'Extracting video information...',
+            downloading: 'Downloading captions...',
+            parsing: 'Parsing transcript...',
+            compressing: 'Compressing transcript...',
+            analyzing: 'Analyzing with OpenAI...'
+        };
+        
+        // Submit a background job and resolve with its result, showing progress
+        // from the event stream and falling back to polling if the stream drops
+        async function runJob(type, params) {
+            const response = await fetch('/api/jobs', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({ type: type, ...params })
+            });
+            
+            const job = await response.json();
+            if (!job.success) {
+                return job;
+            }
+            // Cache hits are answered at once without queuing
+            if (job.status === 'done' || job.status === 'failed') {
+                return job.result;
+            }
+            
+            return new Promise((resolve) => {
+                const source = new EventSource(`/api/jobs/${job.job_id}/events`);
+                source.addEventListener('progress', (event) => {
+                    const stage = JSON.parse(event.data).stage;
+                    if (STAGE_TEXT[stage]) {
+                        showLoading(true, STAGE_TEXT[stage]);
+                    }
+                });
+                source.addEventListener('result', (event) => {
+                    source.close();
+                    resolve(JSON.parse(event.data).result);
+                });
+                source.onerror = () => {
+                    source.close();
+                    pollJob(job.job_id).then(resolve);
+                };
+            });
+        }
+        
+        async function pollJob(jobId) {
+            while (true) {
+                const response = await fetch(`/api/jobs/${jobId}`);
+                const job = await response.json();
+                if (!job.success) {
+                    return job;
+                }
+                if (job.status === 'done' || job.status === 'failed') {
+                    return job.result;
+                }
+                if (STAGE_TEXT[job.stage]) {
+                    showLoading(true, STAGE_TEXT[job.stage]);
+                }
+                await new Promise(r => setTimeout(r, 1000));
+            }
+        }
+        
+        // Video and caption language of the downloaded transcript, so analysis
+        // can refer to the server's cached copy instead of uploading the text;
+        // receivedTranscript tells whether the user has edited it since
+        let currentVideo = null;
+        let receivedTranscript = null;
+        let receivedDigest = null;
+        
+        function showChapters(chapters) {
+            const selector = document.getElementById('chapter-selector');
+            selector.innerHTML = '<option value="">Whole video</option>';
+            chapters.forEach((chapter, i) => {
+                const option = document.createElement('option');
+                option.value = i + 1;
+                option.textContent = `${i + 1}. ${chapter.title}`;
+                selector.appendChild(option);
+            });
+            document.getElementById('chapter-group').style.display = chapters.length ? 'block' : 'none';
+        }
+        
         async function downloadTranscript() {
             const urlInput = document.getElementById('youtube-url');
             const transcriptArea = document.getElementById('transcript');
@@ -860,25 +1284,25 @@ HTML_TEMPLATE = """
             document.getElementById('stats').style.display = 'none';
             document.getElementById('video-info').classList.remove('show');
             document.getElementById('analyze-btn').disabled = true;
+            currentVideo = null;
+            showChapters([]);
             
             try {
                 const includeTimestamps = document.getElementById('timestamp-toggle').checked;
+                const lang = document.getElementById('caption-lang').value.trim();
                 
-                const response = await fetch('/api/transcript', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json',
-                    },
-                    body: JSON.stringify({ 
-                        url: url,
-                        include_timestamps: includeTimestamps
-                    })
+                const data = await runJob('transcript', {
+                    url: url,
+                    include_timestamps: includeTimestamps,
+                    lang: lang
                 });
                 
-                const data = await response.json();
-                
                 if (data.success) {
                     transcriptArea.value = data.transcript;
+                    currentVideo = {video_id: data.video_id, lang: lang, include_timestamps: includeTimestamps};
+                    receivedTranscript = data.transcript;
+                    receivedDigest = data.transcript_sha256;
+                    showChapters(data.chapters || []);
                     updateStats(data.transcript, data.duration);
                     showVideoInfo(data.title, data.channel);
                     document.getElementById('analyze-btn').disabled = false;
@@ -926,22 +1350,49 @@ HTML_TEMPLATE = """
             analyzeBtn.disabled = true;
             
             try {
-                const response = await fetch('/api/analyze', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json',
-                    },
-                    body: JSON.stringify({ 
-                        transcript: transcript,
-                        prompt: prompt
-                    })
-                });
+                // Credit the saved prompt in the usage ledger unless it was edited
+                const selectedId = parseInt(document.getElementById('prompt-selector').value);
+                const saved = savedPrompts.find(p => p.id === selectedId);
                 
-                const data = await response.json();
+                const params = {
+                    prompt: prompt,
+                    prompt_id: saved && saved.prompt.trim() === prompt ? saved.id : null,
+                    compress: document.getElementById('compress-toggle').checked
+                };
+                
+                // The server analyzes its cached copy unless the text was edited; a
+                // single chapter is always cut from the cached copy
+                const chapter = document.getElementById('chapter-selector').value;
+                const edited = transcript !== receivedTranscript;
+                if (currentVideo && (chapter || !edited)) {
+                    Object.assign(params, currentVideo);
+                    if (chapter) {
+                        params.chapter = parseInt(chapter);
+                    } else {
+                        params.transcript_sha256 = receivedDigest;
+                    }
+                } else {
+                    params.transcript = transcript;
+                }
+                
+                let data = await runJob('analyze', params);
+                if (!data.success && data.transcript_mismatch) {
+                    // The cached copy changed since download; send the text after all
+                    const inline = {prompt: params.prompt, prompt_id: params.prompt_id,
+                                    compress: params.compress, transcript: transcript};
+                    data = await runJob('analyze', inline);
+                }
                 
                 if (data.success) {
                     aiResponseArea.value = data.response;
-                    showMessage('Analysis complete!', 'success');
+                    if (data.compression) {
+                        const percent = Math.round(data.compression.ratio * 100);
+                        showMessage(`Analysis complete! Transcript compressed to ${percent}% (${data.compression.tokens_saved.toLocaleString()} tokens saved)`, 'success');
+                    } else if (data.model && data.model.startsWith('local:')) {
+                        showMessage(`Analysis complete! Answered locally by the ${data.analyzer} analyzer`, 'success');
+                    } else {
+                        showMessage('Analysis complete!', 'success');
+                    }
                     
                     // Change button to "Clear AI Response"
                     analyzeBtn.innerHTML = '🗑️ Clear AI Response';
@@ -966,6 +1417,10 @@ HTML_TEMPLATE = """
             document.getElementById('stats').style.display = 'none';
             document.getElementById('video-info').classList.remove('show');
             document.getElementById('message').classList.remove('show');
+            currentVideo = null;
+            receivedTranscript = null;
+            receivedDigest = null;
+            showChapters([]);
             
             // Reset analyze button
             const analyzeBtn = document.getElementById('analyze-btn');
@@ -1059,6 +1514,8 @@ HTML_TEMPLATE = """
             document.getElementById('prompt-id').value = '';
             document.getElementById('prompt-name').value = '';
             document.getElementById('prompt-text').value = '';
+            document.getElementById('prompt-analyzer').value = '';
+            document.getElementById('prompt-analyzer-mode').value = 'local';
             document.getElementById('prompt-modal').classList.add('show');
         }
         
@@ -1070,6 +1527,8 @@ HTML_TEMPLATE = """
             document.getElementById('prompt-id').value = prompt.id;
             document.getElementById('prompt-name').value = prompt.name;
             document.getElementById('prompt-text').value = prompt.prompt;
+            document.getElementById('prompt-analyzer').value = prompt.analyzer || '';
+            document.getElementById('prompt-analyzer-mode').value = prompt.analyzer_mode || 'local';
             document.getElementById('prompt-modal').classList.add('show');
         }
         
@@ -1081,6 +1540,8 @@ HTML_TEMPLATE = """
             const id = document.getElementById('prompt-id').value;
             const name = document.getElementById('prompt-name').value.trim();
             const promptText = document.getElementById('prompt-text').value.trim();
+            const analyzer = document.getElementById('prompt-analyzer').value;
+            const analyzerMode = document.getElementById('prompt-analyzer-mode').value;
             
             if (!name || !promptText) {
                 showMessage('Please fill in both name and prompt text', 'error');
@@ -1096,7 +1557,9 @@ HTML_TEMPLATE = """
                     body: JSON.stringify({
                         id: id ? parseInt(id) : null,
                         name: name,
-                        prompt: promptText
+                        prompt: promptText,
+                        analyzer: analyzer || null,
+                        analyzer_mode: analyzer ? analyzerMode : null
                     })
                 });
                 
@@ -1115,6 +1578,25 @@ HTML_TEMPLATE = """
             }
         }
         
+        async function loadAnalyzers() {
+            try {
+                const response = await fetch('/api/analyzers');
+                const data = await response.json();
+                if (data.success) {
+                    const select = document.getElementById('prompt-analyzer');
+                    data.analyzers.forEach(analyzer => {
+                        const option = document.createElement('option');
+                        option.value = analyzer.name;
+                        option.textContent = analyzer.name;
+                        option.title = analyzer.description;
+                        select.appendChild(option);
+                    });
+                }
+            } catch (error) {
+                console.error('Error loading analyzers:', error);
+            }
+        }
+        
         async function deletePrompt(id) {
             if (!confirm('Are you sure you want to delete this prompt?')) {
                 return;
@@ -1142,6 +1624,7 @@ HTML_TEMPLATE = """
         // Load prompts on page load
         document.addEventListener('DOMContentLoaded', function() {
             loadPrompts();
+            loadAnalyzers();
         });
         
         // Allow Enter key to submit
@@ -1150,6 +1633,31 @@ HTML_TEMPLATE = """
                 downloadTranscript();
             }
         });
+        
+        // Start fetching as soon as a YouTube URL is pasted or typed, so the
+        // transcript is ready (or well underway) when the button is clicked
+        const YOUTUBE_URL_RE = /^(https?:\/\/)?([\w-]+\.)?(youtube\.com|youtu\.be)\/.*[0-9A-Za-z_-]{11}/;
+        let prefetchTimer = null;
+        let lastPrefetch = null;
+        
+        function schedulePrefetch() {
+            clearTimeout(prefetchTimer);
+            prefetchTimer = setTimeout(function() {
+                const url = document.getElementById('youtube-url').value.trim();
+                const lang = document.getElementById('caption-lang').value.trim();
+                const key = url + '|' + lang;
+                if (!YOUTUBE_URL_RE.test(url) || key === lastPrefetch) return;
+                lastPrefetch = key;
+                fetch('/api/prefetch', {
+                    method: 'POST',
+                    headers: {'Content-Type': 'application/json'},
+                    body: JSON.stringify({url: url, lang: lang})
+                }).catch(function() {});
+            }, 400);
+        }
+        
+        document.getElementById('youtube-url').addEventListener('input', schedulePrefetch);
+        document.getElementById('caption-lang').addEventListener('change', schedulePrefetch);
     </script>
 </body>
 </html>
@@ -1178,246 +1686,2144 @@ def index():
     return render_template_string(HTML_TEMPLATE)
 
 
-@app.route('/api/transcript', methods=['POST'])
-def get_transcript():
-    """API endpoint to fetch YouTube transcript"""
-    try:
-        data = request.get_json()
-        url = data.get('url', '').strip()
-        include_timestamps = data.get('include_timestamps', False)
-        
-        if not url:
-            return jsonify({
-                'success': False,
-                'error': 'No URL provided'
-            }), 400
-        
-        # Extract video ID
-        video_id = extract_video_id(url)
-        
-        if not video_id:
-            return jsonify({
-                'success': False,
-                'error': 'Invalid YouTube URL format'
-            }), 400
-        
-        # Configure yt-dlp options
-        ydl_opts = {
-            'writesubtitles': True,
-            'writeautomaticsub': True,
-            'skip_download': True,
-            'quiet': True,
-            'no_warnings': True,
-            'extract_flat': False,
+class TranscriptError(Exception):
+    """Transcript fetch failure carrying the HTTP status to report
+    
+    Failures remembered in the negative cache also carry their class and
+    expiry, and whether this answer came from the negative cache.
+    """
+    
+    def __init__(self, message, status=500, error_class=None, expires_at=None, cached=False):
+        super().__init__(message)
+        self.status = status
+        self.error_class = error_class
+        self.expires_at = expires_at
+        self.cached = cached
+    
+    def details(self):
+        """Extra response fields for a negatively cached failure"""
+        if self.expires_at is None:
+            return {}
+        return {
+            'error_class': self.error_class,
+            'expires_at': self.expires_at,
+            'expires_in': max(0, math.ceil(self.expires_at - time.time())),
+            'cached': self.cached
         }
-        
-        # Fetch video info and subtitles
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            
-            if not info:
-                return jsonify({
-                    'success': False,
-                    'error': 'Could not retrieve video information'
-                }), 404
-            
-            # Get duration
-            duration = info.get('duration', 0)
-            
-            # Get video metadata
-            title = info.get('title', 'Unknown Title')
-            channel = info.get('uploader', info.get('channel', 'Unknown Channel'))
-            
-            # Try to get subtitles (prefer manual over automatic)
-            subtitles = info.get('subtitles', {})
-            automatic_captions = info.get('automatic_captions', {})
-            
-            # Prefer English subtitles
-            subtitle_data = None
-            if 'en' in subtitles:
-                subtitle_data = subtitles['en']
-            elif 'en' in automatic_captions:
-                subtitle_data = automatic_captions['en']
-            elif subtitles:
-                # Use first available subtitle language
-                subtitle_data = list(subtitles.values())[0]
-            elif automatic_captions:
-                # Use first available automatic caption
-                subtitle_data = list(automatic_captions.values())[0]
-            
-            if not subtitle_data:
-                return jsonify({
-                    'success': False,
-                    'error': 'No subtitles or transcripts available for this video'
-                }), 404
-            
-            # Download the subtitle content
-            subtitle_url = None
-            for fmt in subtitle_data:
-                if fmt.get('ext') in ['vtt', 'srv3', 'srv2', 'srv1', 'json3']:
-                    subtitle_url = fmt.get('url')
-                    break
-            
-            if not subtitle_url:
-                return jsonify({
-                    'success': False,
-                    'error': 'Could not find downloadable subtitle format'
-                }), 404
-            
-            # Fetch subtitle content
-            import urllib.request
-            with urllib.request.urlopen(subtitle_url) as response:
-                subtitle_content = response.read().decode('utf-8')
-            
-            # Parse VTT or similar format to extract text
-            transcript_text = parse_subtitle_content(subtitle_content, include_timestamps)
-            
-            if not transcript_text:
-                return jsonify({
-                    'success': False,
-                    'error': 'Could not parse subtitle content'
-                }), 500
-            
-            # Format transcript with metadata header
-            from datetime import datetime
-            today = datetime.now().strftime('%B %d, %Y')
-            duration_formatted = f"{duration // 60}:{duration % 60:02d}"
-            
-            formatted_transcript = f"""# {title}
-**Channel:** {channel}
-**URL:** {url}
-**Duration:** {duration_formatted}
-**Date Watched:** {today}
 
-Transcript:
-{transcript_text}"""
-        
-        return jsonify({
-            'success': True,
-            'transcript': formatted_transcript,
-            'duration': duration,
-            'video_id': video_id,
-            'title': title,
-            'channel': channel
-        })
-        
-    except Exception as e:
-        return jsonify({
-            'success': False,
-            'error': f'Error: {str(e)}'
-        }), 500
 
+def extract_info(url, ydl_opts):
+    """Run a yt-dlp info extraction, in a worker process when the pool is enabled"""
+    if ytdlp_pool:
+        return ytdlp_pool.extract_info(url, ydl_opts)
+    
+    # yt-dlp loads hundreds of extractor modules, so it is imported on first use
+    import yt_dlp
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        return ydl.extract_info(url, download=False)
 
-@app.route('/api/analyze', methods=['POST'])
-def analyze_transcript():
-    """API endpoint to analyze transcript with OpenAI"""
-    try:
-        data = request.get_json()
-        transcript = data.get('transcript', '').strip()
-        prompt = data.get('prompt', '').strip()
-        
-        if not transcript:
-            return jsonify({
-                'success': False,
-                'error': 'No transcript provided'
-            }), 400
-        
-        if not prompt:
-            return jsonify({
-                'success': False,
-                'error': 'No prompt provided'
-            }), 400
-        
-        # Check if API key is configured
-        if not os.getenv('OPENAI_API_KEY'):
-            return jsonify({
-                'success': False,
-                'error': 'OpenAI API key not configured on server'
-            }), 500
-        
-        # Call OpenAI API
-        response = openai_client.chat.completions.create(
-            model="gpt-4o-mini",  # Using GPT-4o-mini for cost efficiency
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a helpful assistant that analyzes YouTube video transcripts. Provide clear, concise, and accurate analysis based on the user's request."
-                },
-                {
-                    "role": "user",
-                    "content": f"Here is a YouTube video transcript:\n\n{transcript}\n\nUser request: {prompt}"
-                }
-            ],
-            max_tokens=2000,
-            temperature=0.7
-        )
-        
-        ai_response = response.choices[0].message.content
-        
-        return jsonify({
-            'success': True,
-            'response': ai_response
-        })
-        
-    except Exception as e:
-        return jsonify({
-            'success': False,
-            'error': f'Error: {str(e)}'
-        }), 500
 
+def download_subtitle_segments(subtitle_url, after=None):
+    """Download a subtitle track and parse it as it arrives
 
-@app.route('/api/prompts', methods=['GET'])
-def get_prompts():
-    """Get all saved prompts"""
-    try:
-        prompts = load_prompts()
-        return jsonify({
-            'success': True,
-            'prompts': prompts
-        })
-    except Exception as e:
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
+    The response is decoded and parsed a chunk at a time, so the raw track
+    is never held in memory as a whole; only the parsed segments are kept.
+    """
+    started = time.perf_counter()
+    with urllib.request.urlopen(subtitle_url) as response:
+        connected = time.perf_counter()
+        reader = CountingReader(response)
+        segments = list(iter_subtitle_segments(io.TextIOWrapper(io.BufferedReader(reader), encoding='utf-8'), after))
+    elapsed = time.perf_counter() - started
+    set_attributes(**{
+        'caption.bytes': reader.bytes,
+        'caption.segments': len(segments),
+        'download.first_byte_ms': round((connected - started) * 1000, 1),
+        'download.read_ms': round(reader.read_time * 1000, 1),
+        'parse.ms': round((elapsed - (connected - started) - reader.read_time) * 1000, 1)
+    })
+    return segments
 
 
-@app.route('/api/prompts', methods=['POST'])
-def save_prompt_api():
-    """Create or update a prompt"""
-    try:
-        data = request.get_json()
-        prompt_id = data.get('id')
-        name = data.get('name', '').strip()
-        prompt_text = data.get('prompt', '').strip()
-        
-        if not name or not prompt_text:
-            return jsonify({
-                'success': False,
-                'error': 'Name and prompt text are required'
-            }), 400
-        
-        prompts = load_prompts()
-        
-        if prompt_id:
-            # Update existing prompt
-            prompt = next((p for p in prompts if p['id'] == prompt_id), None)
-            if prompt:
-                prompt['name'] = name
-                prompt['prompt'] = prompt_text
-            else:
-                return jsonify({
-                    'success': False,
-                    'error': 'Prompt not found'
-                }), 404
-        else:
-            # Create new prompt
-            new_id = get_next_prompt_id(prompts)
-            prompts.append({
-                'id': new_id,
-                'name': name,
-                'prompt': prompt_text
+def match_language(tracks, lang):
+    """Find the track key for a language, accepting regional variants like en-US"""
+    if lang in tracks:
+        return lang
+    for code in tracks:
+        if code.split('-')[0] == lang and not code.endswith('-orig'):
+            return code
+    return None
+
+
+def is_translated(formats):
+    """Check whether a caption track is a machine translation (tlang URL)"""
+    return any('tlang' in parse_qs(urlparse(f.get('url', '')).query) for f in formats)
+
+
+def with_tlang(formats, lang):
+    """Rewrite a caption track's URLs to ask YouTube for a translation into lang"""
+    translated = []
+    for fmt in formats:
+        parts = urlparse(fmt.get('url', ''))
+        query = [(k, v) for k, v in parse_qsl(parts.query) if k != 'tlang'] + [('tlang', lang)]
+        translated.append({**fmt, 'url': urlunparse(parts._replace(query=urlencode(query)))})
+    return translated
+
+
+def select_captions(info, lang, strict):
+    """Choose a caption track for lang
+
+    Preference: manual track, auto-generated track in that language, manual
+    track translated with tlang, auto-translated track. Unless strict, a video
+    without any of those falls back to its first manual or original automatic
+    track in whatever language it has.
+
+    Returns (formats, language, source) or None when the video has no captions.
+    """
+    subtitles = info.get('subtitles') or {}
+    automatic_captions = info.get('automatic_captions') or {}
+    
+    code = match_language(subtitles, lang)
+    if code:
+        return subtitles[code], code, 'manual'
+    
+    for code in (f'{lang}-orig', lang):
+        if code in automatic_captions and not is_translated(automatic_captions[code]):
+            return automatic_captions[code], lang, 'auto'
+    
+    if not strict:
+        if subtitles:
+            # Use first available subtitle language
+            code = next(iter(subtitles))
+            return subtitles[code], code, 'manual'
+        for code in automatic_captions:
+            # Use the original-language automatic captions
+            if not is_translated(automatic_captions[code]):
+                return automatic_captions[code], code.replace('-orig', ''), 'auto'
+        return None
+    
+    if subtitles:
+        return with_tlang(next(iter(subtitles.values())), lang), lang, 'translated'
+    
+    if lang in automatic_captions:
+        return automatic_captions[lang], lang, 'auto-translated'
+    
+    return None
+
+
+def report(progress, stage):
+    """Report a pipeline stage to an optional progress callback"""
+    if progress:
+        progress(stage)
+
+
+def extract_captions(url, lang=None, progress=None):
+    """Extract video metadata with yt-dlp and choose a caption track
+
+    When lang is None the default language is preferred but any available
+    track is accepted; an explicit lang is translated if necessary. Returns
+    (info, subtitle URL, format, caption language, caption source). Live
+    videos prefer VTT, which grows by appending and can be followed with
+    range requests.
+    """
+    strict = lang is not None
+    lang = lang or DEFAULT_LANG
+    
+    # Configure yt-dlp options; only the requested language's tracks are
+    # processed and streaming manifests and translated manual subtitles,
+    # which we never use, are not fetched
+    ydl_opts = {
+        'writesubtitles': True,
+        'writeautomaticsub': True,
+        'subtitleslangs': [lang, f'{lang}-orig'],
+        'subtitlesformat': '/'.join(CAPTION_EXTS),
+        'skip_download': True,
+        'ignore_no_formats_error': True,
+        'quiet': True,
+        'no_warnings': True,
+        'extract_flat': False,
+        'extractor_args': {'youtube': {'skip': ['translated_subs', 'hls', 'dash']}},
+    }
+    
+    # Fetch video info and subtitles
+    report(progress, 'extracting')
+    with tracer.span('youtube.extract', **{'video.url': url, 'ytdlp.pool': bool(ytdlp_pool)}) as span:
+        info = youtube_governor.call(extract_info, url, ydl_opts)
+        if info:
+            span.set_attributes({'video.duration': info.get('duration'), 'video.live_status': info.get('live_status')})
+    
+    if not info:
+        raise TranscriptError('Could not retrieve video information', 404)
+    
+    selected = select_captions(info, lang, strict)
+    
+    if not selected:
+        raise TranscriptError('No subtitles or transcripts available for this video', 404)
+    
+    subtitle_data, caption_lang, caption_source = selected
+    set_attributes(**{'caption.lang': caption_lang, 'caption.source': caption_source})
+    
+    # Prefer formats in CAPTION_EXTS order
+    exts = CAPTION_EXTS
+    if info.get('live_status') in LIVE_STATUSES:
+        exts = ['vtt'] + [ext for ext in CAPTION_EXTS if ext != 'vtt']
+    urls_by_ext = {fmt.get('ext'): fmt.get('url') for fmt in subtitle_data if fmt.get('url')}
+    for ext in exts:
+        if ext in urls_by_ext:
+            return info, urls_by_ext[ext], ext, caption_lang, caption_source
+    
+    raise TranscriptError('Could not find downloadable subtitle format', 404)
+
+
+def fetch_transcript_record(url, video_id, lang=None, progress=None):
+    """Extract video metadata with yt-dlp and download and parse its captions"""
+    info, subtitle_url, ext, caption_lang, caption_source = extract_captions(url, lang, progress)
+    live = info.get('live_status') in LIVE_STATUSES
+    
+    # Download and parse the captions into timed segments; a live VTT track
+    # is only parsed up to its last complete cue so later refreshes can
+    # continue from that byte offset
+    report(progress, 'downloading')
+    caption_offset = None
+    try:
+        if live and ext == 'vtt':
+            with tracer.span('subtitle.download', **{'caption.format': ext, 'caption.live': True}) as span:
+                data = youtube_governor.call(download_caption_tail, subtitle_url, 0)
+                span.set_attribute('caption.bytes', len(data))
+            caption_offset = complete_cues_length(data)
+            report(progress, 'parsing')
+            with tracer.span('subtitle.parse', **{'caption.format': ext}) as span:
+                segments = parse_subtitle_segments(data[:caption_offset].decode('utf-8'))
+                span.set_attribute('caption.segments', len(segments))
+        else:
+            # Parsing runs while the track downloads, so one span covers both
+            # and reports the time spent in each
+            with tracer.span('subtitle.download', **{'caption.format': ext}):
+                segments = youtube_governor.call(download_subtitle_segments, subtitle_url)
+            report(progress, 'parsing')
+    except ValueError as e:
+        raise TranscriptError(f'Could not parse subtitle content: {e}', 500)
+    
+    if not segments and not live:
+        raise TranscriptError('Could not parse subtitle content', 500)
+    
+    record = {
+        'video_id': video_id,
+        'title': info.get('title', 'Unknown Title'),
+        'channel': info.get('uploader', info.get('channel', 'Unknown Channel')),
+        'duration': info.get('duration', 0),
+        'lang': caption_lang,
+        'caption_source': caption_source,
+        'caption_format': ext,
+        'segments': segments,
+        'chapters': video_chapters(info),
+        'fetched_at': time.time()
+    }
+    if info.get('live_status') not in (None, 'not_live'):
+        record['live_status'] = info['live_status']
+    if live:
+        record.update({
+            'caption_url': subtitle_url,
+            'caption_offset': caption_offset,
+            'extracted_at': time.time(),
+            'persisted_at': time.time()
+        })
+    return record
+
+
+def download_caption_tail(subtitle_url, offset):
+    """Download caption bytes from offset on, with a range request when the server supports it"""
+    request = urllib.request.Request(subtitle_url, headers={'Range': f'bytes={offset}-'} if offset else {})
+    try:
+        with urllib.request.urlopen(request) as response:
+            data = response.read()
+            return data if response.status == 206 else data[offset:]
+    except urllib.error.HTTPError as e:
+        if e.code == 416:
+            return b''
+        raise
+
+
+def complete_cues_length(data):
+    """Length of the leading part of VTT bytes that ends with a complete cue"""
+    end = data.rfind(b'\n\n')
+    return end + 2 if end != -1 else 0
+
+
+def caption_url_expired(subtitle_url):
+    """Whether a signed YouTube caption URL is about to expire"""
+    expire = parse_qs(urlparse(subtitle_url).query).get('expire')
+    return bool(expire) and expire[0].isdigit() and int(expire[0]) - 60 < time.time()
+
+
+def segments_after(segments, after):
+    """Segments that start after the given time, scanning back from the end"""
+    index = len(segments)
+    while index > 0 and segments[index - 1]['start'] > after:
+        index -= 1
+    return segments[index:]
+
+
+def refresh_live_record(url, video_id, lang=None, progress=None):
+    """Bring a live video's cached transcript up to date, fetching only new captions
+
+    The caption URL from the last extraction is reused until it expires or
+    LIVE_EXTRACT_INTERVAL passes; VTT tracks are downloaded from the last
+    consumed byte with a range request and only the new cues are parsed.
+    When the video stops being live the final track replaces the live one.
+    Returns (record, new segments).
+    """
+    key = transcript_cache_key(video_id, lang)
+    record, cached = get_transcript_record(url, video_id, lang, progress)
+    if not cached:
+        return record, record['segments']
+    if record.get('live_status') not in LIVE_STATUSES:
+        return record, []
+    
+    segments = record['segments']
+    last_start = segments[-1]['start'] if segments else -1.0
+    
+    if time.time() - record['extracted_at'] > LIVE_EXTRACT_INTERVAL or caption_url_expired(record['caption_url']):
+        info, subtitle_url, ext, _, _ = extract_captions(url, lang, progress)
+        if info.get('live_status') not in LIVE_STATUSES:
+            final = fetch_transcript_record(url, video_id, lang, progress)
+            transcript_cache.put(key, final)
+            return final, segments_after(final['segments'], last_start)
+        if (ext == 'vtt') != (record['caption_offset'] is not None):
+            # The track changed format; start over with the new one
+            record = fetch_transcript_record(url, video_id, lang, progress)
+            transcript_cache.put(key, record)
+            return record, segments_after(record['segments'], last_start)
+        record.update({'live_status': info['live_status'], 'caption_url': subtitle_url,
+                       'extracted_at': time.time()})
+    
+    report(progress, 'downloading')
+    if record['caption_offset'] is not None:
+        data = youtube_governor.call(download_caption_tail, record['caption_url'], record['caption_offset'])
+        length = complete_cues_length(data)
+        new_segments = parse_subtitle_segments(data[:length].decode('utf-8'))
+        record['caption_offset'] += length
+    else:
+        new_segments = youtube_governor.call(download_subtitle_segments, record['caption_url'], last_start)
+    
+    segments.extend(new_segments)
+    record['refreshed_at'] = time.time()
+    
+    # The in-memory record is updated every refresh but written out less often
+    persist = time.time() - record['persisted_at'] >= LIVE_PERSIST_INTERVAL
+    if persist:
+        record['persisted_at'] = time.time()
+    transcript_cache.put(key, record, persist=persist)
+    return record, new_segments
+
+
+def transcript_cache_key(video_id, lang=None):
+    """Cache key of a transcript; each requested language is cached separately
+
+    Requests without a language may get a fallback track in any language, so
+    they are cached under "auto" rather than the default language.
+    """
+    return f"{video_id}.{lang or 'auto'}"
+
+
+def serves_language(record, lang):
+    """Whether a transcript record answers a request for lang
+
+    A request with a language needs a track in that language. Records cached
+    under "<id>.<lang>" before requests without a language got their own key
+    may hold a fallback track in another language.
+    """
+    return lang is None or record.get('lang', '').split('-')[0] == lang.split('-')[0]
+
+
+def get_transcript_record(url, video_id, lang=None, progress=None, index=True):
+    """Return the transcript record for a video, fetching it on a cache miss
+
+    Peers are asked before YouTube. Returns a (record, cached) tuple; records
+    from a peer count as cached. With index=False a fetched transcript is not
+    queued for the semantic index.
+    """
+    key = transcript_cache_key(video_id, lang)
+    set_attributes(**{'video.id': video_id, 'caption.lang_requested': lang or DEFAULT_LANG})
+    with tracer.span('cache.lookup', cache='transcripts') as span:
+        record = transcript_cache.get(key)
+        if record is not None and not serves_language(record, lang):
+            record = None
+        span.set_attribute('cache.hit', record is not None)
+    if record is not None:
+        return record, True
+    
+    with tracer.span('cache.lookup', cache='negative') as span:
+        failure = negative_cache.get(*failure_keys(url, video_id, lang).values())
+        span.set_attribute('cache.hit', failure is not None)
+    if failure is not None:
+        raise TranscriptError(failure['error'], failure['status'], failure['error_class'],
+                              failure['expires_at'], cached=True)
+    
+    (record, cached), shared = transcript_flights.do(
+        key, lambda report: load_transcript_record(url, video_id, key, lang, report, index), progress)
+    current_span().set_attribute('fetch.shared', shared)
+    return record, cached or shared
+
+
+def failure_keys(url, video_id, lang=None):
+    """Negative cache keys of a request for each failure scope"""
+    return {
+        'url': f"url:{url}",
+        'video': f"video:{video_id}",
+        'lang': f"lang:{transcript_cache_key(video_id, lang)}"
+    }
+
+
+def remember_failure(url, video_id, lang, error):
+    """Negative-cache a deterministic fetch failure; returns the TranscriptError to raise, or None"""
+    failure = classify_failure(str(error))
+    if failure is None:
+        return None
+    error_class, status, scope = failure
+    message = clean_message(str(error))
+    entry = negative_cache.put(failure_keys(url, video_id, lang)[scope], video_id, error_class, status, message)
+    print(f"Remembering failure of {video_id} ({error_class}): {message}")
+    return TranscriptError(message, status, error_class, entry['expires_at'] if entry else None)
+
+
+def load_transcript_record(url, video_id, key, lang=None, progress=None, index=True):
+    """Fetch a transcript record from a peer or YouTube and cache it; returns (record, from_peer)"""
+    record = None
+    if peer_cache:
+        with tracer.span('cache.lookup', cache='peers') as span:
+            record = peer_cache.fetch('transcripts', key, lambda r: r.get('video_id') == video_id
+                                      and isinstance(r.get('segments'), list) and serves_language(r, lang))
+            span.set_attribute('cache.hit', record is not None)
+    cached = record is not None
+    if record is None:
+        try:
+            record = fetch_transcript_record(url, video_id, lang, progress)
+        except (ThrottledError, AdmissionError):
+            raise
+        except Exception as e:
+            failure = remember_failure(url, video_id, lang, e)
+            if failure is None:
+                raise
+            raise failure from e
+    transcript_cache.put(key, record)
+    
+    # Index for semantic search without delaying the response
+    if index and EMBEDDER != 'off':
+        index_executor.submit(index_transcript, video_id, record['title'],
+                              record['channel'], record['segments'])
+    
+    return record, cached
+
+
+def transcript_available(key):
+    """Whether a transcript is cached or being fetched; either way a request needs no admission slot"""
+    return transcript_cache.contains(key) or transcript_flights.running(key)
+
+
+def segment_index(key, record):
+    """Time index over a transcript record's segments, kept for recently used records"""
+    with segment_indexes_lock:
+        index = segment_indexes.get(key)
+        if index is None or index.source is not record['segments']:
+            index = SegmentIndex(record['segments'])
+            segment_indexes[key] = index
+        segment_indexes.move_to_end(key)
+        while len(segment_indexes) > SEGMENT_INDEX_ITEMS:
+            segment_indexes.popitem(last=False)
+        index.sync()
+        return index
+
+
+def parse_section_args(data):
+    """Read chapter, start, end and at from request data; raises ValueError"""
+    spec = {}
+    if data.get('chapter') not in (None, ''):
+        try:
+            spec['chapter'] = int(data['chapter'])
+        except (TypeError, ValueError):
+            raise ValueError('chapter must be a chapter number')
+    for name in ('start', 'end', 'at'):
+        if data.get(name) in (None, ''):
+            continue
+        seconds = parse_time(data[name])
+        if seconds is None:
+            raise ValueError(f"{name} must be seconds or a timestamp like 1:20:00")
+        spec[name] = seconds
+    if 'start' in spec and 'end' in spec and spec['end'] <= spec['start']:
+        raise ValueError('end must be after start')
+    return spec
+
+
+def transcript_section(key, record, chapter=None, start=None, end=None, at=None):
+    """Select part of a transcript by chapter number (from 1), time range or a time inside it
+
+    at picks the chapter containing that time, or SECTION_WINDOW seconds
+    either side of it when the video has no chapters. Returns a dict with
+    the section's title, start, end, chapter number and segments.
+    """
+    chapters = record.get('chapters') or []
+    if at is not None:
+        number = chapter_at(chapters, at)
+        if number is not None:
+            chapter = number + 1
+        else:
+            start, end = max(0.0, at - SECTION_WINDOW), at + SECTION_WINDOW
+    
+    if chapter is not None:
+        if not 1 <= chapter <= len(chapters):
+            raise TranscriptError(f"No chapter {chapter}; this video has {len(chapters)}", 404)
+        selected = chapters[chapter - 1]
+        title = f"Chapter {chapter}: {selected['title']}"
+        start, end = selected['start'], selected['end']
+    else:
+        title = None
+    
+    segments = segment_index(key, record).range(start, end)
+    if not segments:
+        raise TranscriptError('No captions in that part of the video', 404)
+    start = start or 0.0
+    end = end if end is not None else max(segments[-1]['end'], start)
+    
+    return {
+        'title': title or 'Time range',
+        'chapter': chapter,
+        'start': start,
+        'end': end,
+        'segments': segments
+    }
+
+
+def section_summary(section):
+    """A section without its segments, for API responses"""
+    if not section:
+        return None
+    return {name: section[name] for name in ('title', 'chapter', 'start', 'end')}
+
+
+def iter_transcript_text(record, url, include_timestamps=False, section=None):
+    """Yield a transcript record's text with a markdown metadata header, piece by piece
+
+    With a section from transcript_section only its segments are included,
+    the header names it and Duration is the section's length.
+    """
+    duration = int(record['duration'] or 0)
+    segments = record['segments']
+    section_line = ''
+    if section:
+        duration = int(section['end'] - section['start'])
+        segments = section['segments']
+        section_line = (f"**Section:** {section['title']} "
+                        f"[{format_time(section['start'])}-{format_time(section['end'])}]\n")
+    today = datetime.now().strftime('%B %d, %Y')
+    duration_formatted = f"{duration // 60}:{duration % 60:02d}"
+    
+    yield f"""# {record['title']}
+**Channel:** {record['channel']}
+**URL:** {url}
+{section_line}**Duration:** {duration_formatted}
+**Date Watched:** {today}
+
+Transcript:
+"""
+    yield from iter_segment_text(segments, include_timestamps, segment_separator(record.get('caption_format')))
+
+
+def format_transcript(record, url, include_timestamps=False, section=None):
+    """Format a transcript record as text with a markdown metadata header"""
+    return ''.join(iter_transcript_text(record, url, include_timestamps, section))
+
+
+def chunked(pieces, size=16384):
+    """Group small strings into chunks of about size characters for streaming"""
+    buffer = []
+    length = 0
+    for piece in pieces:
+        buffer.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+# Set while /api/jobs tries to answer a request on the spot
+answering_inline = contextvars.ContextVar('answering_inline', default=False)
+
+
+class JobRequired(Exception):
+    """Raised instead of queuing for a gate while a request is answered inline"""
+
+
+def admission(name, cached=False):
+    """Admission to an endpoint class's gate; cache hits skip the queue
+
+    While answering inline, a request that would need a gate slot raises
+    JobRequired so it can be handed to the job queue instead.
+    """
+    if cached:
+        return nullcontext()
+    if answering_inline.get():
+        raise JobRequired(name)
+    return admission_gates[name].admit()
+
+
+def admission_controlled(name):
+    """Route decorator running the whole view under an admission gate"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                with admission_gates[name].admit():
+                    return view(*args, **kwargs)
+            except AdmissionError as e:
+                return json_response({'success': False, 'error': str(e), 'retry_after': e.retry_after}, 503)
+        return wrapper
+    return decorator
+
+
+def json_response(payload, status):
+    """Turn a request handler's (payload, status) result into a Flask response"""
+    headers = {}
+    if 'retry_after' in payload:
+        headers['Retry-After'] = str(payload['retry_after'])
+    return jsonify(payload), status, headers
+
+
+@app.before_request
+def start_request_span():
+    """Open a server span for the request, continuing an incoming traceparent"""
+    rule = request.url_rule.rule if request.url_rule else request.path
+    g.trace = tracer.start_span(f"{request.method} {rule}", {'http.method': request.method, 'http.route': rule},
+                                kind='server', traceparent=request.headers.get('traceparent'))
+
+
+@app.after_request
+def tag_request_span(response):
+    """Record the status on the request span and return its traceparent"""
+    span, _ = g.get('trace', (None, None))
+    if span is not None and span.recording:
+        span.set_attribute('http.status_code', response.status_code)
+        response.headers['traceparent'] = span.traceparent
+    return response
+
+
+@app.teardown_request
+def end_request_span(error=None):
+    if 'trace' in g:
+        tracer.end_span(*g.pop('trace'), error=error)
+
+
+def handle_transcript_request(data, progress=None):
+    """Validate and run a transcript request; returns a (payload, status) tuple"""
+    try:
+        url = data.get('url', '').strip()
+        include_timestamps = data.get('include_timestamps', False)
+        lang = (data.get('lang') or '').strip() or None
+        
+        if not url:
+            return {
+                'success': False,
+                'error': 'No URL provided'
+            }, 400
+        
+        if lang and not LANG_RE.match(lang):
+            return {
+                'success': False,
+                'error': 'Invalid language code'
+            }, 400
+        
+        try:
+            section_args = parse_section_args(data)
+        except ValueError as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }, 400
+        
+        # Extract video ID
+        video_id = extract_video_id(url)
+        
+        if not video_id:
+            return {
+                'success': False,
+                'error': 'Invalid YouTube URL format'
+            }, 400
+        
+        key = transcript_cache_key(video_id, lang)
+        with admission('transcript', transcript_available(key)):
+            record, cached = get_transcript_record(url, video_id, lang, progress)
+        section = None
+        if section_args:
+            section = transcript_section(key, record, **section_args)
+        
+        transcript = format_transcript(record, url, include_timestamps, section)
+        
+        return {
+            'success': True,
+            'transcript': transcript,
+            'transcript_sha256': transcript_digest(transcript),
+            'section': section_summary(section),
+            'chapters': record.get('chapters') or [],
+            'duration': record['duration'],
+            'video_id': video_id,
+            'title': record['title'],
+            'channel': record['channel'],
+            'lang': record.get('lang'),
+            'caption_source': record.get('caption_source'),
+            'cached': cached
+        }, 200
+        
+    except JobRequired:
+        raise
+    
+    except TranscriptError as e:
+        return {
+            'success': False,
+            'error': str(e),
+            **e.details()
+        }, e.status
+    
+    except ThrottledError as e:
+        return {
+            'success': False,
+            'error': str(e),
+            'retry_after': math.ceil(e.retry_after)
+        }, 429
+    
+    except AdmissionError as e:
+        return {
+            'success': False,
+            'error': str(e),
+            'retry_after': e.retry_after
+        }, 503
+    
+    except Exception as e:
+        return {
+            'success': False,
+            'error': f'Error: {str(e)}'
+        }, 500
+
+
+@app.route('/api/transcript', methods=['POST'])
+def get_transcript():
+    """API endpoint to fetch YouTube transcript"""
+    return json_response(*handle_transcript_request(request.get_json() or {}))
+
+
+def run_prefetch(url, video_id, lang):
+    """Prefetch worker body: fetch a transcript into the cache, holding a prefetch slot"""
+    gate = admission_gates['prefetch']
+    started = time.monotonic()
+    try:
+        get_transcript_record(url, video_id, lang)
+    except Exception as e:
+        print(f"Prefetch of {video_id} failed: {e}")
+    finally:
+        gate.release(time.monotonic() - started)
+
+
+@app.route('/api/prefetch', methods=['POST'])
+def prefetch_transcript():
+    """Start fetching a transcript in the background before it is asked for
+
+    Answers at once. A /api/transcript request for the same video and language
+    that arrives while the prefetch runs joins it instead of starting again.
+    """
+    data = request.get_json() or {}
+    url = (data.get('url') or '').strip()
+    lang = (data.get('lang') or '').strip() or None
+    
+    if lang and not LANG_RE.match(lang):
+        return jsonify({'success': False, 'error': 'Invalid language code'}), 400
+    
+    video_id = extract_video_id(url) if url else None
+    if not video_id:
+        return jsonify({'success': False, 'error': 'Invalid YouTube URL format'}), 400
+    
+    key = transcript_cache_key(video_id, lang)
+    if transcript_cache.contains(key):
+        status = 'cached'
+    elif transcript_flights.running(key):
+        status = 'in_flight'
+    elif not PREFETCH_CONCURRENCY or admission_gates['transcript'].stats()['queued']:
+        # Real requests are waiting; speculative work would only delay them
+        status = 'skipped'
+    else:
+        try:
+            admission_gates['prefetch'].acquire()
+            prefetch_executor.submit(tracer.wrap('prefetch', run_prefetch), url, video_id, lang)
+            status = 'started'
+        except AdmissionError:
+            status = 'skipped'
+    
+    return jsonify({
+        'success': True,
+        'video_id': video_id,
+        'status': status
+    }), 202 if status == 'started' else 200
+
+
+@app.route('/api/transcript/<video_id>/text', methods=['GET'])
+def stream_transcript_text(video_id):
+    """Stream a transcript as plain text with chunked transfer encoding
+
+    The text is generated from the parsed segments as it is sent, so no full
+    copy of the formatted transcript is built. Accepts ?timestamps=1 and the
+    chapter, start, end and at parameters of /api/transcript.
+    """
+    try:
+        url, lang, key = video_request_args(video_id)
+        section_args = parse_section_args(request.args)
+        with admission('transcript', transcript_available(key)):
+            record, _ = get_transcript_record(url, video_id, lang)
+        section = transcript_section(key, record, **section_args) if section_args else None
+        include_timestamps = request.args.get('timestamps') == '1'
+        
+        return Response(
+            stream_with_context(chunked(iter_transcript_text(record, url, include_timestamps, section))),
+            mimetype='text/plain'
+        )
+    
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    except TranscriptError as e:
+        return jsonify({'success': False, 'error': str(e), **e.details()}), e.status
+    
+    except ThrottledError as e:
+        return json_response({
+            'success': False,
+            'error': str(e),
+            'retry_after': math.ceil(e.retry_after)
+        }, 429)
+    
+    except AdmissionError as e:
+        return json_response({
+            'success': False,
+            'error': str(e),
+            'retry_after': e.retry_after
+        }, 503)
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'Error: {str(e)}'}), 500
+
+
+@app.route('/api/transcript/<video_id>/chapters', methods=['GET'])
+def get_chapters(video_id):
+    """List a video's chapters with the number of words in each"""
+    try:
+        url, lang, key = video_request_args(video_id)
+        with admission('transcript', transcript_available(key)):
+            record, cached = get_transcript_record(url, video_id, lang)
+        index = segment_index(key, record)
+        
+        return jsonify({
+            'success': True,
+            'video_id': video_id,
+            'duration': record['duration'],
+            'chapters': [{
+                'chapter': number,
+                **chapter,
+                'words': sum(len(s['text'].split()) for s in index.range(chapter['start'], chapter['end']))
+            } for number, chapter in enumerate(record.get('chapters') or [], 1)],
+            'cached': cached
+        })
+    
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    except TranscriptError as e:
+        return jsonify({'success': False, 'error': str(e), **e.details()}), e.status
+    
+    except ThrottledError as e:
+        return json_response({
+            'success': False,
+            'error': str(e),
+            'retry_after': math.ceil(e.retry_after)
+        }, 429)
+    
+    except AdmissionError as e:
+        return json_response({
+            'success': False,
+            'error': str(e),
+            'retry_after': e.retry_after
+        }, 503)
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'Error: {str(e)}'}), 500
+
+
+def split_transcript_header(transcript):
+    """Split formatted transcript text into its metadata header and body"""
+    header, marker, body = transcript.partition('\nTranscript:\n')
+    if not marker:
+        return '', transcript
+    return header + marker, body
+
+
+def analysis_cache_key(transcript, prompt, token_budget=0):
+    """Cache key for an analysis, ignoring the transcript's metadata header
+
+    The header carries the viewing date, so two requests for the same video and
+    prompt on different days still share a cache entry.
+    """
+    body = split_transcript_header(transcript)[1]
+    digest = hashlib.sha256()
+    digest.update(prompt.encode('utf-8'))
+    if token_budget:
+        digest.update(f"\0compress:{token_budget}".encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(body.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def transcript_digest(transcript):
+    """SHA-256 of a formatted transcript's body, ignoring the dated metadata header
+
+    Clients echo it back when analyzing by video_id, so the server can tell
+    whether its copy still matches the text the user is looking at.
+    """
+    return hashlib.sha256(split_transcript_header(transcript)[1].encode('utf-8')).hexdigest()
+
+
+HEADER_URL_RE = re.compile(r'^\*\*URL:\*\* (\S+)', re.M)
+HEADER_DURATION_RE = re.compile(r'^\*\*Duration:\*\* (\d+):(\d{2})', re.M)
+
+def transcript_source(transcript):
+    """Video ID and duration in seconds from a formatted transcript's header"""
+    header, _ = split_transcript_header(transcript)
+    url = HEADER_URL_RE.search(header)
+    duration = HEADER_DURATION_RE.search(header)
+    video_id = extract_video_id(url.group(1)) if url else None
+    seconds = int(duration.group(1)) * 60 + int(duration.group(2)) if duration else None
+    return video_id, seconds or None
+
+
+def record_usage(entry, transcript, prompt_id, latency, cached, priority):
+    """Add an analysis to the usage ledger"""
+    try:
+        video_id, duration = transcript_source(transcript)
+        usage = {} if cached else entry.get('usage') or {}
+        usage_ledger.record(
+            prompt_id=prompt_id,
+            prompt_type=entry.get('prompt_type'),
+            video_id=video_id,
+            video_duration=duration,
+            model=entry.get('model'),
+            prompt_tokens=usage.get('prompt_tokens'),
+            completion_tokens=usage.get('completion_tokens'),
+            latency=latency,
+            llm_latency=usage.get('latency'),
+            queue_wait=usage.get('queue_wait'),
+            cached=cached,
+            priority=priority
+        )
+    except Exception as e:
+        print(f"Error recording usage: {e}")
+
+
+def analysis_messages(transcript, prompt):
+    """Chat messages asking the LLM to analyze a transcript"""
+    return [
+        {
+            "role": "system",
+            "content": "You are a helpful assistant that analyzes YouTube video transcripts. Provide clear, concise, and accurate analysis based on the user's request."
+        },
+        {
+            "role": "user",
+            "content": f"Here is a YouTube video transcript:\n\n{transcript}\n\nUser request: {prompt}"
+        }
+    ]
+
+
+def run_analysis(transcript, prompt, token_budget=0, progress=None, priority='interactive',
+                 prompt_id=None):
+    """Analyze a transcript with the routed LLM, serving repeated requests from cache
+
+    With a token_budget the transcript body is first compressed locally.
+    priority is the LLM governor class the call queues in; prompt_id is the
+    saved prompt used, if any, and is only recorded in the usage ledger.
+    Returns an (analysis entry, cached) tuple; the entry holds the response
+    text, the model that produced it and any compression stats.
+    """
+    started = time.perf_counter()
+    source_transcript = transcript
+    key = analysis_cache_key(transcript, prompt, token_budget)
+    with tracer.span('cache.lookup', cache='analyses') as span:
+        entry = analysis_cache.get(key)
+        span.set_attribute('cache.hit', entry is not None)
+    if entry is None and peer_cache:
+        with tracer.span('cache.lookup', cache='peers') as span:
+            entry = peer_cache.fetch('analyses', key, lambda e: e.get('prompt') == prompt and 'response' in e)
+            span.set_attribute('cache.hit', entry is not None)
+        if entry is not None:
+            analysis_cache.put(key, entry)
+    if entry is not None:
+        record_usage(entry, transcript, prompt_id, time.perf_counter() - started, True, priority)
+        return entry, True
+    
+    compression = None
+    if token_budget:
+        report(progress, 'compressing')
+        from compression import compress_text
+        header, body = split_transcript_header(transcript)
+        with tracer.span('compress', **{'compression.token_budget': token_budget}) as span:
+            body, compression = compress_text(body, token_budget)
+            span.set_attributes({'compression.tokens_before': compression.get('tokens_before'),
+                                 'compression.tokens_after': compression.get('tokens_after')})
+        transcript = header + body
+    
+    # Route by transcript size and prompt type
+    messages = analysis_messages(transcript, prompt)
+    prompt_type = classify_prompt(prompt)
+    report(progress, 'analyzing')
+    with tracer.span('llm.complete', **{'llm.prompt_type': prompt_type, 'llm.priority': priority,
+                                        'llm.input_chars': len(transcript)}) as span:
+        completion = llm_router.complete(messages, prompt_type, temperature=0.7, priority=priority)
+        span.set_attributes({
+            'llm.model': completion.model,
+            'llm.prompt_tokens': completion.prompt_tokens,
+            'llm.completion_tokens': completion.completion_tokens,
+            'llm.queue_wait_ms': round(completion.queue_wait * 1000, 1) if completion.queue_wait is not None else None
+        })
+    
+    entry = {
+        'prompt': prompt,
+        'response': completion.text,
+        'model': completion.model,
+        'prompt_type': prompt_type,
+        'compression': compression,
+        'usage': {
+            'prompt_tokens': completion.prompt_tokens,
+            'completion_tokens': completion.completion_tokens,
+            'latency': completion.latency,
+            'queue_wait': completion.queue_wait
+        },
+        'created_at': time.time()
+    }
+    analysis_cache.put(key, entry)
+    record_usage(entry, source_transcript, prompt_id, time.perf_counter() - started, False, priority)
+    
+    return entry, False
+
+
+def run_local_analyzer(name, transcript, segments, chapters=None, prompt_id=None, priority='interactive'):
+    """Run a registered local analyzer; returns its markdown, or None if it found nothing
+
+    Local runs are recorded in the usage ledger under the model local:<name>.
+    """
+    started = time.perf_counter()
+    with tracer.span('analyzer.local', **{'analyzer.name': name, 'analyzer.segments': len(segments)}) as span:
+        response = ANALYZERS[name].run(segments, chapters)
+        span.set_attribute('analyzer.found', response is not None)
+    entry = {'model': f'local:{name}', 'prompt_type': 'local'}
+    record_usage(entry, transcript, prompt_id, time.perf_counter() - started, False, priority)
+    return response
+
+
+def prompt_analyzer(data, prompt_id):
+    """Analyzer name and mode for a request, from its own fields or its saved prompt
+
+    Raises ValueError for an unknown analyzer or mode.
+    """
+    name = data.get('analyzer')
+    mode = data.get('analyzer_mode')
+    if name is None and prompt_id is not None:
+        saved = next((p for p in load_prompts() if p.get('id') == prompt_id), None) or {}
+        name = saved.get('analyzer')
+        mode = mode or saved.get('analyzer_mode')
+    if not name:
+        return None, None
+    mode = mode or 'local'
+    if name not in ANALYZERS:
+        raise ValueError(f"Unknown analyzer; use one of: {', '.join(ANALYZERS)}")
+    if mode not in ANALYZER_MODES:
+        raise ValueError(f"Unknown analyzer_mode; use one of: {', '.join(ANALYZER_MODES)}")
+    return name, mode
+
+
+def handle_analyze_request(data, progress=None):
+    """Validate and run an analysis request; returns a (payload, status) tuple"""
+    try:
+        transcript = data.get('transcript', '').strip()
+        prompt = data.get('prompt', '').strip()
+        compress = data.get('compress', COMPRESS_TRANSCRIPTS)
+        priority = data.get('priority', 'interactive')
+        prompt_id = data.get('prompt_id')
+        video_id = (data.get('video_id') or '').strip()
+        lang = (data.get('lang') or '').strip() or None
+        expected_digest = (data.get('transcript_sha256') or '').strip().lower() or None
+        
+        try:
+            section_args = parse_section_args(data)
+            token_budget = 0
+            if compress:
+                budget = data.get('token_budget')
+                token_budget = COMPRESSION_TOKEN_BUDGET if budget is None else parse_token_budget(budget)
+        except ValueError as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }, 400
+        
+        if priority not in PRIORITIES:
+            return {
+                'success': False,
+                'error': f"Unknown priority; use one of: {', '.join(PRIORITIES)}"
+            }, 400
+        
+        if prompt_id is not None and not isinstance(prompt_id, int):
+            return {
+                'success': False,
+                'error': 'prompt_id must be a saved prompt ID'
+            }, 400
+        
+        if transcript and video_id:
+            return {
+                'success': False,
+                'error': 'Send either transcript text or a video_id, not both'
+            }, 400
+        
+        if not transcript and not video_id:
+            return {
+                'success': False,
+                'error': 'No transcript provided'
+            }, 400
+        
+        if video_id and not VIDEO_ID_RE.match(video_id):
+            return {
+                'success': False,
+                'error': 'Invalid video ID'
+            }, 400
+        
+        if lang and not LANG_RE.match(lang):
+            return {
+                'success': False,
+                'error': 'Invalid language code'
+            }, 400
+        
+        if section_args and not video_id:
+            return {
+                'success': False,
+                'error': 'chapter, start, end and at need a video_id'
+            }, 400
+        
+        if expected_digest and not video_id:
+            return {
+                'success': False,
+                'error': 'transcript_sha256 needs a video_id'
+            }, 400
+        
+        try:
+            analyzer_name, analyzer_mode = prompt_analyzer(data, prompt_id)
+        except ValueError as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }, 400
+        
+        if not prompt and analyzer_mode != 'local':
+            return {
+                'success': False,
+                'error': 'No prompt provided'
+            }, 400
+        
+        # Check if an LLM backend is configured
+        if analyzer_mode != 'local' and not llm_router.is_configured():
+            return {
+                'success': False,
+                'error': 'OpenAI API key not configured on server'
+            }, 500
+        
+        # By video ID the transcript comes from the cache, so only the
+        # requested chapter or time range is sent to the LLM
+        section = None
+        chapters = None
+        if video_id:
+            url = f"https://www.youtube.com/watch?v={video_id}"
+            key = transcript_cache_key(video_id, lang)
+            with admission('transcript', transcript_available(key)):
+                record, _ = get_transcript_record(url, video_id, lang, progress)
+            if section_args:
+                section = transcript_section(key, record, **section_args)
+            transcript = format_transcript(record, url, data.get('include_timestamps', False), section)
+            # The client's copy may be a different track than the one cached now
+            if expected_digest and expected_digest != transcript_digest(transcript):
+                return {
+                    'success': False,
+                    'error': 'The server copy of this transcript differs from yours; send the text instead',
+                    'transcript_mismatch': True
+                }, 409
+            segments = section['segments'] if section else record['segments']
+            chapters = record.get('chapters')
+        
+        local = None
+        if analyzer_name:
+            if analyzer_mode != 'local' and answering_inline.get():
+                # Whether the LLM call is cached is only known after the local
+                # analyzer ran; leave both to the job rather than run it twice
+                raise JobRequired('analyze')
+            if not video_id:
+                segments = segments_from_text(split_transcript_header(transcript)[1])
+            report(progress, 'analyzing')
+            local = run_local_analyzer(analyzer_name, transcript, segments, chapters, prompt_id, priority)
+            if analyzer_mode == 'local' or (analyzer_mode == 'fallback' and local):
+                return {
+                    'success': True,
+                    'response': local or 'The local analyzer found nothing to report in this transcript.',
+                    'model': f'local:{analyzer_name}',
+                    'analyzer': analyzer_name,
+                    'compression': None,
+                    'section': section_summary(section),
+                    'cached': False
+                }, 200
+            if analyzer_mode == 'augment' and local:
+                prompt = (f"{prompt}\n\nThese findings were extracted from the transcript by a local "
+                          f"{analyzer_name} analyzer and can be relied on:\n\n{local}")
+        
+        hit = analysis_cache.contains(analysis_cache_key(transcript, prompt, token_budget))
+        with admission('analyze', hit):
+            entry, cached = run_analysis(transcript, prompt, token_budget, progress, priority, prompt_id)
+        
+        response = entry['response']
+        if analyzer_mode == 'augment' and local:
+            response = f"{local}\n\n{response}"
+        
+        return {
+            'success': True,
+            'response': response,
+            'model': entry.get('model'),
+            'analyzer': analyzer_name,
+            'compression': entry.get('compression'),
+            'section': section_summary(section),
+            'cached': cached
+        }, 200
+        
+    except JobRequired:
+        raise
+    
+    except TranscriptError as e:
+        return {
+            'success': False,
+            'error': str(e),
+            **e.details()
+        }, e.status
+    
+    except ThrottledError as e:
+        return {
+            'success': False,
+            'error': str(e),
+            'retry_after': math.ceil(e.retry_after)
+        }, 429
+    
+    except AdmissionError as e:
+        return {
+            'success': False,
+            'error': str(e),
+            'retry_after': e.retry_after
+        }, 503
+    
+    except LLMBusyError as e:
+        return {
+            'success': False,
+            'error': f'Server busy: {e}',
+            'retry_after': e.retry_after
+        }, 503
+    
+    except Exception as e:
+        return {
+            'success': False,
+            'error': f'Error: {str(e)}'
+        }, 500
+
+
+@app.route('/api/analyze', methods=['POST'])
+def analyze_transcript():
+    """API endpoint to analyze transcript with OpenAI"""
+    return json_response(*handle_analyze_request(request.get_json() or {}))
+
+
+JOB_HANDLERS = {
+    'transcript': handle_transcript_request,
+    'analyze': handle_analyze_request
+}
+
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Submit a transcript or analysis request to run in the background"""
+    try:
+        data = request.get_json() or {}
+        kind = data.get('type', '')
+        
+        if kind not in JOB_HANDLERS:
+            return jsonify({
+                'success': False,
+                'error': f"Unknown job type; use one of: {', '.join(JOB_HANDLERS)}"
+            }), 400
+        
+        priority = data.get('priority', 'interactive')
+        if priority not in PRIORITIES:
+            return jsonify({
+                'success': False,
+                'error': f"Unknown priority; use one of: {', '.join(PRIORITIES)}"
+            }), 400
+        
+        # Cache hits and requests joining a running fetch are answered now
+        # instead of waiting in the job queue behind extractions and LLM calls
+        token = answering_inline.set(True)
+        try:
+            result, status = JOB_HANDLERS[kind](data)
+        except JobRequired:
+            result = None
+        finally:
+            answering_inline.reset(token)
+        if result is not None:
+            job = job_manager.add_finished(kind, result, status, priority=priority)
+            return jsonify({
+                'success': True,
+                'job_id': job.id,
+                'status': job.status,
+                'result': result
+            }), 200
+        
+        job = job_manager.submit(kind, tracer.wrap(f'job.{kind}', JOB_HANDLERS[kind]), data, priority=priority)
+        
+        return jsonify({
+            'success': True,
+            'job_id': job.id,
+            'status': job.status
+        }), 202
+        
+    except QueueFullError as e:
+        return jsonify({
+            'success': False,
+            'error': f'Server busy: {e}',
+            'retry_after': 5
+        }), 503, {'Retry-After': '5'}
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@app.route('/api/jobs', methods=['GET'])
+def get_job_stats():
+    """Get worker pool size and job counts by status"""
+    return jsonify({
+        'success': True,
+        **job_manager.stats()
+    })
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Poll a job's status, and its result once finished"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Job not found or expired'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        **job.to_dict()
+    })
+
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def stream_job_events(job_id):
+    """Stream a job's progress as server-sent events, ending with its result"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Job not found or expired'
+        }), 404
+    try:
+        after = int(request.headers.get('Last-Event-ID') or -1)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Last-Event-ID must be an event sequence number'}), 400
+    
+    def generate():
+        last_seq = after
+        while True:
+            events = job_manager.wait_for_events(job, last_seq, timeout=15)
+            for event in events:
+                last_seq = event['seq']
+                yield f"id: {last_seq}\nevent: progress\ndata: {json.dumps(event)}\n\n"
+            if job.finished:
+                yield f"event: result\ndata: {json.dumps(job.to_dict())}\n\n"
+                return
+            if not events:
+                # Keep proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+# Refreshes of followed live transcripts are shared by all waiting clients
+live_feed = LiveFeed(refresh_live_record, LIVE_REFRESH_INTERVAL)
+
+
+def video_request_args(video_id):
+    """Parse a per-video request's ?url= and ?lang= into (url, lang, cache key); raises ValueError"""
+    if not VIDEO_ID_RE.match(video_id):
+        raise ValueError('Invalid video ID')
+    url = request.args.get('url') or f"https://www.youtube.com/watch?v={video_id}"
+    if extract_video_id(url) != video_id:
+        raise ValueError('url does not belong to this video')
+    lang = (request.args.get('lang') or '').strip() or None
+    if lang and not LANG_RE.match(lang):
+        raise ValueError('Invalid language code')
+    return url, lang, transcript_cache_key(video_id, lang)
+
+
+@app.route('/api/live/<video_id>/lines', methods=['GET'])
+def get_live_lines(video_id):
+    """Long-poll for caption lines starting after ?after= seconds
+
+    Answers as soon as there are new lines, the video is no longer live, or
+    ?timeout= seconds (default 25) pass.
+    """
+    try:
+        url, lang, key = video_request_args(video_id)
+        after = float(request.args.get('after', -1))
+        deadline = time.monotonic() + min(float(request.args.get('timeout', 25)), 60)
+        
+        while True:
+            live_feed.refresh_if_due(key, url, video_id, lang)
+            record = transcript_cache.get(key)
+            lines = segments_after(record['segments'], after) if record else []
+            live = record is None or record.get('live_status') in LIVE_STATUSES
+            if lines or not live or time.monotonic() >= deadline:
+                break
+            live_feed.wait(key, deadline - time.monotonic())
+        
+        return jsonify({
+            'success': True,
+            'video_id': video_id,
+            'live': live,
+            'live_status': record.get('live_status') if record else None,
+            'lines': lines,
+            'after': lines[-1]['start'] if lines else after
+        })
+    
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    except TranscriptError as e:
+        return jsonify({'success': False, 'error': str(e), **e.details()}), e.status
+    
+    except ThrottledError as e:
+        return json_response({
+            'success': False,
+            'error': str(e),
+            'retry_after': math.ceil(e.retry_after)
+        }, 429)
+    
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'Error: {str(e)}'}), 500
+
+
+@app.route('/api/live/<video_id>/events', methods=['GET'])
+def stream_live_lines(video_id):
+    """Stream new caption lines of a live video as server-sent events until it ends"""
+    try:
+        url, lang, key = video_request_args(video_id)
+        after = float(request.headers.get('Last-Event-ID') or request.args.get('after', -1))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    def generate():
+        last = after
+        while True:
+            try:
+                live_feed.refresh_if_due(key, url, video_id, lang)
+            except (TranscriptError, ThrottledError) as e:
+                yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+                return
+            
+            record = transcript_cache.get(key)
+            lines = segments_after(record['segments'], last) if record else []
+            if lines:
+                last = lines[-1]['start']
+                yield f"id: {last}\nevent: lines\ndata: {json.dumps({'lines': lines})}\n\n"
+            if record and record.get('live_status') not in LIVE_STATUSES:
+                yield f"event: end\ndata: {json.dumps({'live_status': record.get('live_status')})}\n\n"
+                return
+            if not lines:
+                # Keep proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+            live_feed.wait(key, LIVE_REFRESH_INTERVAL)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def load_watchlist():
+    """Load the watchlist configuration"""
+    if not WATCHLIST_FILE.exists():
+        return dict(DEFAULT_WATCHLIST)
+    
+    try:
+        with open(WATCHLIST_FILE, 'r') as f:
+            return {**DEFAULT_WATCHLIST, **json.load(f)}
+    except Exception as e:
+        print(f"Error loading watchlist: {e}")
+        return dict(DEFAULT_WATCHLIST)
+
+
+def save_watchlist(watchlist):
+    """Save the watchlist configuration"""
+    try:
+        with open(WATCHLIST_FILE, 'w') as f:
+            json.dump(watchlist, f, indent=2)
+        return True
+    except Exception as e:
+        print(f"Error saving watchlist: {e}")
+        return False
+
+
+def list_source_videos(source_url, limit):
+    """List the newest video IDs of a channel or playlist using flat extraction"""
+    ydl_opts = {
+        'extract_flat': 'in_playlist',
+        'playlistend': limit,
+        'skip_download': True,
+        'quiet': True,
+        'no_warnings': True,
+    }
+    
+    info = youtube_governor.call(extract_info, source_url, ydl_opts)
+    
+    video_ids = []
+    for entry in (info or {}).get('entries') or []:
+        # Channel root URLs list tabs rather than videos; those are skipped
+        entry_id = (entry or {}).get('id') or ''
+        if VIDEO_ID_RE.match(entry_id):
+            video_ids.append(entry_id)
+    return video_ids[:limit]
+
+
+def prefetch_video(video_id, prompt_ids):
+    """Fetch and cache a transcript and run the selected saved prompts on it"""
+    url = f"https://www.youtube.com/watch?v={video_id}"
+    record, cached = get_transcript_record(url, video_id)
+    
+    if prompt_ids and llm_router.is_configured():
+        prompts = {p['id']: p['prompt'] for p in load_prompts()}
+        transcript = format_transcript(record, url)
+        for prompt_id in prompt_ids:
+            if prompt_id in prompts:
+                run_analysis(transcript, prompts[prompt_id], priority='background', prompt_id=prompt_id)
+    
+    return not cached
+
+
+def poll_watchlist():
+    """Poll every watchlist source once and prefetch new uploads"""
+    watchlist = load_watchlist()
+    prefetched = 0
+    
+    try:
+        for source in watchlist.get('sources', []):
+            prefetched += poll_watchlist_source(source, watchlist['max_videos_per_source'])
+    except ThrottledError as e:
+        # Leave the rest for the next poll instead of adding to the pressure
+        print(f"Watchlist: throttled, stopping this poll: {e}")
+    
+    watchlist_status['last_poll'] = time.time()
+    watchlist_status['prefetched'] += prefetched
+    return prefetched
+
+
+def poll_watchlist_source(source, default_limit):
+    """Prefetch new uploads from one watchlist source"""
+    source_url = source.get('url', '').strip()
+    if not source_url:
+        return 0
+    
+    limit = source.get('max_videos', default_limit)
+    prompt_ids = source.get('prompt_ids', [])
+    prefetched = 0
+    
+    try:
+        video_ids = list_source_videos(source_url, limit)
+    except ThrottledError:
+        raise
+    except Exception as e:
+        print(f"Watchlist: error listing {source_url}: {e}")
+        watchlist_status['errors'][source_url] = str(e)
+        return 0
+    
+    watchlist_status['errors'].pop(source_url, None)
+    
+    for video_id in video_ids:
+        try:
+            if prefetch_video(video_id, prompt_ids):
+                prefetched += 1
+                print(f"Watchlist: prefetched {video_id} from {source_url}")
+            watchlist_status['failed'].pop(video_id, None)
+        except ThrottledError:
+            raise
+        except TranscriptError as e:
+            # Videos without captions are answered from the negative cache until
+            # their entry expires; transient failures are retried next poll
+            if not e.cached:
+                print(f"Watchlist: error prefetching {video_id}: {e}")
+            record_watchlist_failure(video_id, e)
+        except Exception as e:
+            print(f"Watchlist: error prefetching {video_id}: {e}")
+            record_watchlist_failure(video_id, e)
+    
+    return prefetched
+
+
+def record_watchlist_failure(video_id, error):
+    """Note the latest prefetch failure of a video in the watchlist status"""
+    failed = watchlist_status['failed']
+    failed.pop(video_id, None)
+    failed[video_id] = {'error': str(error), 'failed_at': time.time()}
+    while len(failed) > WATCHLIST_MAX_FAILED:
+        failed.pop(next(iter(failed)))
+
+
+def watchlist_loop():
+    """Background scheduler that polls the watchlist at its configured interval"""
+    while True:
+        try:
+            poll_watchlist()
+        except Exception as e:
+            print(f"Watchlist: poll failed: {e}")
+        
+        interval = max(load_watchlist()['interval_minutes'], 1) * 60
+        watchlist_wakeup.wait(interval)
+        watchlist_wakeup.clear()
+
+
+def start_watchlist_scheduler():
+    """Start the watchlist scheduler thread"""
+    thread = threading.Thread(target=watchlist_loop, name='watchlist', daemon=True)
+    thread.start()
+    return thread
+
+
+@app.route('/api/watchlist', methods=['GET'])
+def get_watchlist():
+    """Get the watchlist configuration and scheduler status"""
+    try:
+        return jsonify({
+            'success': True,
+            'watchlist': load_watchlist(),
+            'status': watchlist_status
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@app.route('/api/watchlist', methods=['POST'])
+def save_watchlist_api():
+    """Replace the watchlist configuration"""
+    try:
+        data = request.get_json()
+        sources = data.get('sources', [])
+        
+        if not isinstance(sources, list) or not all(
+                isinstance(s, dict) and s.get('url', '').strip() for s in sources):
+            return jsonify({
+                'success': False,
+                'error': 'Each source needs a channel or playlist URL'
+            }), 400
+        
+        watchlist = {
+            'interval_minutes': int(data.get('interval_minutes', DEFAULT_WATCHLIST['interval_minutes'])),
+            'max_videos_per_source': int(data.get('max_videos_per_source',
+                                                  DEFAULT_WATCHLIST['max_videos_per_source'])),
+            'sources': sources
+        }
+        
+        if save_watchlist(watchlist):
+            return jsonify({
+                'success': True,
+                'watchlist': watchlist
             })
+        else:
+            return jsonify({
+                'success': False,
+                'error': 'Failed to save watchlist'
+            }), 500
+            
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@app.route('/api/watchlist/poll', methods=['POST'])
+def poll_watchlist_api():
+    """Wake the scheduler to poll the watchlist now"""
+    watchlist_wakeup.set()
+    return jsonify({
+        'success': True
+    })
+
+
+def warm_llm_clients():
+    """Create the OpenAI clients of configured backends"""
+    for backend in list(llm_router.backends.values()) + [openai_embeddings]:
+        if isinstance(backend, OpenAICompatibleBackend) and backend.is_configured():
+            backend.client
+
+
+def prewarm():
+    """Load heavy dependencies and the semantic index ahead of the first request"""
+    steps = [
+        ('yt_dlp', ytdlp_pool.warm if ytdlp_pool else lambda: importlib.import_module('yt_dlp')),
+        ('compression', lambda: importlib.import_module('compression')),
+        ('llm_clients', warm_llm_clients),
+        ('semantic_index', get_semantic_index)
+    ]
+    for name, step in steps:
+        started = time.perf_counter()
+        try:
+            step()
+            startup_status['prewarm'][name] = round((time.perf_counter() - started) * 1000)
+        except Exception as e:
+            startup_status['prewarm'][name] = f'Error: {str(e)}'
+            print(f"Prewarm of {name} failed: {e}")
+    
+    startup_status['warmed_at'] = time.time()
+    startup_status['ready'] = True
+    print(f"Prewarm finished in {startup_status['warmed_at'] - startup_status['listening_at']:.2f}s")
+    sd_notify('STATUS=Ready')
+
+
+def sd_notify(message):
+    """Send a state update to systemd when running as a Type=notify service"""
+    address = os.getenv('NOTIFY_SOCKET')
+    if not address:
+        return False
+    if address.startswith('@'):
+        address = '\0' + address[1:]
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.connect(address)
+            sock.sendall(message.encode('utf-8'))
+        return True
+    except OSError as e:
+        print(f"Error notifying systemd: {e}")
+        return False
+
+
+@app.route('/api/ready', methods=['GET'])
+def get_ready():
+    """Readiness check: 200 once prewarm has finished, 503 while it runs"""
+    payload = {'success': True, **startup_status}
+    if not startup_status['ready']:
+        payload['retry_after'] = 1
+        return json_response(payload, 503)
+    return json_response(payload, 200)
+
+
+@app.route('/api/peer/<store>/<key>', methods=['GET'])
+def get_peer_entry(store, key):
+    """Serve a local cache entry to a peer instance
+
+    Only the local store is consulted, never this instance's own peers. The
+    endpoint exists only when peers are configured, and requests must be
+    signed with the shared secret.
+    """
+    stores = {'transcripts': transcript_cache, 'analyses': analysis_cache}
+    if not peer_cache or store not in stores:
+        return jsonify({'success': False, 'error': 'Not found'}), 404
+    
+    if not check_request_auth(request.headers.get(AUTH_HEADER), store, key, PEER_SECRET):
+        return jsonify({'success': False, 'error': 'Invalid or expired peer signature'}), 403
+    
+    try:
+        entry = stores[store].get(key, remember=False)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    if entry is None:
+        return jsonify({'success': False, 'error': 'Not cached'}), 404
+    
+    body, digest = encode_entry(entry, PEER_SECRET)
+    return Response(body, mimetype='application/json', headers={DIGEST_HEADER: digest})
+
+
+@app.route('/api/peers', methods=['GET'])
+def get_peers():
+    """Get the configured cache peers and their lookup counts"""
+    return jsonify({
+        'success': True,
+        'peers': peer_cache.state() if peer_cache else None
+    })
+
+
+@app.route('/api/usage', methods=['GET'])
+def get_usage():
+    """Summarize LLM usage: slowest prompts, tokens per video minute, cost per day"""
+    try:
+        days = float(request.args.get('days', 30))
+        limit = int(request.args.get('limit', 10))
+        return jsonify({
+            'success': True,
+            'days': days,
+            'usage': usage_ledger.summary(since=time.time() - days * 86400, limit=limit)
+        })
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'days and limit must be numbers'
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+llm_max_concurrency = llm_router.governor.max_concurrency
+
+def apply_memory_pressure(level):
+    """Shrink caches, lower concurrency and recycle yt-dlp workers for a memory pressure level"""
+    fraction = MEMORY_PRESSURE_FRACTIONS[level]
+    transcript_cache.resize(fraction)
+    analysis_cache.resize(fraction)
+    if fraction < 1:
+        with segment_indexes_lock:
+            segment_indexes.clear()
+    youtube_governor.set_max_concurrency(max(1, int(YOUTUBE_MAX_CONCURRENCY * fraction)))
+    for gate in admission_gates.values():
+        gate.set_concurrency(max(1, int(gate.max_concurrency * fraction)))
+    llm_router.governor.set_max_concurrency(max(1, int(llm_max_concurrency * fraction)))
+    if level == 'critical' and ytdlp_pool:
+        ytdlp_pool.recycle()
+
+
+memory_budget = MemoryBudget(MEMORY_BUDGET_MB * 1048576, apply_memory_pressure) if MEMORY_BUDGET_MB else None
+
+
+def cache_memory(store):
+    """Entries held in a cache's memory layer and their approximate size"""
+    entries = store.memory_entries()
+    return {'items': len(entries), 'max_items': store.memory_items, 'bytes': deep_sizeof(entries)}
+
+
+@app.route('/api/memory', methods=['GET'])
+def get_memory():
+    """Resident memory, budget state, per-cache memory and the top tracemalloc allocation sites
+
+    ?top= limits the allocation sites (default 20) and ?group= groups them by
+    lineno, filename or traceback.
+    """
+    try:
+        top = min(int(request.args.get('top', 20)), 200)
+        group_by = request.args.get('group', 'lineno')
+        if group_by not in ('lineno', 'filename', 'traceback'):
+            return jsonify({'success': False, 'error': 'group must be lineno, filename or traceback'}), 400
+        
+        with segment_indexes_lock:
+            indexes = list(segment_indexes.values())
+        index = semantic_index
+        
+        return jsonify({
+            'success': True,
+            'rss_bytes': rss_bytes(),
+            'children_rss_bytes': sum(rss_bytes(pid) or 0 for pid in descendant_pids()),
+            'budget': memory_budget.state() if memory_budget else None,
+            'caches': {
+                'transcripts': cache_memory(transcript_cache),
+                'analyses': cache_memory(analysis_cache),
+                'segment_indexes': {
+                    'items': len(indexes),
+                    'bytes': sum(deep_sizeof(i.starts) + sys.getsizeof(i.segments) for i in indexes)
+                },
+                'semantic_index': {
+                    'rows': len(index),
+                    'mapped_bytes': len(index) * index.dimensions * 4
+                } if index else None
+            },
+            'ytdlp_pool': ytdlp_pool.state() if ytdlp_pool else None,
+            'tracemalloc': top_allocations(top, group_by)
+        })
+    
+    except ValueError:
+        return jsonify({'success': False, 'error': 'top must be a number'}), 400
+
+
+@app.route('/api/memory/tracemalloc', methods=['POST'])
+def set_tracemalloc():
+    """Start tracemalloc with {"frames": n}, or stop it with {"frames": 0}"""
+    frames = (request.get_json() or {}).get('frames', 1)
+    if not isinstance(frames, int) or not 0 <= frames <= 50:
+        return jsonify({'success': False, 'error': 'frames must be a number from 0 to 50'}), 400
+    
+    # Restart so a new frame count takes effect; tracing costs memory and CPU
+    tracemalloc.stop()
+    if frames:
+        tracemalloc.start(frames)
+    return jsonify({'success': True, 'tracing': tracemalloc.is_tracing(), 'frames': frames})
+
+
+@app.route('/api/admission', methods=['GET'])
+def get_admission_state():
+    """Load, queue waits and shed requests of each endpoint class"""
+    return jsonify({
+        'success': True,
+        'admission': {name: gate.stats() for name, gate in admission_gates.items()},
+        'transcript_fetches': transcript_flights.stats()
+    })
+
+
+@app.route('/api/tracing', methods=['GET'])
+def get_tracing_state():
+    """Trace exporters, sampling rate and export counters"""
+    return jsonify({
+        'success': True,
+        'tracing': tracer.state()
+    })
+
+
+@app.route('/api/negative-cache', methods=['GET'])
+def get_negative_cache():
+    """Remembered fetch failures, their TTLs and hit counts"""
+    return jsonify({
+        'success': True,
+        'negative_cache': negative_cache.state()
+    })
+
+
+@app.route('/api/negative-cache/<video_id>', methods=['DELETE'])
+def forget_negative_cache(video_id):
+    """Forget a video's remembered failures, e.g. after captions were added"""
+    return jsonify({
+        'success': True,
+        'removed': negative_cache.forget(video_id)
+    })
+
+
+@app.route('/api/llm', methods=['GET'])
+def get_llm_state():
+    """Get the LLM governor's queue depth, wait times and token budget"""
+    return jsonify({
+        'success': True,
+        'governor': llm_router.governor.stats()
+    })
+
+
+@app.route('/api/throttle', methods=['GET'])
+def get_throttle_state():
+    """Get the outbound YouTube governor state"""
+    return jsonify({
+        'success': True,
+        'throttle': youtube_governor.state()
+    })
+
+
+def iter_export_records(after=None, limit=None, channel=None, since=None):
+    """Yield cached (key, transcript record) pairs in key order, with optional filters"""
+    exported = 0
+    for key in transcript_cache.keys(after):
+        if limit and exported >= limit:
+            return
+        
+        record = transcript_cache.get(key, remember=False)
+        if record is None:
+            continue
+        if channel and record['channel'] != channel:
+            continue
+        if since and (record.get('fetched_at') or 0) < since:
+            continue
+        
+        yield key, record
+        exported += 1
+
+
+def export_text_formatter(include_timestamps):
+    """Text formatter for exported records"""
+    def format_text(record):
+        url = f"https://www.youtube.com/watch?v={record['video_id']}"
+        return format_transcript(record, url, include_timestamps)
+    return format_text
+
+
+@app.route('/api/export', methods=['GET'])
+def export_transcripts():
+    """Stream cached transcripts as NDJSON or a zip of TXT, SRT or VTT files"""
+    try:
+        fmt = request.args.get('format', 'ndjson')
+        after = request.args.get('after') or None
+        limit = request.args.get('limit', type=int)
+        channel = request.args.get('channel') or None
+        since = request.args.get('since', type=float)
+        include_timestamps = request.args.get('timestamps', '0') in ('1', 'true')
+        
+        if fmt not in EXPORT_FORMATS:
+            return jsonify({
+                'success': False,
+                'error': f"Unsupported format; use one of: {', '.join(EXPORT_FORMATS)}"
+            }), 400
+        
+        records = iter_export_records(after, limit, channel, since)
+        extension = 'ndjson' if fmt == 'ndjson' else 'zip'
+        
+        return Response(
+            stream_export(records, fmt, export_text_formatter(include_timestamps)),
+            mimetype=EXPORT_MIMETYPES[fmt],
+            headers={'Content-Disposition': f'attachment; filename=transcripts-{fmt}.{extension}'}
+        )
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@app.route('/api/search', methods=['POST'])
+def semantic_search():
+    """Semantic search over indexed transcript chunks"""
+    try:
+        data = request.get_json()
+        query = data.get('query', '').strip()
+        
+        if not query:
+            return jsonify({
+                'success': False,
+                'error': 'No query provided'
+            }), 400
+        
+        try:
+            k = int(data.get('k', 10))
+        except (TypeError, ValueError):
+            k = 0
+        if k < 1:
+            return jsonify({
+                'success': False,
+                'error': 'k must be a whole number of at least 1'
+            }), 400
+        k = min(k, 100)
+        
+        index = get_semantic_index()
+        if index is None:
+            return jsonify({
+                'success': False,
+                'error': 'Semantic search is disabled on this server'
+            }), 503
+        
+        started = time.perf_counter()
+        results = index.search(query, k)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        
+        return jsonify({
+            'success': True,
+            'results': results,
+            'indexed_chunks': len(index),
+            'query_ms': round(elapsed_ms, 2)
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Error: {str(e)}'
+        }), 500
+
+
+@app.route('/api/analyzers', methods=['GET'])
+def list_analyzers():
+    """Local analyzers that saved prompts can be bound to"""
+    return jsonify({
+        'success': True,
+        'modes': list(ANALYZER_MODES),
+        'analyzers': [{'name': a.name, 'description': a.description, 'needs_times': a.needs_times}
+                      for a in ANALYZERS.values()]
+    })
+
+
+@app.route('/api/prompts', methods=['GET'])
+@admission_controlled('prompts')
+def get_prompts():
+    """Get all saved prompts"""
+    try:
+        prompts = load_prompts()
+        return jsonify({
+            'success': True,
+            'prompts': prompts
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@app.route('/api/prompts', methods=['POST'])
+@admission_controlled('prompts')
+def save_prompt_api():
+    """Create or update a prompt"""
+    try:
+        data = request.get_json()
+        prompt_id = data.get('id')
+        name = data.get('name', '').strip()
+        prompt_text = data.get('prompt', '').strip()
+        analyzer_name = (data.get('analyzer') or '').strip() or None
+        analyzer_mode = (data.get('analyzer_mode') or '').strip() or None
+        
+        if not name or not prompt_text:
+            return jsonify({
+                'success': False,
+                'error': 'Name and prompt text are required'
+            }), 400
+        
+        if analyzer_name and analyzer_name not in ANALYZERS:
+            return jsonify({
+                'success': False,
+                'error': f"Unknown analyzer; use one of: {', '.join(ANALYZERS)}"
+            }), 400
+        
+        if analyzer_mode and analyzer_mode not in ANALYZER_MODES:
+            return jsonify({
+                'success': False,
+                'error': f"Unknown analyzer_mode; use one of: {', '.join(ANALYZER_MODES)}"
+            }), 400
+        
+        prompts = load_prompts()
+        
+        if prompt_id:
+            # Update existing prompt
+            prompt = next((p for p in prompts if p['id'] == prompt_id), None)
+            if not prompt:
+                return jsonify({
+                    'success': False,
+                    'error': 'Prompt not found'
+                }), 404
+        else:
+            # Create new prompt
+            prompt = {'id': get_next_prompt_id(prompts)}
+            prompts.append(prompt)
+        
+        prompt['name'] = name
+        prompt['prompt'] = prompt_text
+        if analyzer_name:
+            prompt['analyzer'] = analyzer_name
+            prompt['analyzer_mode'] = analyzer_mode or 'local'
+        else:
+            prompt.pop('analyzer', None)
+            prompt.pop('analyzer_mode', None)
         
         if save_prompts(prompts):
             return jsonify({
@@ -1438,6 +3844,7 @@ def save_prompt_api():
 
 
 @app.route('/api/prompts/<int:prompt_id>', methods=['DELETE'])
+@admission_controlled('prompts')
 def delete_prompt_api(prompt_id):
     """Delete a prompt"""
     try:
@@ -1462,97 +3869,547 @@ def delete_prompt_api(prompt_id):
         }), 500
 
 
+def parse_subtitle_segments(content, after=None):
+    """Parse VTT, SRT, or JSON subtitle format into a list of timed segments
+
+    Each segment is a dict with 'start' and 'end' in seconds and the
+    caption 'text' with markup and inner newlines removed. With after, only
+    segments starting later than that many seconds are returned.
+    """
+    return list(iter_subtitle_segments(io.StringIO(content), after))
+
+
+def format_timestamp(seconds):
+    """Format seconds as the [MM:SS] marker used in transcripts"""
+    total_seconds = int(seconds)
+    return f"[{total_seconds // 60:02d}:{total_seconds % 60:02d}]"
+
+
+def segment_separator(caption_format):
+    """Separator between segments in transcript text
+
+    json3 events run on with spaces while VTT/SRT cues each start a new line,
+    as the text was before it was built from parsed segments. Records cached
+    without a caption_format keep spaces.
+    """
+    return ' ' if caption_format in (None, 'json3') else '\n'
+
+
+def iter_segment_text(segments, include_timestamps=False, separator=' '):
+    """Yield the transcript text of segments piece by piece, optionally with timestamps"""
+    for number, s in enumerate(segments):
+        prefix = separator if number else ''
+        if include_timestamps:
+            yield f"{prefix}{format_timestamp(s['start'])} {s['text']}"
+        else:
+            yield prefix + s['text']
+
+
+def format_segments(segments, include_timestamps=False, separator=' '):
+    """Join parsed segments into transcript text, optionally with timestamps"""
+    return ''.join(iter_segment_text(segments, include_timestamps, separator))
+
+
 def parse_subtitle_content(content, include_timestamps=False):
     """Parse VTT, SRT, or JSON subtitle format to extract plain text"""
-    import json
+    caption_format = 'json3' if content.lstrip().startswith('{') else 'vtt'
+    return format_segments(parse_subtitle_segments(content), include_timestamps, segment_separator(caption_format))
+
+
+def export_cli(args):
+    """Export cached transcripts to a file, resuming from where a previous run stopped"""
+    format_text = export_text_formatter(args.timestamps)
+    after = args.after
+    
+    if args.output == '-':
+        if args.format != 'ndjson':
+            print("Only ndjson can be written to stdout", file=sys.stderr)
+            return 2
+        out = sys.stdout.buffer
+        for key, record in iter_export_records(after, args.limit, args.channel, args.since):
+            out.write(ndjson_line(key, record, format_text).encode('utf-8'))
+        return 0
     
-    lines = []
+    if args.resume and after is None:
+        after = resume_ndjson(args.output) if args.format == 'ndjson' else resume_zip(args.output)
+        if after:
+            print(f"Resuming after {after}", file=sys.stderr)
     
-    # Try to parse as JSON first (YouTube's json3 format)
+    mode = 'a' if args.resume else 'w'
+    exported = 0
+    started = time.perf_counter()
+    records = iter_export_records(after, args.limit, args.channel, args.since)
+    
+    if args.format == 'ndjson':
+        with open(args.output, mode + 'b') as out:
+            for key, record in records:
+                out.write(ndjson_line(key, record, format_text).encode('utf-8'))
+                exported += 1
+    else:
+        with zipfile.ZipFile(args.output, mode, compression=zipfile.ZIP_DEFLATED) as archive:
+            for key, record in records:
+                archive.writestr(*export_entry(key, record, args.format, format_text))
+                exported += 1
+    
+    elapsed = time.perf_counter() - started
+    print(f"Exported {exported} transcripts to {args.output} in {elapsed:.1f}s", file=sys.stderr)
+    return 0
+
+
+def read_fetch_urls(source):
+    """Read URLs, one per line, from a file or '-' for stdin; blank lines and # comments are skipped"""
+    f = sys.stdin if source == '-' else open(source, 'r')
     try:
-        data = json.loads(content)
-        
-        # Handle json3 format
-        if 'events' in data:
-            for event in data['events']:
-                if 'segs' in event:
-                    timestamp = None
-                    if include_timestamps and 'tStartMs' in event:
-                        # Convert milliseconds to MM:SS format
-                        total_seconds = event['tStartMs'] / 1000
-                        minutes = int(total_seconds // 60)
-                        seconds = int(total_seconds % 60)
-                        timestamp = f"[{minutes:02d}:{seconds:02d}]"
-                    
-                    for seg in event['segs']:
-                        if 'utf8' in seg:
-                            text = seg['utf8'].strip()
-                            # Remove newline characters within segments
-                            text = text.replace('\n', ' ')
-                            if text:
-                                if timestamp:
-                                    lines.append(f"{timestamp} {text}")
-                                    timestamp = None  # Only add timestamp once per event
-                                else:
-                                    lines.append(text)
-        
-        return ' '.join(lines)
-    
-    except (json.JSONDecodeError, KeyError):
-        # Not JSON or different format, try VTT/SRT parsing
-        pass
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def existing_ndjson_keys(path):
+    """Cursors already written to an NDJSON output, after removing a partial last line"""
+    if resume_ndjson(path) is None:
+        return set()
+    with open(path, 'r') as f:
+        return {json.loads(line)['cursor'] for line in f if line.strip()}
+
+
+def write_file_atomic(path, content):
+    """Write a text file so an interrupted run never leaves a partial output"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def fetch_cli(args):
+    """Fetch transcripts for a list of URLs in parallel into a directory or NDJSON file"""
+    format_text = export_text_formatter(args.timestamps)
+    to_ndjson = args.output.endswith('.ndjson')
+    if to_ndjson:
+        present = existing_ndjson_keys(args.output)
+    else:
+        os.makedirs(args.output, exist_ok=True)
     
-    # Parse VTT or SRT format
-    current_timestamp = None
-    for line in content.split('\n'):
-        line = line.strip()
-        
-        # Check for timestamp line
-        if '-->' in line and include_timestamps:
-            # Extract start time (format: 00:00:15.000 --> 00:00:18.000)
-            match = re.match(r'(\d{2}):(\d{2}):(\d{2})', line)
-            if match:
-                hours, minutes, seconds = match.groups()
-                # Convert to MM:SS format
-                total_minutes = int(hours) * 60 + int(minutes)
-                current_timestamp = f"[{total_minutes:02d}:{seconds}]"
+    targets = {}
+    skipped = failed = 0
+    for url in read_fetch_urls(args.input):
+        video_id = extract_video_id(url)
+        if not video_id:
+            print(f"Invalid YouTube URL: {url}", file=sys.stderr)
+            failed += 1
             continue
-        
-        # Skip empty lines and VTT headers
-        if not line or line.startswith('WEBVTT') or line.isdigit():
+        key = transcript_cache_key(video_id, args.lang)
+        if to_ndjson:
+            exists = key in present
+        else:
+            # Output files are named <key>.<format>, as export_entry writes them
+            exists = os.path.exists(os.path.join(args.output, f"{key}.{args.format}"))
+        if exists:
+            skipped += 1
+        else:
+            targets.setdefault(key, (url, video_id))
+    
+    fetched = cached = 0
+    caption_seconds = 0.0
+    started = time.perf_counter()
+    
+    def fetch_one(key):
+        url, video_id = targets[key]
+        return get_transcript_record(url, video_id, args.lang, index=args.index)
+    
+    out = open(args.output, 'ab') if to_ndjson else None
+    try:
+        with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+            futures = {executor.submit(fetch_one, key): key for key in targets}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    record, was_cached = future.result()
+                except (TranscriptError, ThrottledError) as e:
+                    print(f"{key}: {e}", file=sys.stderr)
+                    failed += 1
+                    continue
+                except Exception as e:
+                    print(f"{key}: Error: {e}", file=sys.stderr)
+                    failed += 1
+                    continue
+                
+                if to_ndjson:
+                    out.write(ndjson_line(key, record, format_text).encode('utf-8'))
+                    out.flush()
+                else:
+                    name, content = export_entry(key, record, args.format, format_text)
+                    write_file_atomic(os.path.join(args.output, name), content)
+                
+                cached += was_cached
+                fetched += not was_cached
+                if record['segments']:
+                    caption_seconds += record['segments'][-1]['end']
+    finally:
+        if out:
+            out.close()
+    
+    elapsed = time.perf_counter() - started
+    done = fetched + cached
+    print(f"Fetched {fetched}, from cache {cached}, skipped {skipped}, failed {failed} in {elapsed:.1f}s "
+          f"({done / elapsed if elapsed else 0:.2f} videos/s, "
+          f"{caption_seconds / 60 / elapsed if elapsed else 0:.0f} caption minutes/s)", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def batch_runner(backend, local=False):
+    """Batch API runner for a backend; the local stand-in for non-OpenAI backends"""
+    if local or not isinstance(backend, OpenAICompatibleBackend):
+        return LocalBatchRunner(backend, BATCH_DIR)
+    return OpenAIBatchRunner(backend.client)
+
+
+def prepare_batches(prompt, prompt_id, records):
+    """Write Batch API input files for records not yet analyzed with prompt
+
+    Requests are grouped by routed backend and model, since a batch may only
+    use one model. Returns a list of batch state dicts with their input paths.
+    """
+    BATCH_DIR.mkdir(parents=True, exist_ok=True)
+    prompt_type = classify_prompt(prompt)
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    groups = {}
+    skipped = 0
+    
+    try:
+        for key, record in records:
+            url = f"https://www.youtube.com/watch?v={record['video_id']}"
+            transcript = format_transcript(record, url)
+            custom_id = analysis_cache_key(transcript, prompt)
+            if analysis_cache.contains(custom_id):
+                skipped += 1
+                continue
+            
+            messages = analysis_messages(transcript, prompt)
+            route, max_tokens = llm_router.route(messages, prompt_type)
+            group = groups.get((route.backend.name, route.model))
+            if group is None:
+                input_path = BATCH_DIR / f"{stamp}-{route.backend.name}-{route.model}.input.jsonl"
+                group = groups[(route.backend.name, route.model)] = {
+                    'backend': route.backend.name,
+                    'model': route.model,
+                    'prompt_id': prompt_id,
+                    'prompt': prompt,
+                    'prompt_type': prompt_type,
+                    'input_path': str(input_path),
+                    'requests': {},
+                    'file': open(input_path, 'w')
+                }
+            if custom_id in group['requests']:
+                continue
+            group['file'].write(batch_line(custom_id, route.model, messages, max_tokens))
+            group['requests'][custom_id] = {'video_id': record['video_id'], 'duration': record['duration']}
+    finally:
+        for group in groups.values():
+            group.pop('file').close()
+    
+    if skipped:
+        print(f"Skipping {skipped} transcripts already analyzed with this prompt", file=sys.stderr)
+    return list(groups.values())
+
+
+def batch_state_path(batch_id):
+    return BATCH_DIR / f"{batch_id}.json"
+
+
+def collect_batch(state, runner):
+    """Write a finished batch's results into the analysis cache and usage ledger"""
+    saved = failed = 0
+    for line in runner.results(state['batch_id']):
+        custom_id, result = parse_output_line(line)
+        request_info = state['requests'].get(custom_id)
+        if request_info is None:
             continue
-        
-        # Skip lines that are just timestamps
-        if re.match(r'^\d{2}:\d{2}:\d{2}', line):
+        if 'error' in result:
+            print(f"{request_info['video_id']}: {result['error']}", file=sys.stderr)
+            failed += 1
             continue
         
-        # Remove HTML tags
-        line = re.sub(r'<[^>]+>', '', line)
-        
-        if line:
-            if include_timestamps and current_timestamp:
-                lines.append(f"{current_timestamp} {line}")
-                current_timestamp = None  # Only add timestamp once
-            else:
-                lines.append(line)
+        entry = {
+            'prompt': state['prompt'],
+            'response': result['text'],
+            'model': result['model'] or state['model'],
+            'prompt_type': state['prompt_type'],
+            'compression': None,
+            'usage': {
+                'prompt_tokens': result['prompt_tokens'],
+                'completion_tokens': result['completion_tokens'],
+                'latency': None,
+                'queue_wait': None,
+                'batch_id': state['batch_id']
+            },
+            'created_at': time.time()
+        }
+        analysis_cache.put(custom_id, entry)
+        usage_ledger.record(
+            prompt_id=state['prompt_id'],
+            prompt_type=state['prompt_type'],
+            video_id=request_info['video_id'],
+            video_duration=request_info['duration'],
+            model=entry['model'],
+            prompt_tokens=result['prompt_tokens'],
+            completion_tokens=result['completion_tokens'],
+            cached=False,
+            priority='batch'
+        )
+        saved += 1
+    return saved, failed
+
+
+def finish_batch(state, runner, poll_interval):
+    """Wait for a batch, then collect its results"""
+    status = wait_for_batch(runner, state['batch_id'], poll_interval,
+                            report=lambda message: print(message, file=sys.stderr))
+    saved, failed = collect_batch(state, runner)
+    print(f"{state['batch_id']}: {status['status']}, saved {saved} analyses, {failed} failed",
+          file=sys.stderr)
+    return status['status'] == 'completed'
+
+
+def batch_cli(args):
+    """Run a saved prompt over cached transcripts through the Batch API"""
+    if args.resume:
+        states = []
+        for batch_id in args.resume:
+            with open(batch_state_path(batch_id), 'r') as f:
+                states.append(json.load(f))
+    else:
+        if args.prompt_id is None:
+            print("Either --prompt-id or --resume is required", file=sys.stderr)
+            return 2
+        prompts = {p['id']: p for p in load_prompts()}
+        if args.prompt_id not in prompts:
+            print(f"No saved prompt with ID {args.prompt_id}", file=sys.stderr)
+            return 2
+        if not llm_router.is_configured():
+            print("No LLM backend configured", file=sys.stderr)
+            return 2
+        
+        records = iter_export_records(None, args.limit, args.channel, args.since)
+        states = prepare_batches(prompts[args.prompt_id]['prompt'], args.prompt_id, records)
+        if not states:
+            print("Nothing to analyze", file=sys.stderr)
+            return 0
+        
+        for state in states:
+            runner = batch_runner(llm_router.backends[state['backend']], args.local)
+            state['runner'] = runner.name
+            state['batch_id'] = runner.submit(state['input_path'], {'prompt_id': str(args.prompt_id)})
+            state['submitted_at'] = time.time()
+            with open(batch_state_path(state['batch_id']), 'w') as f:
+                json.dump(state, f, indent=2)
+            print(f"Submitted {state['batch_id']}: {len(state['requests'])} requests to {state['model']}",
+                  file=sys.stderr)
+        
+        if args.no_wait:
+            print(' '.join(state['batch_id'] for state in states))
+            return 0
     
-    return '\n'.join(lines)
+    succeeded = True
+    for state in states:
+        runner = batch_runner(llm_router.backends[state['backend']], state['runner'] == 'local')
+        succeeded = finish_batch(state, runner, args.poll_interval) and succeeded
+    return 0 if succeeded else 1
 
 
-if __name__ == '__main__':
+def serve(host='0.0.0.0', port=8000):
+    """Run the web server"""
+    if TRACEMALLOC_FRAMES:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    
     print("=" * 60)
     print("YouTube Transcript Downloader with AI Analysis")
     print("=" * 60)
-    print(f"Server starting on http://192.168.44.11:8000")
+    print(f"Server starting on http://{'192.168.44.11' if host == '0.0.0.0' else host}:{port}")
     
     # Check if OpenAI API key is set
     if os.getenv('OPENAI_API_KEY'):
         print("✓ OpenAI API key configured")
+    elif llm_router.is_configured():
+        print("✓ LLM backend configured")
     else:
         print("⚠ WARNING: OpenAI API key not configured")
         print("  Set OPENAI_API_KEY environment variable to enable AI features")
     
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    
+    class RequestHandler(WSGIRequestHandler):
+        # HTTP/1.1 sends streamed responses with chunked transfer encoding;
+        # idle keep-alive connections are closed after the timeout
+        protocol_version = 'HTTP/1.1'
+        timeout = 30
+    
+    server = make_server(host, port, app, threaded=True, request_handler=RequestHandler)
+    startup_status['listening_at'] = time.time()
+    
+    # Requests are served while prewarming; anything not yet loaded is loaded on demand
+    if PREWARM:
+        sd_notify('READY=1\nSTATUS=Prewarming')
+        threading.Thread(target=prewarm, name='prewarm', daemon=True).start()
+    else:
+        startup_status['ready'] = True
+        sd_notify('READY=1\nSTATUS=Ready')
+    
+    start_watchlist_scheduler()
+    if memory_budget:
+        memory_budget.start()
+    
     print("Press Ctrl+C to stop the server")
     print("=" * 60)
     
-    app.run(host='0.0.0.0', port=8000, debug=False)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sd_notify('STOPPING=1')
+        server.server_close()
+
+
+def free_port():
+    """Find an unused local TCP port"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def median(values):
+    """Median of a non-empty list"""
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+
+
+def bench_startup_cli(args):
+    """Measure import, listen and ready times of fresh server processes"""
+    script = os.path.abspath(__file__)
+    env = dict(os.environ, PYTHONUNBUFFERED='1')
+    if args.no_prewarm:
+        env['PREWARM'] = '0'
+    
+    timings = {'import': [], 'listening': [], 'ready': []}
+    for run in range(args.runs):
+        with tempfile.TemporaryDirectory(prefix='startup-bench-') as data_dir:
+            env['TRANSCRIPT_DATA_DIR'] = data_dir
+            
+            started = time.perf_counter()
+            subprocess.run([sys.executable, '-c', 'import youtube_transcript_app'],
+                           cwd=os.path.dirname(script), env=env, check=True)
+            timings['import'].append(time.perf_counter() - started)
+            
+            port = free_port()
+            started = time.perf_counter()
+            process = subprocess.Popen(
+                [sys.executable, script, 'serve', '--host', '127.0.0.1', '--port', str(port)],
+                env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            listening = None
+            try:
+                while time.perf_counter() - started < args.timeout:
+                    try:
+                        with urllib.request.urlopen(f'http://127.0.0.1:{port}/api/ready', timeout=1):
+                            break
+                    except urllib.error.HTTPError:
+                        # 503: listening but still prewarming
+                        listening = listening or time.perf_counter() - started
+                    except (urllib.error.URLError, OSError):
+                        pass
+                    time.sleep(0.01)
+                else:
+                    print(f"Run {run + 1}: server not ready after {args.timeout}s", file=sys.stderr)
+                    return 1
+                ready = time.perf_counter() - started
+            finally:
+                process.terminate()
+                process.wait(timeout=10)
+            
+            timings['listening'].append(listening or ready)
+            timings['ready'].append(ready)
+            print(f"Run {run + 1}: import {timings['import'][-1]:.2f}s, "
+                  f"listening {timings['listening'][-1]:.2f}s, ready {ready:.2f}s")
+    
+    print(f"\n{'phase':<12}{'median':>9}{'min':>9}{'max':>9}")
+    for phase, values in timings.items():
+        print(f"{phase:<12}{median(values):>8.2f}s{min(values):>8.2f}s{max(values):>8.2f}s")
+    return 0
+
+
+def main(argv=None):
+    """Command-line entry point; runs the web server when no command is given"""
+    parser = argparse.ArgumentParser(description='YouTube Transcript Downloader')
+    commands = parser.add_subparsers(dest='command')
+    
+    serve_parser = commands.add_parser('serve', help='Run the web server (default)')
+    serve_parser.add_argument('--host', default='0.0.0.0')
+    serve_parser.add_argument('--port', type=int, default=8000)
+    
+    bench_parser = commands.add_parser('bench-startup', help='Measure server startup time')
+    bench_parser.add_argument('-n', '--runs', type=int, default=5)
+    bench_parser.add_argument('--no-prewarm', action='store_true', help='Benchmark with PREWARM=0')
+    bench_parser.add_argument('--timeout', type=float, default=60)
+    
+    fetch_parser = commands.add_parser('fetch', help='Fetch transcripts for a list of URLs')
+    fetch_parser.add_argument('input', nargs='?', default='-', help="File with one URL per line; '-' for stdin")
+    fetch_parser.add_argument('-o', '--output', required=True,
+                              help='Output directory, or a .ndjson file to append to')
+    fetch_parser.add_argument('-j', '--jobs', type=int, default=4, help='Parallel fetches')
+    fetch_parser.add_argument('-f', '--format', choices=[f for f in EXPORT_FORMATS if f != 'ndjson'],
+                              default='txt', help='File format when writing to a directory')
+    fetch_parser.add_argument('--lang', help='Caption language')
+    fetch_parser.add_argument('--timestamps', action='store_true', help='Include timestamps in text output')
+    fetch_parser.add_argument('--index', action='store_true',
+                              help='Add fetched transcripts to the semantic search index (waits for indexing to finish)')
+    
+    batch_parser = commands.add_parser('batch', help='Analyze cached transcripts through the Batch API')
+    batch_parser.add_argument('--prompt-id', type=int, help='Saved prompt to run')
+    batch_parser.add_argument('--channel', help='Only analyze this channel')
+    batch_parser.add_argument('--since', type=float, help='Only analyze transcripts fetched after this Unix time')
+    batch_parser.add_argument('--limit', type=int, help='Maximum number of transcripts')
+    batch_parser.add_argument('--local', action='store_true',
+                              help='Run the batch locally against the routed backend instead of the Batch API')
+    batch_parser.add_argument('--no-wait', action='store_true', help='Submit and print the batch IDs')
+    batch_parser.add_argument('--resume', nargs='+', metavar='BATCH_ID',
+                              help='Wait for and collect previously submitted batches')
+    batch_parser.add_argument('--poll-interval', type=float, default=60)
+    
+    export_parser = commands.add_parser('export', help='Export cached transcripts')
+    export_parser.add_argument('-f', '--format', choices=EXPORT_FORMATS, default='ndjson')
+    export_parser.add_argument('-o', '--output', required=True,
+                               help="Output file (.ndjson, or .zip for txt/srt/vtt); '-' for stdout")
+    export_parser.add_argument('--resume', action='store_true',
+                               help='Append to an existing output, continuing after its last entry')
+    export_parser.add_argument('--after', help='Only export entries after this cursor')
+    export_parser.add_argument('--limit', type=int, help='Maximum number of transcripts')
+    export_parser.add_argument('--channel', help='Only export this channel')
+    export_parser.add_argument('--since', type=float, help='Only export transcripts fetched after this Unix time')
+    export_parser.add_argument('--timestamps', action='store_true', help='Include timestamps in text output')
+    
+    args = parser.parse_args(argv)
+    
+    if args.command == 'export':
+        return export_cli(args)
+    
+    if args.command == 'fetch':
+        return fetch_cli(args)
+    
+    if args.command == 'batch':
+        return batch_cli(args)
+    
+    if args.command == 'bench-startup':
+        return bench_startup_cli(args)
+    
+    if args.command == 'serve':
+        serve(args.host, args.port)
+    else:
+        serve()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""
+yt-dlp extractions in recyclable worker processes
+
+yt-dlp loads hundreds of extractor modules, and memory used during an
+extraction is rarely returned to the system. With a pool, extractions run in
+worker processes that are replaced after max_tasks extractions, and the whole
+pool can be recycled when memory runs short, so that memory is actually given
+back. Workers are forked from a forkserver with yt_dlp preloaded; they start
+quickly and do not carry the app's own caches.
+"""
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+class ExtractionError(Exception):
+    """A yt-dlp failure in a worker, with the original message
+
+    The message keeps yt-dlp's "HTTP Error 429" text, so throttling is still
+    recognised by the outbound governor.
+    """
+
+
+def extract_info(url, ydl_opts):
+    """Worker body: run a yt-dlp info extraction and return a picklable info dict"""
+    import yt_dlp
+    try:
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            return ydl.sanitize_info(ydl.extract_info(url, download=False))
+    except Exception as e:
+        raise ExtractionError(str(e)) from None
+
+
+class YtdlpPool:
+    """Process pool for yt-dlp extractions that can be recycled on demand"""
+
+    def __init__(self, workers=1, max_tasks=50):
+        self.workers = workers
+        self.max_tasks = max_tasks
+        self._context = multiprocessing.get_context('forkserver')
+        self._context.set_forkserver_preload(['yt_dlp'])
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+        self._stats = {'extractions': 0, 'recycled': 0, 'broken': 0}
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=self._context,
+                                   max_tasks_per_child=self.max_tasks)
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            return self._executor.submit(fn, *args)
+
+    def extract_info(self, url, ydl_opts):
+        """Run an extraction in a worker and wait for its info dict"""
+        with self._lock:
+            self._stats['extractions'] += 1
+        try:
+            return self._submit(extract_info, url, ydl_opts).result()
+        except BrokenProcessPool:
+            # A worker was killed, most likely by the kernel's OOM killer
+            with self._lock:
+                self._stats['broken'] += 1
+            self.recycle()
+            raise ExtractionError('yt-dlp worker process died')
+
+    def warm(self):
+        """Start the forkserver and a worker ahead of the first extraction"""
+        self._submit(int).result()
+
+    def recycle(self):
+        """Replace all workers; running extractions finish in the old ones first"""
+        with self._lock:
+            old, self._executor = self._executor, self._new_executor()
+            self._stats['recycled'] += 1
+        old.shutdown(wait=False)
+
+    def state(self):
+        """Pool size and counters"""
+        with self._lock:
+            return {'workers': self.workers, 'max_tasks_per_worker': self.max_tasks, **self._stats}